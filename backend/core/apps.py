@@ -17,6 +17,10 @@ class CoreConfig(AppConfig):
         # Реєстрація сигналів
         core.signals.ready()
 
+        # Інвалідація кешу лише для моделей, від яких залежить кеш
+        from core.cache_utils import connect_cache_invalidation
+        connect_cache_invalidation()
+
         # Реєструємо ключові моделі в auditlog (хто коли що змінив)
         try:
             from auditlog.registry import auditlog
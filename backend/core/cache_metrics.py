@@ -0,0 +1,67 @@
+"""
+Метрики кешу для Prometheus (/metrics через django_prometheus)
+"""
+
+import re
+
+from prometheus_client import Counter, Histogram
+
+_NUMBER_RE = re.compile(r'\d+')
+
+# Ключі Django без двокрапок (сесії в кеші, cache_page, фрагменти шаблонів);
+# довші префікси перевіряються раніше за коротші
+DJANGO_KEY_PREFIXES = (
+    'django.contrib.sessions.cached_db',
+    'django.contrib.sessions.cache',
+    'views.decorators.cache.cache_header',
+    'views.decorators.cache.cache_page',
+    'template.cache',
+)
+OTHER_NAMESPACE = '(без простору імен)'
+
+CACHE_REQUESTS = Counter(
+    'saas_cache_requests_total',
+    'Звернення до кешу за типом даних і результатом (local_hit, hit, stale, miss)',
+    ['cache_type', 'result'],
+)
+
+CACHE_SETS = Counter(
+    'saas_cache_sets_total',
+    'Записи в кеш за типом даних',
+    ['cache_type'],
+)
+
+CACHE_INVALIDATIONS = Counter(
+    'saas_cache_invalidations_total',
+    'Збільшення версій просторів імен за типом простору',
+    ['namespace'],
+)
+
+CACHE_LATENCY = Histogram(
+    'saas_cache_operation_seconds',
+    'Тривалість операцій з Redis за типом даних',
+    ['cache_type', 'operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+
+def cache_type_for_key(key: str, cache_type: str = None) -> str:
+    """Тип даних для міток: явний cache_type або перший сегмент ключа"""
+    return cache_type or key.split(':', 1)[0]
+
+
+def namespace_type(namespace: str) -> str:
+    """Простір імен без ідентифікаторів: products:store_12 → products:store_N"""
+    return _NUMBER_RE.sub('N', namespace)
+
+
+def key_namespace(key: str, depth: int = 1) -> str:
+    """
+    Тип простору імен ключа для статистики: перші depth сегментів через двокрапку
+
+    Ключі без двокрапок групуються за відомими префіксами Django, решта —
+    в один рядок, щоб кожна сесія чи сторінка не ставала окремим простором.
+    """
+    if ':' not in key:
+        return next((prefix for prefix in DJANGO_KEY_PREFIXES if key.startswith(prefix)), OTHER_NAMESPACE)
+    return namespace_type(':'.join(key.split(':')[:depth]))
@@ -3,14 +3,38 @@
 """
 
 from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
 from functools import wraps
 import hashlib
 import json
 import logging
+import random
+import threading
+import time
+
+from core.cache_metrics import (
+    CACHE_INVALIDATIONS, CACHE_LATENCY, CACHE_REQUESTS, CACHE_SETS,
+    cache_type_for_key, namespace_type,
+)
 
 logger = logging.getLogger(__name__)
 
+_MISSING = object()
+
+# Простір імен усього каталогу (вибірки товарів різних магазинів)
+CATALOG_NAMESPACE = 'products'
+
+# Запис get_or_set у Redis: значення та момент, після якого його варто перерахувати
+CacheEntry = namedtuple('CacheEntry', ['value', 'refresh_at'])
+
 
 def make_cache_key(*args, **kwargs) -> str:
     """Створити ключ кешу з параметрів"""
@@ -47,31 +71,25 @@ def cache_result(timeout=300, key_prefix='api'):
             # Створюємо ключ кешу
             cache_key = f"{key_prefix}:{func.__name__}:{make_cache_key(*args, **kwargs)}"
             
-            # Перевіряємо кеш
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                logger.debug(f"Cache hit for {cache_key}")
-                return cached_result
-            
-            # Виконуємо функцію
-            result = func(*args, **kwargs)
-            
-            # Кешуємо результат
-            cache.set(cache_key, result, timeout)
-            logger.debug(f"Cached result for {cache_key}")
-            
-            return result
+            # Захист від одночасного перерахунку — через CacheManager.get_or_set
+            return cache_manager.get_or_set(cache_key, lambda: func(*args, **kwargs), timeout)
         return wrapper
     return decorator
 
 
 def invalidate_cache_pattern(pattern: str):
-    """Очистити кеш за паттерном"""
+    """
+    Очистити кеш простору імен
+
+    Замість сканування ключів Redis збільшується версія простору імен:
+    ключі, створені через CacheManager.versioned_key, стають недосяжними
+    і спливають самі.
+    """
     try:
-        cache.delete_pattern(f"*{pattern}*")
-        logger.info(f"Cache pattern '{pattern}' invalidated")
+        cache_manager.bump_namespace(pattern)
+        logger.info(f"Cache namespace '{pattern}' invalidated")
     except Exception as e:
-        logger.error(f"Failed to invalidate cache pattern '{pattern}': {e}")
+        logger.error(f"Failed to invalidate cache namespace '{pattern}': {e}")
 
 
 def invalidate_model_cache(model_instance, related_patterns=None):
@@ -93,8 +111,65 @@ def invalidate_model_cache(model_instance, related_patterns=None):
         invalidate_cache_pattern(pattern)
 
 
+class LocalCache:
+    """
+    Обмежений LRU-кеш у пам'яті процесу
+
+    Перший рівень перед Redis для найгарячіших ключів. Записи живуть лише
+    кілька секунд, тому інші процеси бачать інвалідацію з невеликою затримкою.
+    """
+
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, timeout: float):
+        if timeout <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class CacheManager:
-    """Менеджер кешування для різних типів даних"""
+    """
+    Менеджер кешування для різних типів даних
+
+    get_or_set працює у два рівні (LocalCache процесу → Redis) і захищає
+    від лавини перерахунків: після закінчення часу життя значення перераховує
+    лише процес, що взяв блокування, а решта віддає попереднє значення.
+    Таймаути отримують випадковий розкид, щоб ключі не спливали одночасно.
+
+    Інвалідація не сканує ключі: ключі містять версії просторів імен
+    (products:store_1:v5), а очищення простору — це збільшення його версії.
+    Старі ключі залишаються недосяжними до закінчення свого таймауту.
+    """
     
     # Таймаути кешування для різних типів даних
     TIMEOUTS = {
@@ -104,179 +179,566 @@ class CacheManager:
         'store_settings': 3600,     # 1 година
         'user_permissions': 1800,   # 30 хвилин
         'pricelist_items': 300,     # 5 хвилин
+        'pricelist_analytics': 3600,  # 1 година (ключ містить версію прайс-листа)
         'stock_levels': 60,         # 1 хвилина
         'order_stats': 300,         # 5 хвилин
         'feature_flags': 300,       # 5 хвилин
+        'public_response': 300,     # 5 хвилин (ключ містить версії магазину та товарів)
     }
     
+    # Випадковий розкид таймауту (частка від базового)
+    TTL_JITTER = 0.1
+    
+    # Скільки секунд після закінчення часу життя можна віддавати старе значення,
+    # поки один процес його перераховує
+    STALE_TIMEOUT = 60
+    
+    # Блокування перерахунку ключа та очікування чужого перерахунку
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT = 2.0
+    LOCK_POLL_INTERVAL = 0.05
+    
+    # Локальний рівень: максимальний час життя запису та кількість записів
+    LOCAL_TIMEOUT = 5
+    LOCAL_MAX_ENTRIES = 2000
+    
+    # Більші значення (наприклад, готові JSON-відповіді) тримаються лише в Redis
+    LOCAL_MAX_VALUE_SIZE = 64 * 1024
+    
+    NAMESPACE_VERSION_KEY = 'ns_version:{namespace}'
+    
     def __init__(self):
         self.cache = cache
+        self.local = LocalCache(self.LOCAL_MAX_ENTRIES)
     
-    def get_or_set(self, key: str, callable_or_value, timeout: int = None, cache_type: str = None):
-        """Отримати з кешу або встановити нове значення"""
+    def get_namespace_versions(self, namespaces) -> dict:
+        """Поточні версії просторів імен одним запитом до Redis"""
+        keys = {namespace: self.NAMESPACE_VERSION_KEY.format(namespace=namespace) for namespace in namespaces}
+        stored = self.cache.get_many(list(keys.values()))
+        
+        versions = {}
+        for namespace, key in keys.items():
+            version = stored.get(key)
+            if version is None:
+                # Версія ще не створена або витіснена: стартуємо з поточного часу,
+                # щоб не повторити номер, під яким могли лишитися старі ключі
+                self.cache.add(key, time.time_ns() // 1000, None)
+                version = self.cache.get(key)
+            versions[namespace] = version
+        return versions
+    
+    def get_namespace_version(self, namespace: str) -> int:
+        """Поточна версія простору імен"""
+        return self.get_namespace_versions([namespace])[namespace]
+    
+    def bump_namespace(self, *namespaces: str):
+        """Інвалідувати простори імен збільшенням їх версій (O(1) на простір)"""
+        for namespace in namespaces:
+            key = self.NAMESPACE_VERSION_KEY.format(namespace=namespace)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Версії ще немає — ключів цього простору теж немає
+                self.cache.add(key, time.time_ns() // 1000, None)
+            CACHE_INVALIDATIONS.labels(namespace_type(namespace)).inc()
+    
+    def versioned_key(self, key: str, *namespaces: str) -> str:
+        """
+        Ключ з версіями просторів імен
+
+        Без явних просторів простором імен є сам ключ:
+        versioned_key('products:store_1') → 'products:store_1:v5'.
+        """
+        namespaces = namespaces or (key,)
+        versions = self.get_namespace_versions(namespaces)
+        return f"{key}:v{'.'.join(str(versions[namespace]) for namespace in namespaces)}"
+    
+    def get_timeout(self, timeout: int = None, cache_type: str = None) -> int:
+        """Таймаут для типу даних з випадковим розкидом"""
         if timeout is None and cache_type:
             timeout = self.TIMEOUTS.get(cache_type, 300)
         
         if timeout is None:
             timeout = 300
         
-        return self.cache.get_or_set(key, callable_or_value, timeout)
+        return int(timeout * (1 + random.uniform(0, self.TTL_JITTER)))
     
-    def set(self, key: str, value, timeout: int = None, cache_type: str = None):
-        """Встановити значення в кеш"""
-        if timeout is None and cache_type:
-            timeout = self.TIMEOUTS.get(cache_type, 300)
+    def get_or_set(self, key: str, callable_or_value, timeout: int = None, cache_type: str = None):
+        """Отримати з кешу або встановити нове значення"""
+        cache_type = cache_type_for_key(key, cache_type)
+        entry = self._get_entry(key, cache_type)
+        if entry is not None:
+            if time.time() < entry.refresh_at:
+                return entry.value
+            
+            # Час життя минув: перераховує лише власник блокування, решта віддає старе значення
+            if self._acquire_lock(key):
+                try:
+                    return self._compute(key, callable_or_value, timeout, cache_type)
+                finally:
+                    self._release_lock(key)
+            return entry.value
         
-        if timeout is None:
-            timeout = 300
+        if self._acquire_lock(key):
+            try:
+                return self._compute(key, callable_or_value, timeout, cache_type)
+            finally:
+                self._release_lock(key)
+        
+        # Значення вже рахує інший процес — чекаємо його результат обмежений час
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(self.LOCK_POLL_INTERVAL)
+            entry = self._get_entry(key, cache_type, record=False)
+            if entry is not None:
+                return entry.value
+            
+            # Власник зняв блокування, нічого не записавши (помилка, відповідь
+            # без кешу) — один з очікувачів бере блокування і рахує сам
+            if not self._is_locked(key) and self._acquire_lock(key):
+                try:
+                    return self._compute(key, callable_or_value, timeout, cache_type)
+                finally:
+                    self._release_lock(key)
         
-        return self.cache.set(key, value, timeout)
+        logger.warning(f"Cache lock wait timed out for {key}")
+        return self._compute(key, callable_or_value, timeout, cache_type)
+    
+    def _get_entry(self, key: str, cache_type: str, record: bool = True):
+        entry = self.local.get(key)
+        if entry is not None:
+            if record:
+                CACHE_REQUESTS.labels(cache_type, 'local_hit').inc()
+            return entry
+        
+        with CACHE_LATENCY.labels(cache_type, 'get').time():
+            entry = self.cache.get(key)
+        if not isinstance(entry, CacheEntry):
+            # Немає значення або ключ записаний у старому форматі
+            if record:
+                CACHE_REQUESTS.labels(cache_type, 'miss').inc()
+            return None
+        
+        fresh_for = entry.refresh_at - time.time()
+        if record:
+            CACHE_REQUESTS.labels(cache_type, 'hit' if fresh_for > 0 else 'stale').inc()
+        if fresh_for > 0 and self._fits_local(entry.value):
+            self.local.set(key, entry, min(self.LOCAL_TIMEOUT, fresh_for))
+        return entry
+    
+    def _compute(self, key: str, callable_or_value, timeout: int = None, cache_type: str = None):
+        value = callable_or_value() if callable(callable_or_value) else callable_or_value
+        timeout = self.get_timeout(timeout, cache_type)
+        entry = CacheEntry(value, time.time() + timeout)
+        
+        with CACHE_LATENCY.labels(cache_type, 'set').time():
+            self.cache.set(key, entry, timeout + self.STALE_TIMEOUT)
+        CACHE_SETS.labels(cache_type).inc()
+        if self._fits_local(value):
+            self.local.set(key, entry, min(self.LOCAL_TIMEOUT, timeout))
+        return value
     
-    def get(self, key: str, default=None):
+    def _fits_local(self, value) -> bool:
+        return not isinstance(value, (bytes, str)) or len(value) <= self.LOCAL_MAX_VALUE_SIZE
+    
+    def _acquire_lock(self, key: str) -> bool:
+        return self.cache.add(f"lock:{key}", 1, self.LOCK_TIMEOUT)
+    
+    def _release_lock(self, key: str):
+        self.cache.delete(f"lock:{key}")
+    
+    def _is_locked(self, key: str) -> bool:
+        return self.cache.get(f"lock:{key}") is not None
+    
+    def set(self, key: str, value, timeout: int = None, cache_type: str = None):
+        """Встановити значення в кеш"""
+        timeout = self.get_timeout(timeout, cache_type)
+        cache_type = cache_type_for_key(key, cache_type)
+        with CACHE_LATENCY.labels(cache_type, 'set').time():
+            result = self.cache.set(key, value, timeout)
+        CACHE_SETS.labels(cache_type).inc()
+        return result
+    
+    def get(self, key: str, default=None, cache_type: str = None):
         """Отримати значення з кешу"""
-        return self.cache.get(key, default)
+        cache_type = cache_type_for_key(key, cache_type)
+        with CACHE_LATENCY.labels(cache_type, 'get').time():
+            value = self.cache.get(key, _MISSING)
+        CACHE_REQUESTS.labels(cache_type, 'miss' if value is _MISSING else 'hit').inc()
+        return default if value is _MISSING else value
     
     def delete(self, key: str):
         """Видалити з кешу"""
+        self.local.delete(key)
         return self.cache.delete(key)
     
-    def delete_pattern(self, pattern: str):
-        """Видалити за паттерном"""
-        try:
-            return self.cache.delete_pattern(f"*{pattern}*")
-        except AttributeError:
-            # Fallback для cache backends що не підтримують delete_pattern
-            logger.warning("Cache backend doesn't support delete_pattern")
-            return 0
-    
     def clear_all(self):
         """Очистити весь кеш"""
+        self.local.clear()
         return self.cache.clear()
     
     # Зручні методи для різних типів даних
+    def products_key(self, store_id: int, suffix: str = 'list') -> str:
+        """Ключ даних продуктів магазину (списки та окремі продукти)"""
+        return self.versioned_key(f"products:store_{store_id}:{suffix}", f"products:store_{store_id}")
+    
     def cache_products(self, store_id: int, products_data, timeout: int = None):
         """Кешувати список продуктів"""
-        key = f"products:store_{store_id}"
-        return self.set(key, products_data, timeout, 'product_list')
+        return self.set(self.products_key(store_id), products_data, timeout, 'product_list')
     
     def get_cached_products(self, store_id: int):
         """Отримати кешовані продукти"""
-        key = f"products:store_{store_id}"
-        return self.get(key)
+        return self.get(self.products_key(store_id), cache_type='product_list')
     
     def invalidate_products(self, store_id: int):
-        """Очистити кеш продуктів"""
-        self.delete_pattern(f"products:store_{store_id}")
-        self.delete_pattern(f"product_")  # Окремі продукти
+        """Очистити кеш продуктів магазину (списки та окремі продукти)"""
+        self.bump_namespace(f"products:store_{store_id}", CATALOG_NAMESPACE)
+    
+    def store_settings_key(self, store_id: int) -> str:
+        return self.versioned_key(f"store_settings:{store_id}", f"store_{store_id}")
     
     def cache_store_settings(self, store_id: int, settings_data, timeout: int = None):
         """Кешувати налаштування магазину"""
-        key = f"store_settings:{store_id}"
-        return self.set(key, settings_data, timeout, 'store_settings')
+        return self.set(self.store_settings_key(store_id), settings_data, timeout, 'store_settings')
     
     def get_cached_store_settings(self, store_id: int):
         """Отримати кешовані налаштування"""
-        key = f"store_settings:{store_id}"
-        return self.get(key)
+        return self.get(self.store_settings_key(store_id), cache_type='store_settings')
+    
+    def user_permissions_key(self, user_id: int) -> str:
+        return self.versioned_key(f"user_permissions:{user_id}", f"user_{user_id}")
     
     def cache_user_permissions(self, user_id: int, permissions_data, timeout: int = None):
         """Кешувати дозволи користувача"""
-        key = f"user_permissions:{user_id}"
-        return self.set(key, permissions_data, timeout, 'user_permissions')
+        return self.set(self.user_permissions_key(user_id), permissions_data, timeout, 'user_permissions')
     
     def get_cached_user_permissions(self, user_id: int):
         """Отримати кешовані дозволи"""
-        key = f"user_permissions:{user_id}"
-        return self.get(key)
+        return self.get(self.user_permissions_key(user_id), cache_type='user_permissions')
+    
+    def stock_key(self, product_id: int, warehouse_id: int) -> str:
+        return self.versioned_key(
+            f"stock:product_{product_id}:warehouse_{warehouse_id}",
+            'stock',
+            f"stock:product_{product_id}",
+            f"stock:warehouse_{warehouse_id}",
+        )
     
     def cache_stock_levels(self, product_id: int, warehouse_id: int, stock_data, timeout: int = None):
         """Кешувати рівні запасів"""
-        key = f"stock:product_{product_id}:warehouse_{warehouse_id}"
-        return self.set(key, stock_data, timeout, 'stock_levels')
+        return self.set(self.stock_key(product_id, warehouse_id), stock_data, timeout, 'stock_levels')
     
     def get_cached_stock_levels(self, product_id: int, warehouse_id: int):
         """Отримати кешовані запаси"""
-        key = f"stock:product_{product_id}:warehouse_{warehouse_id}"
-        return self.get(key)
+        return self.get(self.stock_key(product_id, warehouse_id), cache_type='stock_levels')
     
     def invalidate_stock(self, product_id: int = None, warehouse_id: int = None):
         """Очистити кеш запасів"""
         if product_id and warehouse_id:
-            key = f"stock:product_{product_id}:warehouse_{warehouse_id}"
-            self.delete(key)
+            self.delete(self.stock_key(product_id, warehouse_id))
         elif product_id:
-            self.delete_pattern(f"stock:product_{product_id}")
+            self.bump_namespace(f"stock:product_{product_id}")
         elif warehouse_id:
-            self.delete_pattern(f"stock:warehouse_{warehouse_id}")
+            self.bump_namespace(f"stock:warehouse_{warehouse_id}")
         else:
-            self.delete_pattern("stock:")
+            self.bump_namespace("stock")
 
 
 # Глобальний екземпляр менеджера кешу
 cache_manager = CacheManager()
 
 
-# Сигнали для автоматичного очищення кешу
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+# Відкладене та об'єднане очищення кешу
+class CacheInvalidator:
+    """
+    Буфер інвалідацій простору імен
 
+    Зміни моделей не інвалідовують кеш одразу: простори імен збираються
+    в множину (повтори відкидаються) і версії збільшуються одним проходом
+    після фіксації транзакції. Якщо транзакція відкочується, зайва
+    інвалідація лише змусить перерахувати кеш. Поза транзакцією буфер
+    скидається одразу, а в межах defer() — при виході з блоку.
+    """
 
-@receiver([post_save, post_delete])
-def invalidate_related_cache(sender, instance, **kwargs):
-    """Автоматично очищати пов'язаний кеш при зміні моделей"""
-    
-    # Продукти
-    if sender.__name__ == 'Product':
-        cache_manager.invalidate_products(instance.store_id)
-        try:
-            if hasattr(instance, 'category') and instance.category:
-                cache_manager.delete_pattern(f"category_{instance.category_id}")
-        except (AttributeError, Exception):
-            # Ігноруємо помилки при доступі до category під час видалення
-            pass
-    
-    # Категорії
-    elif sender.__name__ == 'Category':
-        try:
-            cache_manager.invalidate_products(instance.store_id)
-            cache_manager.delete_pattern(f"categories:store_{instance.store_id}")
-        except (AttributeError, Exception):
-            # Ігноруємо помилки при доступі до store під час видалення
-            pass
-    
-    # Магазини
-    elif sender.__name__ == 'Store':
-        cache_manager.delete_pattern(f"store_{instance.id}")
-        cache_manager.delete_pattern(f"store_settings:{instance.id}")
-    
-    # Запаси
-    elif sender.__name__ == 'Stock':
+    def __init__(self):
+        self._local = threading.local()
+
+    def _state(self):
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = set()
+            self._local.depth = 0
+        return self._local
+
+    def add(self, *namespaces: str):
+        """Додати простори імен до буфера"""
+        state = self._state()
+        state.pending.update(namespaces)
+        if not state.depth:
+            self._schedule_flush()
+
+    @contextmanager
+    def defer(self):
+        """Накопичувати інвалідації до виходу з блоку (наприклад, на час запиту)"""
+        state = self._state()
+        state.depth += 1
         try:
-            cache_manager.invalidate_stock(
-                instance.product_id if hasattr(instance, 'product_id') else None,
-                instance.warehouse_id if hasattr(instance, 'warehouse_id') else None
+            yield
+        finally:
+            state.depth -= 1
+            if not state.depth:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        connection = transaction.get_connection()
+        if not connection.in_atomic_block:
+            self.flush()
+            return
+
+        # Одна відкладена скидка на транзакцію; після відкату точки збереження
+        # колбек зникає зі списку, тоді реєструємо його знову
+        if not any(item[1] == self.flush for item in connection.run_on_commit):
+            transaction.on_commit(self.flush)
+
+    def flush(self):
+        """Збільшити версії всіх накопичених просторів імен"""
+        pending = self._state().pending
+        if not pending:
+            return
+        namespaces = sorted(pending)
+        pending.clear()
+
+        cache_manager.bump_namespace(*namespaces)
+        logger.debug(f"Cache namespaces invalidated: {', '.join(namespaces)}")
+
+
+# Глобальний буфер інвалідацій
+cache_invalidator = CacheInvalidator()
+
+
+class CommitBatch:
+    """
+    Ключі, що передаються обробнику одним викликом після фіксації транзакції
+
+    Як CacheInvalidator, але для довільного обробника: повтори ключів
+    відкидаються, а обробник викликається раз на транзакцію з усіма
+    ключами. Поза транзакцією обробник викликається одразу. Після відкату
+    транзакції накопичені ключі відкидаються.
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self._local = threading.local()
+
+    def _state(self):
+        state = self._local
+        if not hasattr(state, 'pending'):
+            state.pending = set()
+            state.scheduled = False
+        if state.scheduled and not any(
+            item[1] == self.flush for item in transaction.get_connection().run_on_commit
+        ):
+            # Транзакцію (або точку збереження з колбеком) відкочено
+            state.pending.clear()
+            state.scheduled = False
+        return state
+
+    def add(self, *keys):
+        """Додати ключі; обробник отримає їх після фіксації транзакції"""
+        state = self._state()
+        state.pending.update(keys)
+        if not transaction.get_connection().in_atomic_block:
+            self.flush()
+        elif not state.scheduled:
+            state.scheduled = True
+            transaction.on_commit(self.flush)
+
+    def is_pending(self, key) -> bool:
+        """Чи очікує ключ фіксації поточної транзакції"""
+        return key in self._state().pending
+
+    def flush(self):
+        """Передати накопичені ключі обробнику"""
+        state = self._local
+        keys = sorted(getattr(state, 'pending', ()))
+        state.pending = set()
+        state.scheduled = False
+        if keys:
+            self.handler(keys)
+
+
+def _product_namespaces(instance):
+    namespaces = [f"products:store_{instance.store_id}", CATALOG_NAMESPACE]
+    if instance.category_id:
+        namespaces.append(f"category_{instance.category_id}")
+    return namespaces
+
+
+def _product_related_namespaces(instance):
+    # Зображення, варіанти та залишки входять у публічне представлення товару
+    return [f"products:store_{instance.product.store_id}", CATALOG_NAMESPACE]
+
+
+def _price_list_item_namespaces(instance):
+    return [f"pricelist:store_{instance.price_list.store_id}"]
+
+
+# Моделі, зміна яких інвалідовує кеш, та простори імен для екземпляра
+CACHE_INVALIDATION_NAMESPACES = {
+    'products.Product': _product_namespaces,
+    'products.Category': lambda instance: [
+        f"products:store_{instance.store_id}",
+        f"categories:store_{instance.store_id}",
+        CATALOG_NAMESPACE,
+    ],
+    'products.ProductImage': _product_related_namespaces,
+    'products.ProductVariant': _product_related_namespaces,
+    'stores.Store': lambda instance: [f"store_{instance.id}"],
+    'stores.StoreBlock': lambda instance: [f"store_{instance.store_id}"],
+    'stores.StoreSocialLink': lambda instance: [f"store_{instance.store_id}"],
+    'warehouse.Stock': lambda instance: [
+        f"stock:product_{instance.product_id}",
+        f"stock:warehouse_{instance.warehouse_id}",
+        *_product_related_namespaces(instance),
+    ],
+    'pricelists.PriceList': lambda instance: [f"pricelist:store_{instance.store_id}"],
+    'pricelists.PriceListItem': _price_list_item_namespaces,
+    'accounts.User': lambda instance: [f"user_{instance.id}"],
+}
+
+
+def invalidate_related_cache(sender, instance, **kwargs):
+    """Поставити в буфер інвалідацію кешу, пов'язаного зі зміненою моделлю"""
+    get_namespaces = CACHE_INVALIDATION_NAMESPACES.get(sender._meta.label)
+    if get_namespaces is None:
+        return
+
+    try:
+        namespaces = get_namespaces(instance)
+    except ObjectDoesNotExist:
+        # Пов'язаний об'єкт вже видалено каскадом — його кеш очищено разом з ним
+        return
+
+    cache_invalidator.add(*namespaces)
+
+
+def connect_cache_invalidation():
+    """Підключити invalidate_related_cache лише до моделей з CACHE_INVALIDATION_NAMESPACES"""
+    from django.apps import apps
+    from django.db.models.signals import post_save, post_delete
+
+    for label in CACHE_INVALIDATION_NAMESPACES:
+        model = apps.get_model(label)
+        for signal in (post_save, post_delete):
+            signal.connect(
+                invalidate_related_cache,
+                sender=model,
+                dispatch_uid=f'cache_invalidation_{label}',
             )
-        except (AttributeError, Exception):
-            # Ігноруємо помилки при доступі до полів під час видалення
-            pass
-    
-    # Прайс-листи
-    elif sender.__name__ in ['PriceList', 'PriceListItem']:
-        try:
-            if hasattr(instance, 'store_id'):
-                cache_manager.delete_pattern(f"pricelist:store_{instance.store_id}")
-            elif hasattr(instance, 'price_list') and hasattr(instance.price_list, 'store_id'):
-                cache_manager.delete_pattern(f"pricelist:store_{instance.price_list.store_id}")
-        except (AttributeError, Exception):
-            # Ігноруємо помилки при доступі до полів під час видалення
-            pass
-    
-    # Користувачі
-    elif sender.__name__ == 'User':
-        cache_manager.delete_pattern(f"user_{instance.id}")
-        cache_manager.delete_pattern(f"user_permissions:{instance.id}")
-    
-    logger.debug(f"Cache invalidated for {sender.__name__} instance {getattr(instance, 'id', None)}")
+
+
+class CacheInvalidationMiddleware:
+    """Middleware, що об'єднує інвалідації кешу в межах одного запиту"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with cache_invalidator.defer():
+            return self.get_response(request)
+
+
+# Умовні GET-запити (ETag)
+
+# Політики Cache-Control для API
+PUBLIC_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=300'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+NO_STORE_CACHE_CONTROL = 'no-cache, no-store, must-revalidate'
+
+
+def make_etag(request, namespaces) -> str:
+    """
+    ETag з версій просторів імен та параметрів запиту
+
+    Тіло відповіді не потрібне: поки версії просторів не змінились,
+    відповідь на той самий запит теж не змінилась. Схема й хост входять
+    у ключ, бо відповіді містять абсолютні посилання (пагінація, media).
+    """
+    versions = cache_manager.get_namespace_versions(namespaces)
+    # Формат обраного рендерера замість сирого Accept: різні браузери отримують той самий ключ
+    renderer = getattr(request, 'accepted_renderer', None)
+    raw = '|'.join([
+        request.scheme,
+        request.get_host(),
+        request.get_full_path(),
+        getattr(renderer, 'format', None) or request.META.get('HTTP_ACCEPT', ''),
+        *(f"{namespace}={versions[namespace]}" for namespace in sorted(versions)),
+    ])
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+class _UncacheableResponse(Exception):
+    """Відповідь view, яку не можна зберегти в кеші відповідей"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _render_cached_response(view, request, etag, *args, **kwargs):
+    """
+    Готове JSON-тіло відповіді з кешу або від view
+
+    Ключ — ETag, тобто версії просторів імен разом з параметрами запиту,
+    тому зміна даних автоматично веде на новий ключ.
+    """
+    def render():
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200 or not hasattr(response, 'data'):
+            raise _UncacheableResponse(response)
+        return JSONRenderer().render(response.data)
+
+    try:
+        body = cache_manager.get_or_set(f"response:{etag}", render, cache_type='public_response')
+    except _UncacheableResponse as e:
+        return e.response
+    return HttpResponse(body, content_type='application/json')
+
+
+def conditional_get(get_namespaces, cache_control: str = PUBLIC_CACHE_CONTROL, cache_response: bool = True):
+    """
+    Декоратор view з підтримкою If-None-Match та кешем відповідей
+
+    get_namespaces(request, *args, **kwargs) повертає простори імен, від яких
+    залежить відповідь. Якщо ETag клієнта збігається, 304 повертається до
+    запитів каталогу та серіалізації. Для JSON-запитів (cache_response)
+    готове тіло відповіді зберігається в кеші та віддається без серіалізаторів.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            etag = make_etag(request, get_namespaces(request, *args, **kwargs))
+            client_etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+            if etag in client_etags or '*' in client_etags:
+                response = HttpResponseNotModified()
+            else:
+                renderer = getattr(request, 'accepted_renderer', None)
+                if cache_response and getattr(renderer, 'format', None) == 'json':
+                    response = _render_cached_response(view, request, etag, *args, **kwargs)
+                else:
+                    response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+
+            response['ETag'] = etag
+            response['Cache-Control'] = cache_control
+            patch_vary_headers(response, ['Accept'])
+            return response
+        return wrapper
+    return decorator
 
 
 # Middleware кешування
@@ -289,13 +751,13 @@ class CacheHeadersMiddleware:
     def __call__(self, request):
         response = self.get_response(request)
         
-        # Додаємо заголовки кешування для API endpoints
-        if request.path.startswith('/api/'):
-            if request.method == 'GET':
-                # Кешуємо GET запити на 5 хвилин
-                response['Cache-Control'] = 'public, max-age=300'
+        # Додаємо заголовки кешування для API endpoints, якщо view не задав власну політику
+        if request.path.startswith('/api/') and not response.has_header('Cache-Control'):
+            if request.method in ('GET', 'HEAD'):
+                # Відповіді можуть залежати від користувача — лише приватний кеш з перевіркою
+                response['Cache-Control'] = PRIVATE_CACHE_CONTROL
             else:
                 # Не кешуємо POST/PUT/DELETE
-                response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
+                response['Cache-Control'] = NO_STORE_CACHE_CONTROL
         
         return response
\ No newline at end of file
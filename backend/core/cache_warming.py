@@ -0,0 +1,169 @@
+"""
+Прогрів кешу публічних вітрин
+
+Статистика звернень до вітрин збирається в пам'яті процесу і періодично
+додається до погодинних лічильників у Redis. Задача прогріву бере
+найпопулярніші магазини за останню добу і заздалегідь будує кешовані
+відповіді публічного каталогу тим самим шляхом, що й реальні запити.
+"""
+
+from collections import Counter
+from typing import Iterable, List
+import heapq
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+logger = logging.getLogger(__name__)
+
+# Погодинні лічильники звернень та вікно статистики
+STATS_BUCKET_SECONDS = 3600
+STATS_WINDOW_BUCKETS = 24
+STATS_KEY = 'cache_warming:store_hits:{bucket}:{store_id}'
+
+# Як часто процес додає накопичені звернення до Redis
+STATS_FLUSH_INTERVAL = 30
+
+# Відкладений прогрів після масових інвалідацій (один на магазин за вікно)
+WARM_SCHEDULE_DELAY = 30
+WARM_SCHEDULED_KEY = 'cache_warming:scheduled:store_{store_id}'
+
+
+class StoreAccessStats:
+    """Лічильник звернень до публічних вітрин магазинів"""
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def record(self, store_id: int):
+        """Врахувати звернення до вітрини магазину"""
+        with self._lock:
+            self._counts[store_id] += 1
+            due = time.monotonic() - self._last_flush >= STATS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Додати накопичені звернення до лічильника поточної години"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            self._last_flush = time.monotonic()
+
+        bucket = int(time.time()) // STATS_BUCKET_SECONDS
+        timeout = STATS_BUCKET_SECONDS * (STATS_WINDOW_BUCKETS + 1)
+        for store_id, count in counts.items():
+            key = STATS_KEY.format(bucket=bucket, store_id=store_id)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, timeout):
+                    cache.incr(key, count)
+
+    def top_stores(self, limit: int, store_ids: Iterable[int]) -> List[int]:
+        """ID найпопулярніших магазинів серед store_ids за вікно статистики"""
+        current = int(time.time()) // STATS_BUCKET_SECONDS
+        buckets = range(current - STATS_WINDOW_BUCKETS + 1, current + 1)
+
+        hits = Counter()
+        for store_id in store_ids:
+            keys = [STATS_KEY.format(bucket=bucket, store_id=store_id) for bucket in buckets]
+            total = sum(cache.get_many(keys).values())
+            if total:
+                hits[store_id] = total
+
+        return [store_id for store_id, _count in heapq.nlargest(limit, hits.items(), key=lambda item: item[1])]
+
+
+# Глобальний лічильник звернень
+store_access_stats = StoreAccessStats()
+
+
+def get_warm_limits():
+    """Кількість магазинів і товарів на магазин для прогріву та пауза між запитами"""
+    return (
+        getattr(settings, 'CACHE_WARMING_TOP_STORES', 50),
+        getattr(settings, 'CACHE_WARMING_PRODUCTS_PER_STORE', 20),
+        getattr(settings, 'CACHE_WARMING_REQUEST_DELAY', 0.2),
+    )
+
+
+def record_store_access(request, store_id: int):
+    """Врахувати звернення до вітрини, крім запитів самого прогріву"""
+    if not getattr(request, 'is_cache_warming', False):
+        store_access_stats.record(store_id)
+
+
+def _warm_path(factory: RequestFactory, path: str) -> int:
+    """
+    Виконати публічний view так само, як запит вітрини, і повернути статус
+
+    Запит іде на публічний хост сайту (settings.SITE_URL): абсолютні
+    посилання пагінації будуються з хоста запиту і потрапляють у кеш.
+    """
+    site = urlsplit(settings.SITE_URL)
+    match = resolve(path)
+    request = factory.get(
+        path, secure=site.scheme == 'https', HTTP_HOST=site.netloc, HTTP_ACCEPT='application/json'
+    )
+    request.is_cache_warming = True
+    response = match.func(request, *match.args, **match.kwargs)
+    return response.status_code
+
+
+def warm_store(store, products_per_store: int, delay: float = 0) -> int:
+    """
+    Прогріти кеш вітрини магазину
+
+    Будує відповіді сторінки магазину, каталогу та найсвіжіших товарів.
+    Між запитами робиться пауза delay, щоб не навантажувати БД.
+    Повертає кількість прогрітих сторінок.
+    """
+    from products.models import Product
+
+    factory = RequestFactory()
+    paths = [
+        reverse('store-by-slug', args=[store.slug]),
+        reverse('store-products', args=[store.slug]),
+    ]
+    product_slugs = (
+        Product.objects.filter(store=store, is_active=True)
+        .order_by('-is_featured', '-updated_at')
+        .values_list('slug', flat=True)[:products_per_store]
+    )
+    paths.extend(reverse('product-by-slug', args=[store.slug, slug]) for slug in product_slugs)
+
+    warmed = 0
+    for path in paths:
+        try:
+            if _warm_path(factory, path) == 200:
+                warmed += 1
+        except Exception as e:
+            logger.warning(f"Cache warming failed for {path}: {e}")
+        if delay:
+            time.sleep(delay)
+    return warmed
+
+
+def warm_top_products() -> bool:
+    """Прогріти кеш добірки популярних товарів"""
+    return _warm_path(RequestFactory(), reverse('top-products')) == 200
+
+
+def schedule_store_warming(store_ids: Iterable[int]):
+    """Запланувати прогрів магазинів після масової інвалідації (з дебаунсом)"""
+    from core.tasks import warm_store_caches
+
+    store_ids = [
+        store_id for store_id in set(store_ids)
+        if cache.add(WARM_SCHEDULED_KEY.format(store_id=store_id), 1, WARM_SCHEDULE_DELAY)
+    ]
+    if store_ids:
+        warm_store_caches.apply_async(args=[sorted(store_ids)], countdown=WARM_SCHEDULE_DELAY)
@@ -6,6 +6,7 @@ Feature Flags система для SaaS платформи
 
 from django.conf import settings
 from django.core.cache import cache
+from core.cache_utils import cache_manager
 from typing import Dict, Any, Optional
 import logging
 
@@ -109,7 +110,7 @@ class FeatureFlags:
             parts.append(f'user_{user_id}')
         if store_id:
             parts.append(f'store_{store_id}')
-        return ':'.join(parts)
+        return cache_manager.versioned_key(':'.join(parts), self.cache_prefix)
     
     def get_user_subscription_type(self, user) -> str:
         """Отримати тип підписки користувача"""
@@ -142,7 +143,7 @@ class FeatureFlags:
         
         # Перевіряємо кеш якщо не примусова перевірка
         if not force_check:
-            cached_result = cache.get(cache_key)
+            cached_result = cache_manager.get(cache_key, cache_type='feature_flags')
             if cached_result is not None:
                 return cached_result
         
@@ -159,7 +160,7 @@ class FeatureFlags:
             result = self._check_user_access(flag_config, user, store)
         
         # Кешуємо результат
-        cache.set(cache_key, result, self.cache_timeout)
+        cache_manager.set(cache_key, result, self.cache_timeout, 'feature_flags')
         return result
     
     def _get_flag_config(self, flag_name: str) -> Optional[Dict[str, Any]]:
@@ -231,8 +232,8 @@ class FeatureFlags:
             )
             cache.delete(cache_key)
         else:
-            # Очищуємо весь кеш feature flags (можна оптимізувати)
-            cache.delete_pattern(f'{self.cache_prefix}:*')
+            # Очищуємо весь кеш feature flags збільшенням версії простору імен
+            cache_manager.bump_namespace(self.cache_prefix)
 
 
 # Глобальний екземпляр
@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cache_metrics import key_namespace
+
+
+class Command(BaseCommand):
+    help = 'Вибіркова статистика ключів Redis: кількість та пам\'ять за просторами імен'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=10000,
+            help='Скільки ключів переглянути (SCAN), решта екстраполюється за DBSIZE',
+        )
+        parser.add_argument(
+            '--depth',
+            type=int,
+            default=1,
+            help='Кількість сегментів ключа, що утворюють простір імен (products → products:store_N)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            from django_redis import get_redis_connection
+            connection = get_redis_connection('default')
+        except Exception as e:
+            raise CommandError(f'Кеш не є Redis або недоступний: {e}')
+
+        # Ключі django-redis мають вигляд "<KEY_PREFIX>:<версія>:<ключ>"
+        key_prefix = settings.CACHES['default'].get('KEY_PREFIX', '')
+        match = f'{key_prefix}:*' if key_prefix else '*'
+
+        counts = defaultdict(int)
+        memory = defaultdict(int)
+        sampled = 0
+        for raw_key in connection.scan_iter(match=match, count=1000):
+            key = raw_key.decode(errors='replace')
+            if key_prefix:
+                key = key.split(':', 2)[-1]
+            namespace = key_namespace(key, options['depth'])
+
+            counts[namespace] += 1
+            memory[namespace] += connection.memory_usage(raw_key) or 0
+            sampled += 1
+            if sampled >= options['sample']:
+                break
+
+        if not sampled:
+            self.stdout.write(self.style.WARNING('Ключів не знайдено'))
+            return
+
+        total_keys = connection.dbsize()
+        scale = max(total_keys / sampled, 1.0)
+        self.stdout.write(
+            f'Переглянуто {sampled} з {total_keys} ключів (коефіцієнт екстраполяції {scale:.1f})'
+        )
+        self.stdout.write(f'{"Простір імен":<40} {"Ключів":>12} {"Пам’ять, КБ":>14} {"Сер. розмір, Б":>15}')
+
+        for namespace in sorted(counts, key=lambda name: memory[name], reverse=True):
+            self.stdout.write(
+                f'{namespace:<40} {int(counts[namespace] * scale):>12} '
+                f'{memory[namespace] * scale / 1024:>14.1f} '
+                f'{memory[namespace] / counts[namespace]:>15.0f}'
+            )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Прогрів кешу вітрин найпопулярніших магазинів (після деплою або очищення Redis)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Кількість магазинів (за замовчуванням CACHE_WARMING_TOP_STORES)',
+        )
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            help='Поставити прогрів у Celery замість виконання в поточному процесі',
+        )
+
+    def handle(self, *args, **options):
+        from core.tasks import warm_popular_store_caches
+
+        if options['celery']:
+            warm_popular_store_caches.delay(options['limit'])
+            self.stdout.write(self.style.SUCCESS('Прогрів кешу поставлено в чергу Celery'))
+            return
+
+        warmed = warm_popular_store_caches(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Прогріто {warmed} сторінок'))
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sitemaps",
+    "django.contrib.postgres",  # Повнотекстовий та триграмний пошук
     # Third party apps
     "rest_framework",
     "rest_framework_simplejwt",
@@ -85,6 +86,7 @@ MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "core.cache_utils.CacheHeadersMiddleware",
+    "core.cache_utils.CacheInvalidationMiddleware",
     "core.request_id.RequestIDMiddleware",
     "core.middleware.RateLimitMiddleware",  # Rate limiting для API
     "core.middleware.CSRFDoubleSubmitMiddleware",  # CSRF для cookie-auth
@@ -310,6 +312,10 @@ CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
 from celery.schedules import crontab
 
 CELERY_BEAT_SCHEDULE = {
+    "warm-popular-store-caches": {
+        "task": "core.tasks.warm_popular_store_caches",
+        "schedule": crontab(minute="*/30"),  # Кожні 30 хвилин
+    },
     "clean-old-notifications": {
         "task": "core.tasks.clean_old_notifications",
         "schedule": crontab(hour=2, minute=0),  # Щодня о 2:00 ночі
@@ -330,6 +336,34 @@ CELERY_BEAT_SCHEDULE = {
         "task": "core.instagram_tasks.cleanup_old_instagram_data",
         "schedule": crontab(hour=3, minute=0),  # Щодня о 3:00 ночі
     },
+    "resume-stalled-pricelist-imports": {
+        "task": "pricelists.tasks.resume_stalled_pricelist_imports",
+        "schedule": crontab(minute="*/5"),  # Кожні 5 хвилин
+    },
+    "snapshot-changed-price-lists": {
+        "task": "pricelists.tasks.snapshot_changed_price_lists",
+        "schedule": crontab(minute="*/30"),  # Кожні 30 хвилин
+    },
+    "prepare-scheduled-price-lists": {
+        "task": "pricelists.tasks.prepare_scheduled_price_lists",
+        "schedule": crontab(minute="*/15"),  # Кожні 15 хвилин
+    },
+    "activate-scheduled-price-lists": {
+        "task": "pricelists.tasks.activate_scheduled_price_lists",
+        "schedule": crontab(minute="*"),  # Щохвилини
+    },
+    "dispatch-price-changes": {
+        "task": "pricelists.tasks.dispatch_price_changes",
+        "schedule": crontab(minute="*"),  # Щохвилини (підстраховка до відкладеного запуску)
+    },
+    "purge-dispatched-price-changes": {
+        "task": "pricelists.tasks.purge_dispatched_price_changes",
+        "schedule": crontab(hour=4, minute=0),  # Щодня о 04:00
+    },
+    "reindex-product-search": {
+        "task": "products.tasks.reindex_product_search",
+        "schedule": crontab(minute="*/10"),  # Кожні 10 хвилин
+    },
 }
 
 # Telegram Bot settings
@@ -375,6 +409,34 @@ ADMIN_INDEX_TITLE = "Панель управління"
 # Feature Flags налаштування
 FEATURE_FLAGS_CACHE_TIMEOUT = 300  # 5 хвилин
 
+# Імпорт прайс-листів: мінімальна схожість назв (0..1) для нечіткого зіставлення товарів
+PRICELIST_IMPORT_MATCH_THRESHOLD = float(os.getenv("PRICELIST_IMPORT_MATCH_THRESHOLD", "0.5"))
+
+# Споживачі подій змін цін (pricelists.outbox), викликаються з порцією подій
+PRICE_CHANGE_CONSUMERS = [
+    "pricelists.outbox.invalidate_changed_products_cache",
+    "pricelists.outbox.record_price_list_snapshots",
+]
+
+# Прогрів кешу вітрин: кількість популярних магазинів, товарів на магазин і пауза між запитами (с)
+CACHE_WARMING_TOP_STORES = int(os.getenv("CACHE_WARMING_TOP_STORES", "50"))
+CACHE_WARMING_PRODUCTS_PER_STORE = int(os.getenv("CACHE_WARMING_PRODUCTS_PER_STORE", "20"))
+CACHE_WARMING_REQUEST_DELAY = float(os.getenv("CACHE_WARMING_REQUEST_DELAY", "0.2"))
+
+# Конфігурації повнотекстового пошуку товарів. Для української мови в PostgreSQL
+# немає стемера, тому її слова індексуються конфігурацією simple без змін форми
+PRODUCT_SEARCH_CONFIGS = os.getenv("PRODUCT_SEARCH_CONFIGS", "simple,russian,english").split(",")
+
+# Межі цінових діапазонів для фасетів каталогу: 0-100, 100-500, ..., 5000+
+CATALOG_PRICE_BANDS = [100, 500, 1000, 5000]
+
+# Коди товарів для сканерів тримаються в пам'яті процесу (products.codes.CodeResolver);
+# False — кожне сканування шукає код в індексі БД
+PRODUCT_CODE_RESOLVER_ENABLED = os.getenv("PRODUCT_CODE_RESOLVER_ENABLED", "True").lower() == "true"
+
+# TTF шрифт з кирилицею для PDF з етикетками товарів (products.labels)
+LABEL_FONT_PATH = os.getenv("LABEL_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
 # Кастомні Feature Flags (перевизначають дефолтні)
 FEATURE_FLAGS = {
     # Увімкнуті для розробки
@@ -850,6 +912,13 @@ UNFOLD = {
                             "admin:pricelists_pricehistory_changelist"
                         ),
                     },
+                    {
+                        "title": "Імпорти прайс-листів",
+                        "icon": "upload_file",
+                        "link": lambda request: reverse_lazy(
+                            "admin:pricelists_pricelistimportjob_changelist"
+                        ),
+                    },
                 ],
             },
             {
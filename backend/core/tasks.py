@@ -504,3 +504,69 @@ def generate_and_send_invoice(order_id):
     except Exception as exc:
         logger.error(f"Помилка при генеруванні рахунку-фактури {order_id}: {exc}")
         return False
+
+
+# ==================== CACHE WARMING TASKS ====================
+
+# Блокування, щоб одночасно працював лише один прогрів
+CACHE_WARMING_LOCK_KEY = "cache_warming:running"
+CACHE_WARMING_LOCK_TIMEOUT = 30 * 60
+
+
+@shared_task
+def warm_popular_store_caches(limit=None):
+    """
+    Прогріти кеш вітрин найпопулярніших магазинів
+
+    Запускається періодично, після деплою (команда warm_cache) та після
+    масових інвалідацій. Магазини обробляються послідовно з паузою між
+    запитами, тому прогрів не створює пікового навантаження на БД.
+    """
+    from django.core.cache import cache
+    from stores.models import Store
+    from core.cache_warming import (
+        get_warm_limits, store_access_stats, warm_store, warm_top_products
+    )
+
+    if not cache.add(CACHE_WARMING_LOCK_KEY, 1, CACHE_WARMING_LOCK_TIMEOUT):
+        logger.info("Прогрів кешу вже виконується")
+        return 0
+
+    try:
+        top_stores, products_per_store, delay = get_warm_limits()
+        store_access_stats.flush()
+
+        active_ids = list(Store.objects.filter(is_active=True).values_list("id", flat=True))
+        store_ids = store_access_stats.top_stores(limit or top_stores, active_ids)
+        if not store_ids:
+            # Статистики ще немає (наприклад, після очищення Redis) — беремо рекомендовані магазини
+            store_ids = list(
+                Store.objects.filter(is_active=True)
+                .order_by("-is_featured", "-updated_at")
+                .values_list("id", flat=True)[: limit or top_stores]
+            )
+
+        stores = Store.objects.in_bulk(store_ids)
+        warmed = 0
+        for store_id in store_ids:
+            if store_id in stores:
+                warmed += warm_store(stores[store_id], products_per_store, delay)
+
+        warm_top_products()
+        logger.info(f"Прогріто {warmed} сторінок для {len(store_ids)} магазинів")
+        return warmed
+    finally:
+        cache.delete(CACHE_WARMING_LOCK_KEY)
+
+
+@shared_task(rate_limit="30/m")
+def warm_store_caches(store_ids):
+    """Прогріти кеш вітрин магазинів після масової інвалідації"""
+    from stores.models import Store
+    from core.cache_warming import get_warm_limits, warm_store
+
+    _top_stores, products_per_store, delay = get_warm_limits()
+    warmed = 0
+    for store in Store.objects.filter(id__in=store_ids, is_active=True):
+        warmed += warm_store(store, products_per_store, delay)
+    return warmed
@@ -0,0 +1,390 @@
+"""
+Тести дворівневого кешу CacheManager
+"""
+import time
+
+import pytest
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from core.cache_utils import (
+    PRIVATE_CACHE_CONTROL, PUBLIC_CACHE_CONTROL, CacheEntry, CacheManager, CommitBatch, LocalCache, cache_invalidator, cache_manager, cache_result,
+    invalidate_related_cache,
+)
+
+
+@pytest.fixture
+def manager():
+    cache.clear()
+    yield CacheManager()
+    cache.clear()
+
+
+class TestLocalCache:
+    """Тести локального LRU-рівня"""
+
+    def test_evicts_least_recently_used(self):
+        """Тест: при переповненні витісняється найдавніший запис"""
+        local = LocalCache(max_entries=2)
+        local.set('a', 1, 10)
+        local.set('b', 2, 10)
+        local.get('a')
+        local.set('c', 3, 10)
+
+        assert local.get('a') == 1
+        assert local.get('b') is None
+        assert local.get('c') == 3
+        assert len(local) == 2
+
+    def test_expired_entry_is_dropped(self):
+        """Тест: запис після закінчення часу життя не повертається"""
+        local = LocalCache()
+        local.set('a', 1, 0.01)
+        time.sleep(0.02)
+
+        assert local.get('a') is None
+
+
+class TestCacheManager:
+    """Тести захисту від лавини перерахунків"""
+
+    def test_get_or_set_computes_once(self, manager):
+        """Тест: повторні виклики не перераховують значення"""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {'items': [1, 2]}
+
+        assert manager.get_or_set('products:store_1', compute, cache_type='product_list') == {'items': [1, 2]}
+        assert manager.get_or_set('products:store_1', compute, cache_type='product_list') == {'items': [1, 2]}
+
+        # Другий процес без локального рівня читає значення з Redis
+        assert CacheManager().get_or_set('products:store_1', compute) == {'items': [1, 2]}
+        assert len(calls) == 1
+
+    def test_stale_value_served_while_other_process_recomputes(self, manager):
+        """Тест: поки ключ перераховує інший процес, віддається старе значення"""
+        cache.set('store_settings:1', CacheEntry('old', time.time() - 1), 60)
+        cache.add('lock:store_settings:1', 1, 30)
+
+        assert manager.get_or_set('store_settings:1', lambda: 'new') == 'old'
+
+        cache.delete('lock:store_settings:1')
+        assert manager.get_or_set('store_settings:1', lambda: 'new') == 'new'
+
+    def test_cold_miss_computes_after_lock_wait(self, manager, monkeypatch):
+        """Тест: якщо власник блокування не встиг, значення рахується самостійно"""
+        monkeypatch.setattr(CacheManager, 'LOCK_WAIT', 0.05)
+        cache.add('lock:products:store_2', 1, 30)
+
+        assert manager.get_or_set('products:store_2', lambda: 'value') == 'value'
+
+    def test_waiter_computes_when_lock_released_without_value(self, manager, monkeypatch):
+        """Тест: якщо власник зняв блокування без значення, очікувач не чекає весь LOCK_WAIT"""
+        cache.add('lock:products:store_4', 1, 30)
+        polls = []
+
+        def sleep(seconds):
+            polls.append(seconds)
+            cache.delete('lock:products:store_4')
+
+        monkeypatch.setattr(time, 'sleep', sleep)
+
+        assert manager.get_or_set('products:store_4', lambda: 'value') == 'value'
+        assert len(polls) == 1
+
+    def test_timeout_jitter(self, manager):
+        """Тест: таймаут не менший за базовий і не перевищує розкид"""
+        timeouts = {manager.get_timeout(cache_type='store_settings') for _ in range(50)}
+
+        assert min(timeouts) >= 3600
+        assert max(timeouts) <= 3600 * (1 + CacheManager.TTL_JITTER)
+
+    def test_delete_clears_local_tier(self, manager):
+        """Тест: видалення ключа прибирає його і з пам'яті процесу"""
+        manager.get_or_set('products:store_3', lambda: 'first')
+        manager.delete('products:store_3')
+
+        assert manager.get_or_set('products:store_3', lambda: 'second') == 'second'
+
+    def test_cache_result_decorator(self, manager):
+        """Тест: декоратор кешує результат функції"""
+        calls = []
+
+        @cache_result(timeout=60, key_prefix='test')
+        def load(store_id):
+            calls.append(store_id)
+            return store_id * 2
+
+        assert load(21) == 42
+        assert load(21) == 42
+        assert calls == [21]
+
+
+class TestCacheNamespaces:
+    """Тести інвалідації через версії просторів імен"""
+
+    def test_versioned_key_contains_namespace_version(self, manager):
+        """Тест: ключ містить версію простору імен"""
+        version = manager.get_namespace_version('products:store_1')
+
+        assert manager.versioned_key('products:store_1') == f'products:store_1:v{version}'
+
+    def test_invalidate_products_bumps_only_store_namespace(self, manager):
+        """Тест: інвалідація продуктів магазину не зачіпає інші магазини"""
+        manager.cache_products(1, ['first'])
+        manager.cache_products(2, ['second'])
+
+        manager.invalidate_products(1)
+
+        assert manager.get_cached_products(1) is None
+        assert manager.get_cached_products(2) == ['second']
+
+    def test_get_or_set_with_versioned_key(self, manager):
+        """Тест: після збільшення версії значення перераховується"""
+        assert manager.get_or_set(manager.products_key(5), lambda: 'old') == 'old'
+
+        manager.bump_namespace('products:store_5')
+
+        assert manager.get_or_set(manager.products_key(5), lambda: 'new') == 'new'
+
+    def test_invalidate_stock_by_warehouse(self, manager):
+        """Тест: очищення запасів складу інвалідовує ключі всіх товарів складу"""
+        manager.cache_stock_levels(1, 10, 5)
+        manager.cache_stock_levels(2, 20, 7)
+
+        manager.invalidate_stock(warehouse_id=10)
+
+        assert manager.get_cached_stock_levels(1, 10) is None
+        assert manager.get_cached_stock_levels(2, 20) == 7
+
+
+class TestCacheInvalidator:
+    """Тести відкладеної інвалідації після фіксації транзакції"""
+
+    @pytest.fixture
+    def bumps(self, monkeypatch):
+        # Скидаємо те, що лишилося в буфері після відкочених транзакцій попередніх тестів
+        cache_invalidator.flush()
+        calls = []
+        monkeypatch.setattr(cache_manager, 'bump_namespace', lambda *namespaces: calls.append(namespaces))
+        return calls
+
+    def test_defer_coalesces_duplicates(self, bumps, django_capture_on_commit_callbacks):
+        """Тест: в межах defer() повтори об'єднуються в одну інвалідацію"""
+        with django_capture_on_commit_callbacks(execute=True):
+            with cache_invalidator.defer():
+                for _ in range(3):
+                    cache_invalidator.add('products:store_1', 'category_1')
+                assert bumps == []
+
+        assert bumps == [('category_1', 'products:store_1')]
+
+    def test_bulk_saves_flush_once_on_commit(self, bumps, test_store):
+        """Тест: масове збереження товарів інвалідовує кеш один раз після коміту"""
+        from products.models import Product
+
+        for i in range(10):
+            Product.objects.create(
+                store=test_store, name=f'Товар {i}', slug=f'bulk-{i}',
+                description='', price=100, sku=f'BULK{i}'
+            )
+
+        connection = transaction.get_connection()
+        scheduled = [item for item in connection.run_on_commit if item[1] == cache_invalidator.flush]
+        assert len(scheduled) == 1
+        assert bumps == []
+
+        cache_invalidator.flush()
+        assert len(bumps) == 1
+        assert f'products:store_{test_store.id}' in bumps[0]
+
+    def test_ignores_unrelated_models(self, bumps, test_user, db):
+        """Тест: зміни моделей без кешу не інвалідовують нічого"""
+        from notifications.models import Notification
+
+        invalidate_related_cache(Notification, Notification(user=test_user))
+
+        assert bumps == []
+
+
+class TestCommitBatch:
+    """Тести обробки ключів після фіксації транзакції"""
+
+    def test_coalesces_keys_until_commit(self, django_capture_on_commit_callbacks):
+        """Тест: повтори ключів передаються обробнику один раз після коміту"""
+        calls = []
+        batch = CommitBatch(calls.append)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            with transaction.atomic():
+                for key in (2, 1, 2, 1):
+                    batch.add(key)
+                assert batch.is_pending(1)
+                assert calls == []
+
+        assert calls == [[1, 2]]
+        assert not batch.is_pending(1)
+
+    def test_rollback_discards_keys(self):
+        """Тест: ключі відкоченої точки збереження відкидаються"""
+        calls = []
+        batch = CommitBatch(calls.append)
+
+        try:
+            with transaction.atomic():
+                batch.add(1)
+                raise ValueError
+        except ValueError:
+            pass
+
+        assert not batch.is_pending(1)
+        batch.flush()
+        assert calls == []
+
+
+class TestConditionalGet:
+    """Тести ETag та політик Cache-Control публічного каталогу"""
+
+    @pytest.fixture
+    def product(self, test_store):
+        from products.models import Product
+
+        product = Product.objects.create(
+            store=test_store, name='Товар', slug='tovar', description='', price=100, sku='ETAG1'
+        )
+        cache_invalidator.flush()
+        return product
+
+    def test_store_products_returns_etag(self, api_client, product):
+        """Тест: публічний каталог має ETag та публічну політику кешування"""
+        response = api_client.get(reverse('store-products', args=['test-store']))
+
+        assert response.status_code == 200
+        assert response['ETag']
+        assert response['Cache-Control'] == PUBLIC_CACHE_CONTROL
+
+    def test_not_modified_skips_catalog_queries(self, api_client, product, django_assert_max_num_queries):
+        """Тест: при збігу ETag повертається 304 без запитів до товарів"""
+        url = reverse('store-products', args=['test-store'])
+        etag = api_client.get(url)['ETag']
+
+        with django_assert_max_num_queries(1):
+            response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 304
+        assert response['ETag'] == etag
+
+    def test_etag_changes_after_product_update(self, api_client, product):
+        """Тест: після зміни товару ETag змінюється"""
+        url = reverse('product-by-slug', args=['test-store', 'tovar'])
+        etag = api_client.get(url)['ETag']
+
+        product.price = 120
+        product.save()
+        cache_invalidator.flush()
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+
+    def test_response_served_from_cache(self, api_client, product, django_assert_max_num_queries):
+        """Тест: повторний запит віддає збережене JSON-тіло без запитів до товарів"""
+        url = reverse('store-products', args=['test-store'])
+        first = api_client.get(url, HTTP_ACCEPT='application/json')
+
+        with django_assert_max_num_queries(1):
+            second = api_client.get(url, HTTP_ACCEPT='application/json')
+
+        assert second.status_code == 200
+        assert second.content == first.content
+        assert second.json()['results'][0]['slug'] == 'tovar'
+
+    def test_cached_response_is_per_host(self, api_client, product, settings):
+        """Тест: відповідь з абсолютними посиланнями не віддається на інший хост"""
+        from products.models import Product
+
+        settings.ALLOWED_HOSTS = ['a.example.com', 'b.example.com']
+        Product.objects.bulk_create([
+            Product(store=product.store, name=f'Товар {i}', slug=f'tovar-{i}', description='', price=100)
+            for i in range(30)
+        ])
+        cache_invalidator.flush()
+        url = reverse('store-products', args=['test-store'])
+
+        first = api_client.get(url, HTTP_ACCEPT='application/json', HTTP_HOST='a.example.com')
+        second = api_client.get(url, HTTP_ACCEPT='application/json', HTTP_HOST='b.example.com')
+
+        assert first['ETag'] != second['ETag']
+        assert first.json()['next'].startswith('http://a.example.com/')
+        assert second.json()['next'].startswith('http://b.example.com/')
+
+    def test_cached_response_invalidated_by_product_change(self, api_client, product):
+        """Тест: після зміни товару кеш відповіді не використовується"""
+        url = reverse('product-by-slug', args=['test-store', 'tovar'])
+        api_client.get(url, HTTP_ACCEPT='application/json')
+
+        product.name = 'Новий товар'
+        product.save()
+        cache_invalidator.flush()
+
+        response = api_client.get(url, HTTP_ACCEPT='application/json')
+        assert response.json()['name'] == 'Новий товар'
+
+    def test_missing_product_is_not_cached(self, api_client, product):
+        """Тест: 404 не зберігається в кеші відповідей"""
+        url = reverse('product-by-slug', args=['test-store', 'missing'])
+
+        assert api_client.get(url, HTTP_ACCEPT='application/json').status_code == 404
+        assert api_client.get(url, HTTP_ACCEPT='application/json').status_code == 404
+
+    def test_owner_endpoints_are_private(self, authenticated_client, test_store):
+        """Тест: відповіді для власника не потрапляють у спільні кеші"""
+        response = authenticated_client.get(reverse('store-list-create'))
+
+        assert response['Cache-Control'] == PRIVATE_CACHE_CONTROL
+
+
+class TestCacheMetrics:
+    """Тести метрик кешу"""
+
+    @staticmethod
+    def sample(name, **labels):
+        from prometheus_client import REGISTRY
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_get_or_set_counts_miss_then_hits(self, manager):
+        """Тест: перший виклик — промах, далі — влучання в локальний рівень та Redis"""
+        before_miss = self.sample('saas_cache_requests_total', cache_type='metrics_test', result='miss')
+        before_local = self.sample('saas_cache_requests_total', cache_type='metrics_test', result='local_hit')
+        before_hit = self.sample('saas_cache_requests_total', cache_type='metrics_test', result='hit')
+
+        manager.get_or_set('metrics:1', 'value', cache_type='metrics_test')
+        manager.get_or_set('metrics:1', 'value', cache_type='metrics_test')
+        CacheManager().get_or_set('metrics:1', 'value', cache_type='metrics_test')
+
+        assert self.sample('saas_cache_requests_total', cache_type='metrics_test', result='miss') == before_miss + 1
+        assert self.sample('saas_cache_requests_total', cache_type='metrics_test', result='local_hit') == before_local + 1
+        assert self.sample('saas_cache_requests_total', cache_type='metrics_test', result='hit') == before_hit + 1
+        assert self.sample('saas_cache_operation_seconds_count', cache_type='metrics_test', operation='set') >= 1
+
+    def test_invalidations_grouped_by_namespace_type(self, manager):
+        """Тест: інвалідації рахуються за типом простору без ідентифікаторів"""
+        before = self.sample('saas_cache_invalidations_total', namespace='stock:warehouse_N')
+
+        manager.invalidate_stock(warehouse_id=1)
+        manager.invalidate_stock(warehouse_id=2)
+
+        assert self.sample('saas_cache_invalidations_total', namespace='stock:warehouse_N') == before + 2
+
+    def test_key_namespace_groups_django_keys(self):
+        """Тест: ключі сесій і сторінок Django без двокрапок групуються за префіксом"""
+        from core.cache_metrics import OTHER_NAMESPACE, key_namespace
+
+        assert key_namespace('products:store_12:list', depth=2) == 'products:store_N'
+        assert key_namespace('django.contrib.sessions.cacheabc123') == 'django.contrib.sessions.cache'
+        assert key_namespace('django.contrib.sessions.cached_dbabc123') == 'django.contrib.sessions.cached_db'
+        assert key_namespace('views.decorators.cache.cache_page..GET.abc.def.uk') == 'views.decorators.cache.cache_page'
+        assert key_namespace('test_key') == OTHER_NAMESPACE
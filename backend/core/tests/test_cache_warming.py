@@ -0,0 +1,96 @@
+"""
+Тести прогріву кешу вітрин
+"""
+import pytest
+from django.core.cache import cache
+from django.urls import reverse
+
+from core.cache_utils import cache_invalidator
+from core.cache_warming import StoreAccessStats, store_access_stats, warm_store
+from core.tasks import warm_popular_store_caches
+
+
+@pytest.fixture(autouse=True)
+def clean_cache(settings):
+    settings.CACHE_WARMING_REQUEST_DELAY = 0
+    cache.clear()
+    yield
+    cache.clear()
+
+
+class TestStoreAccessStats:
+    """Тести статистики звернень до вітрин"""
+
+    def test_top_stores_by_hits(self):
+        """Тест: магазини впорядковані за кількістю звернень"""
+        stats = StoreAccessStats()
+        for store_id, hits in [(1, 3), (2, 10), (3, 1)]:
+            for _ in range(hits):
+                stats.record(store_id)
+        stats.flush()
+
+        assert stats.top_stores(2, [1, 2, 3, 4]) == [2, 1]
+
+    def test_flushes_accumulate(self):
+        """Тест: повторні скидання додаються до лічильника години"""
+        stats = StoreAccessStats()
+        stats.record(1)
+        stats.flush()
+        stats.record(1)
+        stats.record(2)
+        stats.flush()
+
+        assert stats.top_stores(1, [1, 2]) == [1]
+
+
+class TestWarmPopularStoreCaches:
+    """Тести задачі прогріву"""
+
+    @pytest.fixture
+    def product(self, test_store):
+        from products.models import Product
+
+        product = Product.objects.create(
+            store=test_store, name='Товар', slug='tovar', description='', price=100, sku='WARM1'
+        )
+        cache_invalidator.flush()
+        return product
+
+    def test_warmed_catalog_served_without_queries(self, api_client, product, settings,
+                                                   django_assert_max_num_queries):
+        """Тест: після прогріву каталог віддається з кешу"""
+        settings.SITE_URL = 'http://testserver'
+        assert warm_popular_store_caches() == 3
+
+        with django_assert_max_num_queries(1):
+            response = api_client.get(
+                reverse('store-products', args=[product.store.slug]), HTTP_ACCEPT='application/json'
+            )
+
+        assert response.status_code == 200
+        assert response.json()['results'][0]['slug'] == 'tovar'
+
+    def test_skips_when_already_running(self, product):
+        """Тест: другий прогрів не запускається паралельно з першим"""
+        from core.tasks import CACHE_WARMING_LOCK_KEY
+
+        cache.add(CACHE_WARMING_LOCK_KEY, 1, 60)
+
+        assert warm_popular_store_caches() == 0
+
+    def test_warming_uses_public_host_and_skips_stats(self, product, settings, monkeypatch):
+        """Тест: прогрів іде на хост SITE_URL і не впливає на статистику звернень"""
+        from products.models import Product
+
+        settings.SITE_URL = 'https://shop.example.com'
+        settings.ALLOWED_HOSTS = ['shop.example.com']
+        # Більше товарів, ніж на сторінці, — відповідь містить абсолютне посилання next
+        Product.objects.bulk_create([
+            Product(store=product.store, name=f'Товар {i}', slug=f'tovar-{i}', description='', price=100)
+            for i in range(30)
+        ])
+        recorded = []
+        monkeypatch.setattr(store_access_stats, 'record', recorded.append)
+
+        assert warm_store(product.store, 0) == 2
+        assert recorded == []
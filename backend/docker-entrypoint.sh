@@ -30,6 +30,9 @@ if [ "${RUN_MIGRATIONS:-false}" = "true" ]; then
     echo "📁 Collecting static files..."
     python manage.py collectstatic --noinput
 
+    echo "🔥 Scheduling cache warming..."
+    python manage.py warm_cache --celery || echo "⚠️  Cache warming was not scheduled"
+
     if [ "$CREATE_SUPERUSER" = "true" ]; then
         echo "👤 Creating superuser..."
         python manage.py shell -c "
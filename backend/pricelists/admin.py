@@ -3,7 +3,7 @@ from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django.urls import path, reverse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, FileResponse, StreamingHttpResponse
 from django.template.response import TemplateResponse
 from django.utils import timezone
 from django import forms
@@ -14,7 +14,9 @@ from decimal import Decimal
 import json
 import io
 
-from .models import PriceList, PriceListItem, BulkPriceUpdate, PriceHistory
+from .models import (
+    PriceList, PriceListItem, BulkPriceUpdate, PriceHistory, PriceListImportJob, PriceListSnapshot
+)
 from .services import PriceListService
 from .utils.excel_handler import ExcelPriceListHandler
 from products.models import Product, Category
@@ -148,7 +150,7 @@ class PriceListAdmin(ModelAdmin):
     
     actions = [
         'activate_price_lists', 'deactivate_price_lists', 
-        'sync_costs_from_warehouse', 'export_to_excel',
+        'sync_costs_from_warehouse', 'export_to_excel', 'export_to_csv',
         'validate_price_lists'
     ]
     
@@ -243,12 +245,31 @@ class PriceListAdmin(ModelAdmin):
             price_list = queryset.first()
             handler = ExcelPriceListHandler()
             
-            buffer = handler.export_to_excel(price_list)
-            response = HttpResponse(
-                buffer.getvalue(),
+            return FileResponse(
+                handler.export_to_excel(price_list),
+                as_attachment=True,
+                filename=f'pricelist_{price_list.name}.xlsx',
                 content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
             )
-            response['Content-Disposition'] = f'attachment; filename="pricelist_{price_list.name}.xlsx"'
+        else:
+            self.message_user(
+                request,
+                'Оберіть тільки один прайс-лист для експорту.',
+                messages.ERROR
+            )
+    
+    @action(description=_('Експортувати в CSV'))
+    def export_to_csv(self, request, queryset):
+        """Потоковий експорт прайс-листа в CSV"""
+        if queryset.count() == 1:
+            price_list = queryset.first()
+            handler = ExcelPriceListHandler()
+            
+            response = StreamingHttpResponse(
+                handler.iter_export_csv(price_list),
+                content_type='text/csv; charset=utf-8'
+            )
+            response['Content-Disposition'] = f'attachment; filename="pricelist_{price_list.name}.csv"'
             return response
         else:
             self.message_user(
@@ -295,26 +316,18 @@ class PriceListAdmin(ModelAdmin):
             update_existing = request.POST.get('update_existing') == 'on'
             
             if excel_file:
-                handler = ExcelPriceListHandler()
-                result = handler.import_from_excel(
-                    excel_file, price_list, update_existing=update_existing
+                # Імпорт виконується у фоновій задачі, прогрес видно в розділі імпортів
+                job = PriceListService().start_import_job(
+                    price_list, excel_file, request.user, update_existing=update_existing
                 )
                 
-                if result['success']:
-                    messages.success(
-                        request,
-                        f'Успішно імпортовано: створено {result["created"]}, '
-                        f'оновлено {result["updated"]}, пропущено {result["skipped"]}'
-                    )
-                    
-                    if result.get('errors'):
-                        for error in result['errors']:
-                            messages.warning(request, error)
-                else:
-                    for error in result.get('errors', []):
-                        messages.error(request, error)
+                messages.success(
+                    request,
+                    f'Файл "{job.original_filename}" поставлено в чергу на імпорт. '
+                    f'Прогрес можна відстежувати в розділі "Імпорти прайс-листів".'
+                )
                 
-                return redirect('admin:pricelists_pricelist_change', object_id)
+                return redirect('admin:pricelists_pricelistimportjob_change', job.pk)
         
         context = {
             'price_list': price_list,
@@ -497,16 +510,11 @@ class PriceListItemAdmin(ModelAdmin):
     @action(description=_('Перерахувати ціни'))
     def recalculate_prices(self, request, queryset):
         """Перерахунок цін"""
-        updated = 0
-        for item in queryset.filter(is_manual_override=False):
-            old_price = item.final_price
-            item.save()  # Це викличе перерахунок
-            if item.final_price != old_price:
-                updated += 1
+        result = PriceListService().recalculate_items(queryset.filter(is_manual_override=False))
         
         self.message_user(
             request,
-            f'Перераховано {updated} цін.',
+            f'Перераховано {result["updated"]} цін.',
             messages.SUCCESS
         )
     
@@ -614,7 +622,7 @@ class BulkPriceUpdateAdmin(ModelAdmin):
 
 @admin.register(PriceHistory)
 class PriceHistoryAdmin(ModelAdmin):
-    """Адмін для історії зміни цін"""
+    """Адмін для архіву історії зміни цін (записи до появи знімків цін)"""
     
     list_display = [
         'price_list_item', 'change_reason', 'price_change_display',
@@ -689,4 +697,121 @@ class PriceHistoryAdmin(ModelAdmin):
                 color, arrow, obj.old_cost, obj.new_cost, change
             )
         return '-'
-    cost_change_display.short_description = _('Зміна собівартості')
\ No newline at end of file
+    cost_change_display.short_description = _('Зміна собівартості')
+    
+    def has_add_permission(self, request):
+        # Архів: нові зміни цін фіксуються знімками (PriceListSnapshot)
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PriceListImportJob)
+class PriceListImportJobAdmin(ModelAdmin):
+    """Адмін для фонових імпортів прайс-листів"""
+    
+    list_display = [
+        'original_filename', 'price_list', 'status', 'progress_display',
+        'created_count', 'updated_count', 'skipped_count', 'created_by', 'created_at'
+    ]
+    list_filter = [
+        'status',
+        ('price_list', RelatedDropdownFilter),
+        ('created_at', RangeDateFilter)
+    ]
+    search_fields = ['original_filename', 'price_list__name']
+    ordering = ['-created_at']
+    
+    fieldsets = (
+        (_('Основна інформація'), {
+            'fields': ('price_list', 'file', 'original_filename', 'update_existing', 'created_by')
+        }),
+        (_('Прогрес'), {
+            'fields': (
+                'status', 'total_rows', 'processed_rows', 'created_count',
+                'updated_count', 'skipped_count', 'attempts'
+            )
+        }),
+        (_('Помилки'), {
+            'fields': ('errors_display',),
+            'classes': ['collapse']
+        }),
+        (_('Метадані'), {
+            'fields': ('column_mapping', 'started_at', 'finished_at', 'created_at', 'updated_at'),
+            'classes': ['collapse']
+        }),
+    )
+    readonly_fields = [
+        'price_list', 'file', 'original_filename', 'update_existing', 'created_by',
+        'status', 'total_rows', 'processed_rows', 'created_count', 'updated_count',
+        'skipped_count', 'attempts', 'errors_display', 'column_mapping',
+        'started_at', 'finished_at', 'created_at', 'updated_at'
+    ]
+    
+    actions = ['resume_imports']
+    
+    def has_add_permission(self, request):
+        # Імпорти створюються через форму імпорту прайс-листа
+        return False
+    
+    def progress_display(self, obj):
+        """Відображення прогресу імпорту"""
+        return f'{obj.processed_rows}/{obj.total_rows} ({obj.progress_percentage}%)'
+    progress_display.short_description = _('Прогрес')
+    
+    def errors_display(self, obj):
+        """Відображення помилок імпорту"""
+        if not obj.errors:
+            return '-'
+        return format_html('<pre>{}</pre>', '\n'.join(obj.errors))
+    errors_display.short_description = _('Помилки')
+    
+    @action(description=_('Продовжити імпорт з контрольної точки'))
+    def resume_imports(self, request, queryset):
+        """Повторний запуск незавершених імпортів"""
+        from .tasks import process_pricelist_import
+        
+        resumed = 0
+        for job in queryset.exclude(status='completed'):
+            job.status = 'pending'
+            job.finished_at = None
+            job.save(update_fields=['status', 'finished_at', 'updated_at'])
+            process_pricelist_import.delay(str(job.id))
+            resumed += 1
+        
+        self.message_user(
+            request,
+            f'Перезапущено {resumed} імпортів.',
+            messages.SUCCESS
+        )
+
+
+@admin.register(PriceListSnapshot)
+class PriceListSnapshotAdmin(ModelAdmin):
+    """Адмін для знімків цін прайс-листів"""
+    
+    list_display = [
+        'price_list', 'version', 'is_full', 'items_count', 'changed_count',
+        'change_reason', 'created_by', 'created_at'
+    ]
+    list_filter = [
+        'is_full',
+        'change_reason',
+        ('price_list', RelatedDropdownFilter),
+        ('created_at', RangeDateFilter)
+    ]
+    search_fields = ['price_list__name']
+    ordering = ['-created_at']
+    exclude = ['data']
+    readonly_fields = [
+        'price_list', 'version', 'is_full', 'items_count', 'changed_count',
+        'change_reason', 'bulk_update', 'created_by', 'created_at'
+    ]
+    
+    def has_add_permission(self, request):
+        # Знімки створюються автоматично після змін прайс-листа
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PricelistsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pricelists'
+
+    def ready(self):
+        import pricelists.signals  # noqa: F401
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Q
 from decimal import Decimal
 from pricelists.models import PriceListItem
 
@@ -20,16 +21,13 @@ class Command(BaseCommand):
         # Знаходимо проблемні записи
         problematic_items = []
         
-        for item in PriceListItem.objects.all():
-            needs_fix = False
-            reason = ""
-            
-            if not item.final_price or item.final_price <= 0:
-                needs_fix = True
-                reason = "final_price is None or <= 0"
-            
-            if needs_fix:
-                problematic_items.append((item, reason))
+        # Фільтруємо на стороні БД, щоб не завантажувати всі позиції
+        candidates = PriceListItem.objects.filter(
+            Q(final_price__isnull=True) | Q(final_price__lte=0)
+        ).select_related('product', 'price_list')
+        
+        for item in candidates.iterator(chunk_size=1000):
+            problematic_items.append((item, "final_price is None or <= 0"))
         
         if not problematic_items:
             self.stdout.write(
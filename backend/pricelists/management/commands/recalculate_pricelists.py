@@ -0,0 +1,122 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
+
+from pricelists.models import PriceList
+
+
+def _recalculate_worker(price_list_id, chunk_size):
+    """Перерахунок одного прайс-листа в окремому процесі"""
+    from pricelists.services import PriceListService
+
+    price_list = PriceList.objects.get(id=price_list_id)
+    started = time.monotonic()
+    result = PriceListService().recalculate_price_list(price_list, chunk_size)
+    result['seconds'] = time.monotonic() - started
+    connections.close_all()
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Паралельний перерахунок цін прайс-листів (по процесу на прайс-лист)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--store',
+            type=int,
+            action='append',
+            dest='store_ids',
+            help='ID магазину (можна вказати кілька разів); за замовчуванням усі магазини',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Кількість процесів (за замовчуванням кількість CPU)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Розмір порції для iterator() та bulk_update',
+        )
+        parser.add_argument(
+            '--celery',
+            action='store_true',
+            help='Поставити перерахунок у Celery (chord) замість локального пулу процесів',
+        )
+
+    def handle(self, *args, **options):
+        store_ids = options['store_ids']
+        chunk_size = options['chunk_size']
+
+        if options['celery']:
+            from pricelists.tasks import recalculate_all_price_lists
+
+            recalculate_all_price_lists.delay(store_ids, chunk_size)
+            self.stdout.write(self.style.SUCCESS('Перерахунок поставлено в чергу Celery'))
+            return
+
+        price_lists = PriceList.objects.all()
+        if store_ids:
+            price_lists = price_lists.filter(store_id__in=store_ids)
+
+        # Найбільші прайс-листи запускаємо першими, щоб процеси завершились приблизно одночасно
+        shards = list(
+            price_lists.annotate(items_total=Count('items'))
+            .order_by('-items_total')
+            .values_list('id', 'name', 'items_total')
+        )
+        if not shards:
+            self.stdout.write(self.style.WARNING('Не знайдено прайс-листів для перерахунку'))
+            return
+
+        workers = max(1, min(options['workers'], len(shards)))
+        self.stdout.write(
+            f'Перерахунок {len(shards)} прайс-листів '
+            f'({sum(shard[2] for shard in shards)} позицій) у {workers} процесах...'
+        )
+
+        # Дочірні процеси не повинні успадковувати відкриті з'єднання з БД
+        connections.close_all()
+
+        names = {price_list_id: name for price_list_id, name, _total in shards}
+        processed = updated = failed = 0
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('fork')) as executor:
+            futures = {
+                executor.submit(_recalculate_worker, price_list_id, chunk_size): price_list_id
+                for price_list_id, _name, _total in shards
+            }
+            for future in as_completed(futures):
+                price_list_id = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(f'✗ {names[price_list_id]}: {e}'))
+                    continue
+
+                processed += result['processed']
+                updated += result['updated']
+                rate = result['processed'] / max(result['seconds'], 0.001)
+                self.stdout.write(
+                    f'✓ {names[price_list_id]}: {result["processed"]} позицій, '
+                    f'змінено {result["updated"]} ({rate:.0f} позицій/с)'
+                )
+
+        elapsed = max(time.monotonic() - started, 0.001)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Перераховано {processed} позицій, змінено {updated} за {elapsed:.1f} с '
+                f'({processed / elapsed:.0f} позицій/с)'
+            )
+        )
+        if failed:
+            self.stdout.write(self.style.ERROR(f'Не вдалося перерахувати {failed} прайс-листів'))
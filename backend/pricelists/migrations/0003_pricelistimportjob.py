@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:36
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0002_alter_pricelistitem_final_price'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceListImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='pricelist_imports/%Y/%m/', verbose_name='Файл імпорту')),
+                ('original_filename', models.CharField(blank=True, max_length=255, verbose_name='Назва файлу')),
+                ('column_mapping', models.JSONField(blank=True, default=dict, verbose_name='Відповідність колонок')),
+                ('update_existing', models.BooleanField(default=True, verbose_name='Оновлювати існуючі позиції')),
+                ('status', models.CharField(choices=[('pending', 'Очікує'), ('processing', 'Обробляється'), ('completed', 'Завершено'), ('failed', 'Помилка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Всього рядків')),
+                ('processed_rows', models.PositiveIntegerField(default=0, help_text='Контрольна точка: з цього рядка імпорт продовжиться після збою', verbose_name='Оброблено рядків')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Створено позицій')),
+                ('updated_count', models.PositiveIntegerField(default=0, verbose_name='Оновлено позицій')),
+                ('skipped_count', models.PositiveIntegerField(default=0, verbose_name='Пропущено рядків')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Помилки')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Кількість запусків')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Початок обробки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершення обробки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Оновлено')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pricelist_import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Створено користувачем')),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='pricelists.pricelist', verbose_name='Прайс-лист')),
+            ],
+            options={
+                'verbose_name': 'Імпорт прайс-листа',
+                'verbose_name_plural': 'Імпорти прайс-листів',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='pricelists__status_0b5d86_idx')],
+            },
+        ),
+    ]
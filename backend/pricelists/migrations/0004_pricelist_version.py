@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0003_pricelistimportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricelist',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Збільшується при кожній зміні прайс-листа або його позицій', verbose_name='Версія'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:49
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0004_pricelist_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceListSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField(verbose_name='Версія прайс-листа')),
+                ('is_full', models.BooleanField(default=False, verbose_name='Повний знімок')),
+                ('data', models.BinaryField(verbose_name='Дані знімка')),
+                ('items_count', models.PositiveIntegerField(default=0, verbose_name='Позицій у прайс-листі')),
+                ('changed_count', models.PositiveIntegerField(default=0, verbose_name='Змінено позицій')),
+                ('change_reason', models.CharField(choices=[('manual', 'Ручна зміна'), ('cost_update', 'Оновлення собівартості'), ('bulk_update', 'Масове оновлення'), ('supply', 'Постачання'), ('competitor_price', 'Зміна цін конкурентів'), ('seasonal', 'Сезонна зміна'), ('promotion', 'Акція')], default='manual', max_length=20, verbose_name='Причина зміни')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('bulk_update', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='pricelists.bulkpriceupdate', verbose_name='Масове оновлення')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Створено користувачем')),
+                ('price_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='pricelists.pricelist', verbose_name='Прайс-лист')),
+            ],
+            options={
+                'verbose_name': 'Знімок цін прайс-листа',
+                'verbose_name_plural': 'Знімки цін прайс-листів',
+                'ordering': ['price_list', 'version'],
+                'indexes': [models.Index(fields=['price_list', 'created_at'], name='pricelists__price_l_98842f_idx')],
+                'unique_together': {('price_list', 'version')},
+            },
+        ),
+    ]
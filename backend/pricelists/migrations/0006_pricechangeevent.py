@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0005_pricelistsnapshot'),
+        ('products', '0009_category_product_category'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('source', models.CharField(choices=[('pricelist_item', 'Позиція прайс-листа'), ('product', 'Товар')], max_length=20, verbose_name='Джерело зміни')),
+                ('old_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Стара ціна')),
+                ('new_price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Нова ціна')),
+                ('version', models.PositiveIntegerField(blank=True, null=True, verbose_name='Версія прайс-листа')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Доставлено')),
+                ('price_list', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='price_change_events', to='pricelists.pricelist', verbose_name='Прайс-лист')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='price_change_events', to='products.product', verbose_name='Товар')),
+                ('store', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='price_change_events', to='stores.store', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Подія зміни ціни',
+                'verbose_name_plural': 'Події зміни цін',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['dispatched_at', 'id'], name='pricelists__dispatc_24ae7d_idx')],
+            },
+        ),
+    ]
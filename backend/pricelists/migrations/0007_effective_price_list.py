@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 10:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0006_pricechangeevent'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricelist',
+            name='prepared_version',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Версія, для якої ціни заздалегідь перераховані перед запланованою активацією', null=True, verbose_name='Підготовлена версія'),
+        ),
+        migrations.CreateModel(
+            name='EffectivePriceList',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Активовано')),
+                ('price_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='pricelists.pricelist', verbose_name='Прайс-лист')),
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='effective_price_list', to='stores.store', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Діючий прайс-лист магазину',
+                'verbose_name_plural': 'Діючі прайс-листи магазинів',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:20
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+from pricelists.utils.snapshot_codec import pack_snapshot
+
+
+def seed_snapshots(apps, schema_editor):
+    """Повний знімок поточних цін для прайс-листів без історії (як PriceSnapshotService.create_snapshot)"""
+    PriceList = apps.get_model('pricelists', 'PriceList')
+    PriceListItem = apps.get_model('pricelists', 'PriceListItem')
+    PriceListSnapshot = apps.get_model('pricelists', 'PriceListSnapshot')
+
+    # SQL-аналог PriceListItemQuerySet.with_cost
+    effective_cost = models.Case(
+        models.When(cost_calculation_method='manual', manual_cost__gt=0, then=models.F('manual_cost')),
+        models.When(calculated_cost__gt=0, then=models.F('calculated_cost')),
+        default=models.Value(Decimal('0')),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2)
+    )
+
+    for price_list in PriceList.objects.filter(snapshots__isnull=True).iterator():
+        rows = list(
+            PriceListItem.objects.filter(price_list=price_list).annotate(effective_cost=effective_cost)
+            .order_by().values_list('product_id', 'final_price', 'effective_cost')
+        )
+        PriceListSnapshot.objects.create(
+            price_list=price_list,
+            version=price_list.version,
+            is_full=True,
+            data=pack_snapshot(rows),
+            items_count=len(rows),
+            changed_count=len(rows),
+            change_reason='manual',
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0007_effective_price_list'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
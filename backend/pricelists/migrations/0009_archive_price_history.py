@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricelists', '0008_seed_price_list_snapshots'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pricehistory',
+            options={'ordering': ['-changed_at'], 'verbose_name': 'Історія зміни ціни (архів)', 'verbose_name_plural': 'Історія зміни цін (архів)'},
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -81,6 +81,12 @@ class PriceList(models.Model):
         blank=True,
         verbose_name=_('Остання синхронізація собівартості')
     )
+    version = models.PositiveIntegerField(
+        default=1,
+        editable=False,
+        verbose_name=_('Версія'),
+        help_text=_('Збільшується при кожній зміні прайс-листа або його позицій')
+    )
     
     # Валідність прайс-листа
     valid_from = models.DateTimeField(
@@ -93,6 +99,13 @@ class PriceList(models.Model):
         blank=True,
         verbose_name=_('Діє до')
     )
+    prepared_version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_('Підготовлена версія'),
+        help_text=_('Версія, для якої ціни заздалегідь перераховані перед запланованою активацією')
+    )
     
     # Метадані
     created_by = models.ForeignKey(
@@ -128,6 +141,16 @@ class PriceList(models.Model):
             return False
         return self.is_active
     
+    def bump_version(self):
+        """Атомарно збільшити версію прайс-листа (інвалідовує кеші, прив'язані до версії)"""
+        PriceList.objects.filter(pk=self.pk).update(version=models.F('version') + 1)
+        self.version = PriceList.objects.filter(pk=self.pk).values_list('version', flat=True).first()
+        return self.version
+    
+    def get_current_version(self):
+        """Актуальна версія з БД (екземпляр у пам'яті може бути застарілим)"""
+        return PriceList.objects.filter(pk=self.pk).values_list('version', flat=True).first()
+    
     def save(self, *args, **kwargs):
         # Тільки один прайс-лист може бути за замовчуванням для магазину
         if self.is_default:
@@ -139,6 +162,87 @@ class PriceList(models.Model):
         super().save(*args, **kwargs)
 
 
+class EffectivePriceList(models.Model):
+    """
+    Діючий прайс-лист магазину
+    
+    Вказівник, за яким визначаються ціни вітрини. Перемикається одним
+    оновленням рядка (вручну або задачею запланованої активації), тому
+    перехід на новий прайс-лист відбувається миттєво.
+    """
+    
+    store = models.OneToOneField(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='effective_price_list',
+        verbose_name=_('Магазин')
+    )
+    price_list = models.ForeignKey(
+        PriceList,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name=_('Прайс-лист')
+    )
+    activated_at = models.DateTimeField(default=timezone.now, verbose_name=_('Активовано'))
+
+    class Meta:
+        verbose_name = _('Діючий прайс-лист магазину')
+        verbose_name_plural = _('Діючі прайс-листи магазинів')
+
+    def __str__(self):
+        return f"{self.store_id} → {self.price_list_id or '-'}"
+
+
+class PriceListItemQuerySet(models.QuerySet):
+    """QuerySet позицій прайс-листа з розрахунками на стороні БД"""
+    
+    def with_cost(self):
+        """
+        Анотація effective_cost — SQL-аналог властивості current_cost
+        
+        Ручна собівартість має пріоритет для методу 'manual', далі розрахована.
+        Запасний розрахунок через склад (get_average_cost) в SQL недоступний,
+        тому для позицій без собівартості effective_cost дорівнює 0.
+        """
+        return self.annotate(
+            effective_cost=models.Case(
+                models.When(
+                    cost_calculation_method='manual',
+                    manual_cost__gt=0,
+                    then=models.F('manual_cost')
+                ),
+                models.When(calculated_cost__gt=0, then=models.F('calculated_cost')),
+                default=models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+    
+    def with_profit(self):
+        """Анотації effective_cost, effective_profit та effective_margin (у відсотках)"""
+        queryset = self if 'effective_cost' in self.query.annotations else self.with_cost()
+        return queryset.annotate(
+            effective_profit=models.Case(
+                models.When(
+                    effective_cost__gt=0,
+                    then=models.F('final_price') - models.F('effective_cost')
+                ),
+                default=models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2)
+            ),
+            effective_margin=models.Case(
+                models.When(
+                    effective_cost__gt=0,
+                    then=(models.F('final_price') - models.F('effective_cost'))
+                    * models.Value(Decimal('100')) / models.F('effective_cost')
+                ),
+                default=models.Value(Decimal('0')),
+                output_field=models.DecimalField(max_digits=12, decimal_places=4)
+            )
+        )
+
+
 class PriceListItem(models.Model):
     """Позиція прайс-листа"""
     
@@ -288,6 +392,8 @@ class PriceListItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Створено'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Оновлено'))
 
+    objects = PriceListItemQuerySet.as_manager()
+
     class Meta:
         verbose_name = _('Позиція прайс-листа')
         verbose_name_plural = _('Позиції прайс-листа')
@@ -377,8 +483,15 @@ class PriceListItem(models.Model):
         return calculated_price
     
     def save(self, *args, **kwargs):
+        self.apply_pricing()
+        # Сигнали post_save (версія, outbox змін цін) виконуються в цій же транзакції
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def apply_pricing(self):
+        """Заповнити категорію та розрахувати фінальну ціну без збереження"""
         # Автоматично заповнюємо категорію з товару
-        if not self.category and self.product.category:
+        if not self.category_id and self.product.category_id:
             self.category = self.product.category
         
         # Розраховуємо ціну якщо не встановлена вручну
@@ -399,8 +512,6 @@ class PriceListItem(models.Model):
         # Фінальна перевірка - final_price ніколи не повинна бути None або 0
         if not self.final_price or self.final_price <= 0:
             self.final_price = self.product.price or Decimal('0.01')
-        
-        super().save(*args, **kwargs)
 
 
 class BulkPriceUpdate(models.Model):
@@ -501,7 +612,12 @@ class BulkPriceUpdate(models.Model):
 
 
 class PriceHistory(models.Model):
-    """Історія зміни цін"""
+    """
+    Архів історії зміни цін
+
+    Нові записи не створюються: зміни цін фіксуються знімками
+    (PriceListSnapshot), з яких будується API історії цін.
+    """
     
     CHANGE_REASON_CHOICES = [
         ('manual', _('Ручна зміна')),
@@ -576,8 +692,8 @@ class PriceHistory(models.Model):
     changed_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Час зміни'))
 
     class Meta:
-        verbose_name = _('Історія зміни ціни')
-        verbose_name_plural = _('Історія зміни цін')
+        verbose_name = _('Історія зміни ціни (архів)')
+        verbose_name_plural = _('Історія зміни цін (архів)')
         ordering = ['-changed_at']
 
     def __str__(self):
@@ -588,4 +704,228 @@ class PriceHistory(models.Model):
         """Відсоток зміни ціни"""
         if self.old_price and self.new_price and self.old_price > 0:
             return ((self.new_price - self.old_price) / self.old_price) * 100
-        return Decimal('0')
\ No newline at end of file
+        return Decimal('0')
+
+class PriceListSnapshot(models.Model):
+    """
+    Знімок цін прайс-листа
+    
+    Повний знімок містить усі позиції, інші — лише різницю з попереднім
+    знімком. Дані зберігаються стисненими колонками (utils.snapshot_codec).
+    """
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    price_list = models.ForeignKey(
+        PriceList,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name=_('Прайс-лист')
+    )
+    version = models.PositiveIntegerField(verbose_name=_('Версія прайс-листа'))
+    is_full = models.BooleanField(default=False, verbose_name=_('Повний знімок'))
+    data = models.BinaryField(verbose_name=_('Дані знімка'))
+    items_count = models.PositiveIntegerField(default=0, verbose_name=_('Позицій у прайс-листі'))
+    changed_count = models.PositiveIntegerField(default=0, verbose_name=_('Змінено позицій'))
+    
+    # Метадані зміни
+    change_reason = models.CharField(
+        max_length=20,
+        choices=PriceHistory.CHANGE_REASON_CHOICES,
+        default='manual',
+        verbose_name=_('Причина зміни')
+    )
+    bulk_update = models.ForeignKey(
+        BulkPriceUpdate,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_('Масове оновлення')
+    )
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name=_('Створено користувачем')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Створено'))
+
+    class Meta:
+        verbose_name = _('Знімок цін прайс-листа')
+        verbose_name_plural = _('Знімки цін прайс-листів')
+        ordering = ['price_list', 'version']
+        unique_together = ['price_list', 'version']
+        indexes = [
+            models.Index(fields=['price_list', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.price_list.name} - v{self.version}"
+
+
+class PriceChangeEvent(models.Model):
+    """
+    Подія зміни ціни (outbox)
+    
+    Записується в тій самій транзакції, що й зміна ціни позиції прайс-листа
+    або товару, та пакетно доставляється споживачам задачею
+    pricelists.tasks.dispatch_price_changes.
+    """
+    
+    SOURCE_CHOICES = [
+        ('pricelist_item', _('Позиція прайс-листа')),
+        ('product', _('Товар')),
+    ]
+    
+    id = models.BigAutoField(primary_key=True)
+    # Без обмежень FK: подія може пережити видалення товару чи прайс-листа
+    # (наприклад, подія видалення позиції під час каскадного видалення)
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='price_change_events',
+        verbose_name=_('Магазин')
+    )
+    product = models.ForeignKey(
+        'products.Product',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='price_change_events',
+        verbose_name=_('Товар')
+    )
+    price_list = models.ForeignKey(
+        PriceList,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='price_change_events',
+        verbose_name=_('Прайс-лист')
+    )
+    source = models.CharField(
+        max_length=20,
+        choices=SOURCE_CHOICES,
+        verbose_name=_('Джерело зміни')
+    )
+    old_price = models.DecimalField(
+        _('Стара ціна'),
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+    new_price = models.DecimalField(
+        _('Нова ціна'),
+        max_digits=10,
+        decimal_places=2,
+        null=True,
+        blank=True
+    )
+    version = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('Версія прайс-листа')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Створено'))
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Доставлено'))
+
+    class Meta:
+        verbose_name = _('Подія зміни ціни')
+        verbose_name_plural = _('Події зміни цін')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['dispatched_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.old_price} → {self.new_price}"
+
+
+class PriceListImportJob(models.Model):
+    """Фоновий імпорт прайс-листа з Excel файлу"""
+    
+    STATUS_CHOICES = [
+        ('pending', _('Очікує')),
+        ('processing', _('Обробляється')),
+        ('completed', _('Завершено')),
+        ('failed', _('Помилка')),
+    ]
+    
+    # Максимальна кількість повідомлень про помилки, що зберігаються в задачі
+    MAX_STORED_ERRORS = 500
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    price_list = models.ForeignKey(
+        PriceList,
+        on_delete=models.CASCADE,
+        related_name='import_jobs',
+        verbose_name=_('Прайс-лист')
+    )
+    file = models.FileField(
+        upload_to='pricelist_imports/%Y/%m/',
+        verbose_name=_('Файл імпорту')
+    )
+    original_filename = models.CharField(max_length=255, blank=True, verbose_name=_('Назва файлу'))
+    column_mapping = models.JSONField(default=dict, blank=True, verbose_name=_('Відповідність колонок'))
+    update_existing = models.BooleanField(default=True, verbose_name=_('Оновлювати існуючі позиції'))
+    
+    # Стан виконання
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name=_('Статус')
+    )
+    total_rows = models.PositiveIntegerField(default=0, verbose_name=_('Всього рядків'))
+    processed_rows = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Оброблено рядків'),
+        help_text=_('Контрольна точка: з цього рядка імпорт продовжиться після збою')
+    )
+    created_count = models.PositiveIntegerField(default=0, verbose_name=_('Створено позицій'))
+    updated_count = models.PositiveIntegerField(default=0, verbose_name=_('Оновлено позицій'))
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name=_('Пропущено рядків'))
+    errors = models.JSONField(default=list, blank=True, verbose_name=_('Помилки'))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Кількість запусків'))
+    
+    # Метадані
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='pricelist_import_jobs',
+        verbose_name=_('Створено користувачем')
+    )
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Початок обробки'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Завершення обробки'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Створено'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Оновлено'))
+
+    class Meta:
+        verbose_name = _('Імпорт прайс-листа')
+        verbose_name_plural = _('Імпорти прайс-листів')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.price_list.name} - {self.original_filename or self.file.name}"
+    
+    @property
+    def progress_percentage(self):
+        """Прогрес обробки (у відсотках)"""
+        if not self.total_rows:
+            return 100 if self.status == 'completed' else 0
+        return round(self.processed_rows * 100 / self.total_rows, 1)
+    
+    @property
+    def is_finished(self):
+        """Чи завершено обробку (успішно або з помилкою)"""
+        return self.status in ('completed', 'failed')
+    
+    def add_errors(self, messages):
+        """Додати повідомлення про помилки з обмеженням розміру списку"""
+        free_slots = self.MAX_STORED_ERRORS - len(self.errors)
+        if free_slots > 0:
+            self.errors.extend(messages[:free_slots])
@@ -0,0 +1,89 @@
+"""
+Outbox змін цін: запис подій та доставка споживачам
+"""
+
+from collections import defaultdict
+from typing import Iterable, List
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Затримка перед доставкою, щоб зміни за кілька секунд пішли однією порцією
+DISPATCH_DELAY_SECONDS = 5
+
+DISPATCH_SCHEDULED_KEY = 'pricelist:outbox_dispatch_scheduled'
+
+DEFAULT_CONSUMERS = [
+    'pricelists.outbox.invalidate_changed_products_cache',
+    'pricelists.outbox.record_price_list_snapshots',
+]
+
+
+def record_price_changes(events: Iterable) -> int:
+    """
+    Записати події змін цін (PriceChangeEvent) та запланувати доставку
+
+    Викликається всередині транзакції, що змінює ціни, тому подія
+    з'являється тоді й лише тоді, коли зміна зафіксована.
+    """
+    from .models import PriceChangeEvent
+
+    events = [event for event in events if event.old_price != event.new_price]
+    if not events:
+        return 0
+
+    PriceChangeEvent.objects.bulk_create(events, batch_size=1000)
+    transaction.on_commit(schedule_dispatch)
+    return len(events)
+
+
+def schedule_dispatch():
+    """Запланувати одну доставку на DISPATCH_DELAY_SECONDS замість задачі на кожну зміну"""
+    from .tasks import dispatch_price_changes
+
+    if cache.add(DISPATCH_SCHEDULED_KEY, 1, DISPATCH_DELAY_SECONDS):
+        dispatch_price_changes.apply_async(countdown=DISPATCH_DELAY_SECONDS)
+
+
+def get_consumers() -> List:
+    """Споживачі подій із settings.PRICE_CHANGE_CONSUMERS (шляхи до функцій)"""
+    paths = getattr(settings, 'PRICE_CHANGE_CONSUMERS', DEFAULT_CONSUMERS)
+    return [import_string(path) for path in paths]
+
+
+def invalidate_changed_products_cache(events):
+    """Очистити кеш продуктів один раз на магазин для порції подій"""
+    from core.cache_utils import cache_manager
+
+    products_by_store = defaultdict(set)
+    for event in events:
+        products_by_store[event.store_id].add(event.product_id)
+
+    for store_id, product_ids in products_by_store.items():
+        cache_manager.invalidate_products(store_id)
+        logger.debug(f"Price changes for store {store_id}: {len(product_ids)} products")
+
+
+def record_price_list_snapshots(events):
+    """
+    Зафіксувати знімки прайс-листів, позиції яких змінились
+
+    Окремі правки позицій потрапляють в історію цін через кілька секунд
+    після зміни, а не лише з періодичним знімком. Помилка знімка не
+    зупиняє доставку — зміну підхопить періодичне завдання.
+    """
+    from .models import PriceList
+    from .services import PriceSnapshotService
+
+    price_list_ids = {event.price_list_id for event in events if event.price_list_id}
+    service = PriceSnapshotService()
+    for price_list in PriceList.objects.filter(id__in=price_list_ids):
+        try:
+            service.create_snapshot(price_list)
+        except Exception as exc:
+            logger.error(f"Помилка створення знімка прайс-листа {price_list.id}: {exc}")
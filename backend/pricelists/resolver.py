@@ -0,0 +1,142 @@
+"""
+Визначення цін товарів з активного прайс-листа магазину
+"""
+
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+import threading
+import uuid
+import logging
+
+from django.core.cache import cache
+
+from core.cache_utils import CommitBatch
+
+logger = logging.getLogger(__name__)
+
+def _bump_versions(store_ids):
+    cache.set_many({
+        PriceResolver.VERSION_KEY.format(store_id=store_id): uuid.uuid4().hex
+        for store_id in store_ids
+    }, None)
+
+
+# Магазини, ціни яких змінені в незафіксованій транзакції поточного потоку
+_pending_stores = CommitBatch(_bump_versions)
+
+
+class PriceResolver:
+    """
+    Кеш цін активного прайс-листа в пам'яті процесу
+
+    Для кожного магазину зберігається словник product_id → final_price разом
+    з токеном версії. Токен лежить у спільному кеші (Redis) і змінюється при
+    будь-якій зміні прайс-листів магазину, тому всі процеси перечитують ціни
+    після зміни, а між змінами визначення ціни не виконує запитів до БД.
+
+    Токен змінюється лише після фіксації транзакції (раз на магазин), інакше
+    інший процес міг би прочитати старі ціни вже під новим токеном. До
+    фіксації процес, що змінює ціни, читає їх з БД без кешування.
+    """
+
+    # Максимальна кількість магазинів, ціни яких тримаються в пам'яті процесу
+    MAX_STORES = 128
+
+    VERSION_KEY = 'pricelist:resolver_version:store_{store_id}'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_version(self, store_id: int) -> str:
+        """Поточний токен версії цін магазину"""
+        key = self.VERSION_KEY.format(store_id=store_id)
+        version = cache.get(key)
+        if version is None:
+            # Ключ ще не створений або витіснений — встановлюємо новий токен
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    def invalidate(self, store_id: int):
+        """Позначити ціни магазину як застарілі в усіх процесах після фіксації транзакції"""
+        with self._lock:
+            self._entries.pop(store_id, None)
+        _pending_stores.add(store_id)
+
+    def get_active_price_list_id(self, store_id: int):
+        """ID діючого прайс-листа магазину"""
+        return self._get_entry(store_id)['price_list_id']
+
+    def resolve_prices(self, store_id: int, product_ids: Iterable[int]) -> Dict[int, Decimal]:
+        """
+        Ціни товарів з активного прайс-листа
+
+        Товари, яких немає в прайс-листі, у результат не потрапляють.
+        """
+        prices = self._get_entry(store_id)['prices']
+        return {
+            product_id: prices[product_id]
+            for product_id in product_ids
+            if product_id in prices
+        }
+
+    def resolve_price(self, product, store_id: Optional[int] = None) -> Decimal:
+        """Ціна товару з активного прайс-листа або ціна з картки товару"""
+        prices = self._get_entry(store_id or product.store_id)['prices']
+        return prices.get(product.id, product.price)
+
+    def _get_entry(self, store_id: int) -> Dict:
+        if _pending_stores.is_pending(store_id):
+            # Незафіксовані зміни цього процесу не кешуємо
+            return self._load(store_id, None)
+
+        version = self.get_version(store_id)
+
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is not None and entry['version'] == version:
+                self._entries.move_to_end(store_id)
+                return entry
+
+        entry = self._load(store_id, version)
+
+        with self._lock:
+            self._entries[store_id] = entry
+            self._entries.move_to_end(store_id)
+            while len(self._entries) > self.MAX_STORES:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def _load(self, store_id: int, version: str) -> Dict:
+        from .models import EffectivePriceList, PriceList, PriceListItem
+
+        # Діючий прайс-лист перемикається задачею активації (EffectivePriceList)
+        pointer = list(
+            EffectivePriceList.objects.filter(store_id=store_id).values_list('price_list_id', flat=True)[:1]
+        )
+        if pointer:
+            price_list_id = pointer[0]
+        else:
+            price_list_id = PriceList.objects.filter(
+                store_id=store_id,
+                is_active=True
+            ).order_by('-is_default', '-created_at').values_list('id', flat=True).first()
+
+        prices = {}
+        if price_list_id:
+            prices = dict(
+                PriceListItem.objects.filter(price_list_id=price_list_id)
+                .order_by()
+                .values_list('product_id', 'final_price')
+                .iterator(chunk_size=5000)
+            )
+
+        logger.debug(f"Loaded {len(prices)} prices for store {store_id} (version {version})")
+        return {'version': version, 'price_list_id': price_list_id, 'prices': prices}
+
+
+# Глобальний екземпляр для визначення цін
+price_resolver = PriceResolver()
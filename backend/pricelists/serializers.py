@@ -1,5 +1,9 @@
+from decimal import Decimal
+
 from rest_framework import serializers
-from .models import PriceList, PriceListItem, BulkPriceUpdate, PriceHistory
+from .models import (
+    PriceList, PriceListItem, BulkPriceUpdate, PriceHistory, PriceListImportJob, PriceListSnapshot
+)
 from products.serializers import ProductPublicSerializer
 
 
@@ -107,23 +111,81 @@ class BulkPriceUpdateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class PriceHistorySerializer(serializers.ModelSerializer):
-    """Серіалізатор для історії зміни цін"""
+class PriceChangeSerializer(serializers.Serializer):
+    """Серіалізатор для змін цін, відновлених зі знімків (PriceSnapshotService.get_price_changes)"""
+    
+    version = serializers.IntegerField()
+    changed_at = serializers.DateTimeField()
+    product_id = serializers.IntegerField()
+    product_name = serializers.CharField()
+    old_cost = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    new_cost = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    old_price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    new_price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    change_reason = serializers.CharField()
+    change_reason_display = serializers.SerializerMethodField()
+    bulk_update = serializers.UUIDField(allow_null=True)
+    changed_by = serializers.IntegerField(allow_null=True)
+    changed_by_name = serializers.CharField()
+    price_change_percentage = serializers.SerializerMethodField()
+    
+    def get_change_reason_display(self, obj):
+        return str(dict(PriceHistory.CHANGE_REASON_CHOICES).get(obj['change_reason'], obj['change_reason']))
+    
+    def get_price_change_percentage(self, obj):
+        # Рядком, як DecimalField старого серіалізатора історії
+        percentage = Decimal('0')
+        if obj['old_price'] and obj['new_price'] and obj['old_price'] > 0:
+            percentage = (obj['new_price'] - obj['old_price']) / obj['old_price'] * 100
+        return str(percentage.quantize(Decimal('0.01')))
+
+
+class PriceListSnapshotSerializer(serializers.ModelSerializer):
+    """Серіалізатор для знімків цін прайс-листа (без даних знімка)"""
     
-    product_name = serializers.CharField(source='price_list_item.product.name', read_only=True)
     change_reason_display = serializers.CharField(source='get_change_reason_display', read_only=True)
-    changed_by_name = serializers.CharField(source='changed_by.get_full_name', read_only=True)
-    price_change_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, read_only=True)
     
     class Meta:
-        model = PriceHistory
+        model = PriceListSnapshot
+        fields = [
+            'id', 'version', 'is_full', 'items_count', 'changed_count',
+            'change_reason', 'change_reason_display', 'bulk_update', 'created_by', 'created_at'
+        ]
+        read_only_fields = fields
+
+
+class PriceListImportJobSerializer(serializers.ModelSerializer):
+    """Серіалізатор для фонових імпортів прайс-листа"""
+    
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress_percentage = serializers.FloatField(read_only=True)
+    errors_count = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = PriceListImportJob
         fields = [
-            'id', 'price_list_item', 'product_name', 'old_cost', 'new_cost',
-            'old_price', 'new_price', 'change_reason', 'change_reason_display',
-            'bulk_update', 'notes', 'changed_by', 'changed_by_name',
-            'changed_at', 'price_change_percentage'
+            'id', 'price_list', 'original_filename', 'update_existing', 'status',
+            'status_display', 'total_rows', 'processed_rows', 'progress_percentage',
+            'created_count', 'updated_count', 'skipped_count', 'errors', 'errors_count',
+            'attempts', 'started_at', 'finished_at', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'changed_at']
+        read_only_fields = fields
+    
+    def get_errors_count(self, obj):
+        return len(obj.errors)
+
+
+class PriceListImportCreateSerializer(serializers.Serializer):
+    """Серіалізатор для запуску фонового імпорту"""
+    
+    file = serializers.FileField()
+    update_existing = serializers.BooleanField(default=True)
+    column_mapping = serializers.DictField(child=serializers.CharField(), required=False)
+    
+    def validate_file(self, value):
+        if not value.name.lower().endswith(('.xlsx', '.xls')):
+            raise serializers.ValidationError('Підтримуються тільки файли .xlsx та .xls')
+        return value
 
 
 class PriceListSummarySerializer(serializers.ModelSerializer):
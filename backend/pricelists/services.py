@@ -1,15 +1,27 @@
-from django.db import models, transaction
+from django.db import connection, models, transaction
+from django.db.models.functions import Abs
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 from typing import List, Dict, Optional, Tuple
 import pandas as pd
 import io
 import logging
 
-from .models import PriceList, PriceListItem, BulkPriceUpdate, PriceHistory
+from .models import (
+    PriceList, PriceListItem, BulkPriceUpdate, PriceListImportJob, PriceListSnapshot,
+    PriceChangeEvent, EffectivePriceList
+)
+from .outbox import record_price_changes
+from .resolver import price_resolver
+from .signals import price_list_versions
+from .utils.snapshot_codec import SnapshotValue, find_in_snapshot, pack_snapshot, unpack_snapshot
 from products.models import Product, Category
+from stores.models import Store
 from warehouse.services import CostCalculationService
 from warehouse.models import CostingMethod, Warehouse, Packaging
+from core.cache_utils import cache_manager
+from core.cache_warming import schedule_store_warming
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +105,184 @@ class PriceListService:
         
         return item
     
+    def start_import_job(
+        self,
+        price_list: PriceList,
+        excel_file,
+        user,
+        update_existing: bool = True,
+        mapping: Optional[Dict[str, str]] = None
+    ) -> PriceListImportJob:
+        """Збереження файлу та запуск фонового імпорту"""
+        from .tasks import process_pricelist_import
+        
+        job = PriceListImportJob.objects.create(
+            price_list=price_list,
+            file=excel_file,
+            original_filename=getattr(excel_file, 'name', '')[:255],
+            column_mapping=mapping or {},
+            update_existing=update_existing,
+            created_by=user
+        )
+        
+        # Запускаємо задачу тільки після коміту, щоб воркер побачив запис
+        transaction.on_commit(lambda: process_pricelist_import.delay(str(job.id)))
+        
+        logger.info(f"Queued import job {job.id} for price list {price_list.id}")
+        return job
+    
+    def copy_price_list(
+        self,
+        source: PriceList,
+        name: str,
+        user,
+        price_adjustment_percentage: Optional[Decimal] = None,
+        category_ids: Optional[List[int]] = None
+    ) -> Tuple[PriceList, int]:
+        """
+        Копіювання прайс-листа разом з позиціями
+        
+        Позиції копіюються на стороні БД одним INSERT ... SELECT, а початкова
+        точка історії цін фіксується одним повним знімком. За потреби ціни
+        коригуються на відсоток, а копія обмежується вибраними категоріями.
+        """
+        factor = None
+        if price_adjustment_percentage:
+            factor = 1 + Decimal(str(price_adjustment_percentage)) / 100
+            if factor <= 0:
+                raise ValueError("Коригування ціни не може бути меншим за -100%")
+        
+        with transaction.atomic():
+            new_price_list = PriceList.objects.create(
+                store=source.store,
+                name=name,
+                description=f'Копія {source.name}',
+                pricing_strategy=source.pricing_strategy,
+                default_markup_percentage=source.default_markup_percentage,
+                default_markup_amount=source.default_markup_amount,
+                auto_update_from_cost=source.auto_update_from_cost,
+                update_frequency=source.update_frequency,
+                created_by=user
+            )
+            
+            if connection.vendor == 'postgresql':
+                copied_count = self._copy_items_sql(source, new_price_list, factor, category_ids)
+            else:
+                copied_count = self._copy_items_orm(source, new_price_list, factor, category_ids)
+        
+        # Позиції вставлені без сигналів моделі
+        price_resolver.invalidate(new_price_list.store_id)
+        
+        # Початкова точка історії цін копії
+        PriceSnapshotService().create_snapshot(
+            new_price_list, change_reason='bulk_update', user=user, force_full=True
+        )
+        
+        logger.info(f"Copied {copied_count} items from price list {source.id} to {new_price_list.id}")
+        return new_price_list, copied_count
+    
+    # Поля позиції, що копіюються без змін
+    COPIED_ITEM_FIELDS = (
+        'product_id', 'category_id', 'cost_calculation_method', 'manual_cost',
+        'calculated_cost', 'markup_type', 'markup_formula', 'min_price', 'max_price',
+        'is_manual_override', 'exclude_from_auto_update',
+    )
+    
+    def _copy_items_sql(self, source, target, factor, category_ids) -> int:
+        """Копіювання позицій одним INSERT ... SELECT (PostgreSQL)"""
+        items_table = PriceListItem._meta.db_table
+        now = timezone.now()
+        
+        if factor:
+            # Відсоткову та фіксовану націнку масштабуємо, щоб перерахунок дав ту саму ціну
+            markup_value = (
+                "CASE markup_type "
+                "WHEN 'percentage' THEN ROUND((100 + markup_value) * %(factor)s - 100, 2) "
+                "WHEN 'fixed_price' THEN ROUND(markup_value * %(factor)s, 2) "
+                "ELSE markup_value END"
+            )
+            calculated_price = "GREATEST(ROUND(calculated_price * %(factor)s, 2), 0.01)"
+            manual_price = "GREATEST(ROUND(manual_price * %(factor)s, 2), 0.01)"
+            final_price = "GREATEST(ROUND(final_price * %(factor)s, 2), 0.01)"
+        else:
+            markup_value, calculated_price, manual_price, final_price = (
+                'markup_value', 'calculated_price', 'manual_price', 'final_price'
+            )
+        
+        copied_columns = ', '.join(self.COPIED_ITEM_FIELDS)
+        category_filter = 'AND category_id = ANY(%(category_ids)s)' if category_ids else ''
+        params = {
+            'source_id': source.id,
+            'target_id': target.id,
+            'factor': factor,
+            'category_ids': list(category_ids or []),
+            'now': now,
+        }
+        
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {items_table} (
+                    id, price_list_id, {copied_columns},
+                    markup_value, calculated_price, manual_price, final_price,
+                    created_at, updated_at
+                )
+                SELECT
+                    gen_random_uuid(), %(target_id)s, {copied_columns},
+                    {markup_value}, {calculated_price}, {manual_price}, {final_price},
+                    %(now)s, %(now)s
+                FROM {items_table}
+                WHERE price_list_id = %(source_id)s {category_filter}
+                """,
+                params
+            )
+            copied_count = cursor.rowcount
+        
+        return copied_count
+    
+    def _copy_items_orm(self, source, target, factor, category_ids) -> int:
+        """Копіювання позицій порціями через ORM (для інших СУБД)"""
+        items = source.items.order_by().values(*self.COPIED_ITEM_FIELDS, 'markup_value',
+                                               'calculated_price', 'manual_price', 'final_price')
+        if category_ids:
+            items = items.filter(category_id__in=category_ids)
+        
+        def adjust(value, minimum=Decimal('0.01')):
+            if value is None or not factor:
+                return value
+            return max((value * factor).quantize(Decimal('0.01')), minimum)
+        
+        copied_count = 0
+        batch = []
+        
+        def flush():
+            created = PriceListItem.objects.bulk_create(batch)
+            batch.clear()
+            return len(created)
+        
+        for values in items.iterator(chunk_size=2000):
+            markup_value = values.pop('markup_value')
+            if factor and values['markup_type'] == 'percentage':
+                markup_value = ((100 + markup_value) * factor - 100).quantize(Decimal('0.01'))
+            elif factor and values['markup_type'] == 'fixed_price':
+                markup_value = (markup_value * factor).quantize(Decimal('0.01'))
+            
+            batch.append(PriceListItem(
+                price_list=target,
+                markup_value=markup_value,
+                calculated_price=adjust(values.pop('calculated_price')),
+                manual_price=adjust(values.pop('manual_price')),
+                final_price=adjust(values.pop('final_price')),
+                **values
+            ))
+            if len(batch) >= 2000:
+                copied_count += flush()
+        
+        if batch:
+            copied_count += flush()
+        
+        return copied_count
+    
     def calculate_product_cost(
         self, 
         product: Product, 
@@ -178,6 +368,9 @@ class PriceListService:
         updated_count = 0
         error_count = 0
         
+        snapshots = PriceSnapshotService()
+        snapshots.capture_baseline(price_list)
+        
         with transaction.atomic():
             for item in items_query:
                 try:
@@ -191,18 +384,6 @@ class PriceListService:
                         item.calculated_cost = new_cost
                         item.last_cost_update = timezone.now()
                         item.save()
-                        
-                        # Записуємо в історію
-                        PriceHistory.objects.create(
-                            price_list_item=item,
-                            old_cost=old_cost,
-                            new_cost=new_cost,
-                            old_price=item.final_price,
-                            new_price=item.final_price,  # Ціна поки не змінилася
-                            change_reason='cost_update',
-                            changed_by=price_list.created_by  # Можна передати користувача
-                        )
-                        
                         updated_count += 1
                         
                 except Exception as e:
@@ -213,6 +394,10 @@ class PriceListService:
             price_list.last_cost_sync = timezone.now()
             price_list.save(update_fields=['last_cost_sync'])
         
+        # Зміни фіксуються одним знімком замість запису історії на кожну позицію
+        if updated_count:
+            snapshots.create_snapshot(price_list, change_reason='cost_update')
+        
         return {
             'updated': updated_count,
             'errors': error_count,
@@ -258,6 +443,9 @@ class PriceListService:
         affected_count = 0
         log_entries = []
         
+        snapshots = PriceSnapshotService()
+        snapshots.capture_baseline(price_list, user=user)
+        
         with transaction.atomic():
             for item in items_query:
                 try:
@@ -277,18 +465,6 @@ class PriceListService:
                     # Перераховуємо ціну
                     item.save()
                     
-                    # Записуємо в історію
-                    PriceHistory.objects.create(
-                        price_list_item=item,
-                        old_cost=item.calculated_cost,
-                        new_cost=item.calculated_cost,
-                        old_price=old_price,
-                        new_price=item.final_price,
-                        change_reason='bulk_update',
-                        bulk_update=bulk_update,
-                        changed_by=user
-                    )
-                    
                     affected_count += 1
                     log_entries.append(
                         f"Product {item.product.name}: markup {old_markup_value} -> {item.markup_value}, "
@@ -305,40 +481,267 @@ class PriceListService:
             bulk_update.execution_log = '\n'.join(log_entries)
             bulk_update.save()
         
+        snapshots.create_snapshot(
+            price_list, change_reason='bulk_update', user=user, bulk_update=bulk_update
+        )
+        
         return bulk_update
     
+    # Розмір порції для перерахунку цін (iterator + bulk_update)
+    RECALCULATION_CHUNK_SIZE = 1000
+    
+    def recalculate_items(self, items_query, chunk_size: Optional[int] = None) -> Dict[str, int]:
+        """
+        Перерахунок цін позицій порціями
+        
+        Позиції читаються через iterator(), ціни розраховуються тією ж
+        логікою, що й при save(), а змінені записи зберігаються bulk_update
+        в окремій транзакції на кожну порцію. Оскільки bulk_update не
+        викликає сигналів, версії прайс-листів та події змін цін (outbox)
+        записуються в тій же транзакції окремо.
+        """
+        chunk_size = chunk_size or self.RECALCULATION_CHUNK_SIZE
+        cent = Decimal('0.01')
+        
+        processed = 0
+        updated = 0
+        changed_stores = set()
+        batch = []
+        
+        def flush():
+            with transaction.atomic():
+                PriceListItem.objects.bulk_update(
+                    [item for item, _old_price in batch],
+                    ['category', 'calculated_price', 'final_price', 'updated_at'],
+                    batch_size=chunk_size
+                )
+                
+                price_list_ids = {item.price_list_id for item, _old_price in batch}
+                PriceList.objects.filter(id__in=price_list_ids).update(version=models.F('version') + 1)
+                price_lists = {
+                    price_list_id: (store_id, version)
+                    for price_list_id, store_id, version in PriceList.objects.filter(
+                        id__in=price_list_ids
+                    ).values_list('id', 'store_id', 'version')
+                }
+                
+                record_price_changes(
+                    PriceChangeEvent(
+                        store_id=price_lists[item.price_list_id][0],
+                        product_id=item.product_id,
+                        price_list_id=item.price_list_id,
+                        source='pricelist_item',
+                        old_price=old_price,
+                        new_price=item.final_price,
+                        version=price_lists[item.price_list_id][1]
+                    )
+                    for item, old_price in batch
+                )
+                changed_stores.update(store_id for store_id, _version in price_lists.values())
+            batch.clear()
+        
+        items = items_query.select_related('product', 'price_list').order_by('pk')
+        now = timezone.now()
+        for item in items.iterator(chunk_size=chunk_size):
+            processed += 1
+            before = (item.category_id, item.calculated_price, item.final_price)
+            
+            try:
+                item.apply_pricing()
+            except Exception as e:
+                logger.error(f"Error recalculating price list item {item.id}: {e}")
+                continue
+            
+            item.calculated_price = (
+                item.calculated_price.quantize(cent) if item.calculated_price is not None else None
+            )
+            item.final_price = item.final_price.quantize(cent)
+            if (item.category_id, item.calculated_price, item.final_price) == before:
+                continue
+            
+            item.updated_at = now
+            batch.append((item, before[2]))
+            updated += 1
+            if len(batch) >= chunk_size:
+                flush()
+        
+        if batch:
+            flush()
+        
+        for store_id in changed_stores:
+            price_resolver.invalidate(store_id)
+        
+        return {'processed': processed, 'updated': updated}
+    
+    def recalculate_price_list(
+        self,
+        price_list: PriceList,
+        chunk_size: Optional[int] = None,
+        user=None
+    ) -> Dict[str, int]:
+        """Перерахунок усіх цін прайс-листа з фіксацією знімка"""
+        snapshots = PriceSnapshotService()
+        snapshots.capture_baseline(price_list, user=user)
+        result = self.recalculate_items(price_list.items.all(), chunk_size)
+        if result['updated']:
+            snapshots.create_snapshot(price_list, change_reason='cost_update', user=user)
+        return result
+    
     def sync_prices_to_products(
         self, 
         price_list: PriceList,
         update_only_changed: bool = True
     ) -> Dict[str, int]:
-        """Синхронізація цін з прайс-листа до товарів"""
+        """
+        Синхронізація цін з прайс-листа до товарів
         
-        updated_count = 0
+        Ціни переносяться одним UPDATE з корельованим підзапитом, без
+        завантаження позицій у Python. Оновлюються лише товари магазину
+        прайс-листа, а кеш очищується тільки якщо щось змінилось.
+        """
+        
+        items = price_list.items.filter(product__store_id=price_list.store_id)
+        if update_only_changed:
+            items = items.exclude(final_price=models.F('product__price'))
         
+        final_price = PriceListItem.objects.filter(
+            price_list=price_list,
+            product_id=models.OuterRef('pk')
+        ).values('final_price')[:1]
+        
+        now = timezone.now()
         with transaction.atomic():
-            for item in price_list.items.all():
-                product = item.product
-                
-                # Перевіряємо чи потрібно оновлювати
-                if update_only_changed and product.price == item.final_price:
-                    continue
-                
-                # Оновлюємо ціну товару
-                old_price = product.price
-                product.price = item.final_price
-                product.save(update_fields=['price'])
-                
-                # Оновлюємо час останнього оновлення ціни
-                item.last_price_update = timezone.now()
-                item.save(update_fields=['last_price_update'])
-                
-                updated_count += 1
-                
-                logger.info(f"Updated product {product.name} price: {old_price} -> {item.final_price}")
+            # Старі ціни для outbox читаємо до UPDATE
+            changes = list(items.values_list('product_id', 'product__price', 'final_price'))
+            
+            # Спочатку фіксуємо час оновлення — після UPDATE товарів різниця зникне
+            items.update(last_price_update=now)
+            updated_count = Product.objects.filter(
+                id__in=items.values('product_id')
+            ).update(price=models.Subquery(final_price), updated_at=now)
+            
+            record_price_changes(
+                PriceChangeEvent(
+                    store_id=price_list.store_id,
+                    product_id=product_id,
+                    source='product',
+                    old_price=old_price,
+                    new_price=new_price
+                )
+                for product_id, old_price, new_price in changes
+            )
+        
+        if updated_count:
+            cache_manager.invalidate_products(price_list.store_id)
+            transaction.on_commit(lambda: schedule_store_warming([price_list.store_id]))
+            logger.info(
+                f"Synced {updated_count} product prices from price list {price_list.id}"
+            )
         
         return {'updated': updated_count}
     
+    # За скільки часу до valid_from ціни запланованого прайс-листа перераховуються заздалегідь
+    PREPARE_AHEAD = timedelta(hours=2)
+    
+    def select_effective_price_lists(self, store_ids=None, at=None) -> Dict[int, Optional[str]]:
+        """
+        Діючий прайс-лист кожного магазину на момент at
+        
+        Серед активних прайс-листів, чий період дії охоплює at, пріоритет
+        мають заплановані (з valid_from/valid_until), далі прайс-лист за
+        замовчуванням, далі найпізніший початок дії та найновіший.
+        """
+        at = at or timezone.now()
+        candidates = PriceList.objects.filter(is_active=True).filter(
+            models.Q(valid_from__isnull=True) | models.Q(valid_from__lte=at),
+            models.Q(valid_until__isnull=True) | models.Q(valid_until__gt=at),
+        )
+        if store_ids is not None:
+            candidates = candidates.filter(store_id__in=store_ids)
+        
+        # Магазини без діючих прайс-листів отримують None (ціни з карток товарів)
+        effective = {
+            store_id: None
+            for store_id in Store.objects.filter(id__in=store_ids).values_list('id', flat=True)
+        } if store_ids is not None else {}
+        ranked = {}
+        rows = candidates.values_list(
+            'id', 'store_id', 'is_default', 'valid_from', 'valid_until', 'created_at'
+        )
+        for price_list_id, store_id, is_default, valid_from, valid_until, created_at in rows:
+            rank = (
+                valid_from is not None or valid_until is not None,
+                is_default,
+                valid_from or created_at,
+                created_at,
+            )
+            if store_id not in ranked or rank > ranked[store_id]:
+                ranked[store_id] = rank
+                effective[store_id] = price_list_id
+        
+        return effective
+    
+    def activate_effective_price_lists(self, store_ids=None, at=None) -> int:
+        """
+        Перемкнути вказівники діючих прайс-листів магазинів
+        
+        Перемикання — одне оновлення рядка EffectivePriceList на магазин;
+        ціни нового прайс-листа вже розраховані, тому після перемикання
+        процеси лише перечитують готову таблицю цін.
+        """
+        effective = self.select_effective_price_lists(store_ids, at)
+        
+        pointers = EffectivePriceList.objects.all()
+        if store_ids is not None:
+            pointers = pointers.filter(store_id__in=store_ids)
+        current = dict(pointers.values_list('store_id', 'price_list_id'))
+        
+        # Магазини, що втратили всі діючі прайс-листи, переводимо на ціни товарів
+        for store_id in current.keys() - effective.keys():
+            effective[store_id] = None
+        
+        switched = []
+        now = timezone.now()
+        with transaction.atomic():
+            for store_id, price_list_id in effective.items():
+                if store_id in current and current[store_id] == price_list_id:
+                    continue
+                EffectivePriceList.objects.update_or_create(
+                    store_id=store_id,
+                    defaults={'price_list_id': price_list_id, 'activated_at': now}
+                )
+                switched.append(store_id)
+        
+        for store_id in switched:
+            price_resolver.invalidate(store_id)
+            cache_manager.invalidate_products(store_id)
+        
+        if switched:
+            transaction.on_commit(lambda: schedule_store_warming(switched))
+            logger.info(f"Switched effective price lists for {len(switched)} stores")
+        return len(switched)
+    
+    def prepare_scheduled_price_lists(self, ahead: Optional[timedelta] = None) -> int:
+        """Заздалегідь перерахувати ціни прайс-листів, що активуються найближчим часом"""
+        now = timezone.now()
+        upcoming = PriceList.objects.filter(
+            is_active=True,
+            valid_from__gt=now,
+            valid_from__lte=now + (ahead or self.PREPARE_AHEAD),
+        ).filter(
+            models.Q(prepared_version__isnull=True) | models.Q(prepared_version__lt=models.F('version'))
+        )
+        
+        prepared = 0
+        for price_list in upcoming:
+            self.recalculate_price_list(price_list)
+            PriceList.objects.filter(pk=price_list.pk).update(
+                prepared_version=price_list.get_current_version()
+            )
+            prepared += 1
+        
+        return prepared
+    
     def validate_price_list(self, price_list: PriceList) -> Dict[str, List[str]]:
         """Валідація прайс-листа на наявність помилок"""
         
@@ -346,24 +749,28 @@ class PriceListService:
         warnings = []
         
         # Перевіряємо чи є позиції без собівартості
-        items_without_cost = price_list.items.filter(
+        items_without_cost_count = price_list.items.filter(
             models.Q(calculated_cost__isnull=True) | models.Q(calculated_cost=0)
-        )
-        if items_without_cost.exists():
+        ).count()
+        if items_without_cost_count:
             warnings.append(
-                f"Знайдено {items_without_cost.count()} позицій без собівартості"
+                f"Знайдено {items_without_cost_count} позицій без собівартості"
             )
         
-        # Перевіряємо чи є позиції з від'ємною рентабельністю
-        negative_margin_items = []
-        for item in price_list.items.all():
-            if item.current_cost and item.final_price < item.current_cost:
-                negative_margin_items.append(item.product.name)
+        # Перевіряємо чи є позиції з від'ємною рентабельністю (ціна нижча за собівартість)
+        negative_margin_items = price_list.items.with_cost().filter(
+            effective_cost__gt=0,
+            final_price__lt=models.F('effective_cost')
+        )
+        negative_margin_count = negative_margin_items.count()
         
-        if negative_margin_items:
+        if negative_margin_count:
+            negative_margin_names = list(
+                negative_margin_items.order_by('product__name').values_list('product__name', flat=True)[:5]
+            )
             warnings.append(
-                f"Збиткові товари: {', '.join(negative_margin_items[:5])}"
-                + (f" та ще {len(negative_margin_items) - 5}" if len(negative_margin_items) > 5 else "")
+                f"Збиткові товари: {', '.join(negative_margin_names)}"
+                + (f" та ще {negative_margin_count - 5}" if negative_margin_count > 5 else "")
             )
         
         # Перевіряємо дублікати товарів
@@ -380,96 +787,432 @@ class PriceListService:
             'is_valid': len(errors) == 0
         }
     
+    # Допустимі поля сортування порівняння прайс-листів
+    COMPARISON_ORDERING_FIELDS = (
+        'difference', 'abs_difference', 'difference_percentage',
+        'abs_difference_percentage', 'price1', 'price2', 'product_name',
+    )
+    
+    def get_comparison_queryset(
+        self,
+        price_list1: PriceList,
+        price_list2: PriceList,
+        only_changed: bool = True,
+        ordering: str = '-abs_difference'
+    ):
+        """
+        Позиції, спільні для двох прайс-листів, з різницею цін, порахованою в SQL
+        
+        Друга позиція приєднується через товар (FilteredRelation), тому весь
+        набір повертається одним запитом і може пагінуватися без N+1.
+        """
+        field = ordering.lstrip('-')
+        if field not in self.COMPARISON_ORDERING_FIELDS:
+            raise ValueError(f"Непідтримуване сортування: {ordering}")
+        
+        decimal_field = models.DecimalField(max_digits=12, decimal_places=2)
+        percent_field = models.DecimalField(max_digits=12, decimal_places=4)
+        difference = models.ExpressionWrapper(
+            models.F('other__final_price') - models.F('final_price'), output_field=decimal_field
+        )
+        difference_percentage = models.Case(
+            models.When(
+                final_price__gt=0,
+                then=models.ExpressionWrapper(
+                    difference * 100 / models.F('final_price'), output_field=percent_field
+                )
+            ),
+            default=models.Value(Decimal('0')),
+            output_field=percent_field
+        )
+        
+        queryset = price_list1.items.annotate(
+            other=models.FilteredRelation(
+                'product__pricelistitem',
+                condition=models.Q(product__pricelistitem__price_list=price_list2)
+            )
+        ).annotate(
+            product_name=models.F('product__name'),
+            product_sku=models.F('product__sku'),
+            price1=models.F('final_price'),
+            price2=models.F('other__final_price'),
+            difference=difference,
+            abs_difference=Abs(difference),
+            difference_percentage=difference_percentage,
+            abs_difference_percentage=Abs(difference_percentage),
+        ).filter(price2__isnull=False)
+        
+        if only_changed:
+            queryset = queryset.exclude(difference=0)
+        
+        queryset = queryset.values(
+            'product_id', 'product_name', 'product_sku', 'price1', 'price2',
+            'difference', 'abs_difference', 'difference_percentage', 'abs_difference_percentage'
+        )
+        
+        return queryset.order_by(ordering, 'product_id')
+    
     def get_price_comparison(
         self, 
         price_list1: PriceList, 
-        price_list2: PriceList
+        price_list2: PriceList,
+        ordering: str = '-abs_difference',
+        offset: int = 0,
+        limit: Optional[int] = None
     ) -> Dict:
-        """Порівняння двох прайс-листів"""
-        
-        # Отримуємо товари що є в обох прайс-листах
-        products1 = set(price_list1.items.values_list('product_id', flat=True))
-        products2 = set(price_list2.items.values_list('product_id', flat=True))
+        """Порівняння двох прайс-листів (сторінка різниць цін + загальні лічильники)"""
         
-        common_products = products1.intersection(products2)
-        only_in_first = products1 - products2
-        only_in_second = products2 - products1
+        common = price_list1.items.annotate(
+            other=models.FilteredRelation(
+                'product__pricelistitem',
+                condition=models.Q(product__pricelistitem__price_list=price_list2)
+            )
+        ).aggregate(
+            total=models.Count('id'),
+            common=models.Count('other__id'),
+            changed=models.Count(
+                'other__id', filter=~models.Q(final_price=models.F('other__final_price'))
+            ),
+        )
+        total_second = price_list2.items.count()
         
-        price_differences = []
+        differences = self.get_comparison_queryset(price_list1, price_list2, ordering=ordering)
+        if limit is not None:
+            differences = differences[offset:offset + limit]
+        elif offset:
+            differences = differences[offset:]
         
-        for product_id in common_products:
-            item1 = price_list1.items.get(product_id=product_id)
-            item2 = price_list2.items.get(product_id=product_id)
-            
-            if item1.final_price != item2.final_price:
-                price_differences.append({
-                    'product': item1.product.name,
-                    'price1': item1.final_price,
-                    'price2': item2.final_price,
-                    'difference': item2.final_price - item1.final_price,
-                    'difference_percentage': (
-                        (item2.final_price - item1.final_price) / item1.final_price * 100
-                        if item1.final_price > 0 else 0
-                    )
-                })
+        price_differences = [
+            {
+                'product_id': row['product_id'],
+                'product': row['product_name'],
+                'sku': row['product_sku'],
+                'price1': row['price1'],
+                'price2': row['price2'],
+                'difference': row['difference'],
+                'difference_percentage': round(row['difference_percentage'], 2),
+            }
+            for row in differences
+        ]
         
         return {
-            'common_products': len(common_products),
-            'only_in_first': len(only_in_first),
-            'only_in_second': len(only_in_second),
+            'common_products': common['common'],
+            'only_in_first': common['total'] - common['common'],
+            'only_in_second': total_second - common['common'],
             'price_differences': price_differences,
-            'total_differences': len(price_differences)
+            'total_differences': common['changed']
         }
     
     def get_profitability_analysis(self, price_list: PriceList) -> Dict:
-        """Аналіз рентабельності прайс-листа"""
-        
-        items_with_cost = price_list.items.exclude(
-            models.Q(calculated_cost__isnull=True) | models.Q(calculated_cost=0)
+        """Аналіз рентабельності прайс-листа (кешується до зміни версії прайс-листа)"""
+        return self._get_cached_for_version(
+            price_list, 'profitability', lambda: self._compute_profitability_analysis(price_list)
         )
+    
+    def _compute_profitability_analysis(self, price_list: PriceList) -> Dict:
+        """Розрахунок рентабельності агрегатами в БД"""
         
-        if not items_with_cost.exists():
-            return {'error': 'Немає товарів з розрахованою собівартістю'}
-        
-        margins = []
-        total_cost = Decimal('0')
-        total_price = Decimal('0')
+        items_with_cost = price_list.items.with_profit().filter(effective_cost__gt=0)
         
-        for item in items_with_cost:
-            if item.current_cost and item.final_price:
-                margin = item.profit_margin
-                margins.append(margin)
-                total_cost += item.current_cost
-                total_price += item.final_price
+        totals = items_with_cost.aggregate(
+            total_items=models.Count('id'),
+            average_margin=models.Avg('effective_margin'),
+            min_margin=models.Min('effective_margin'),
+            max_margin=models.Max('effective_margin'),
+            total_cost=models.Sum('effective_cost'),
+            total_price=models.Sum('final_price'),
+        )
         
-        if not margins:
-            return {'error': 'Неможливо розрахувати рентабельність'}
+        if not totals['total_items']:
+            return {'error': 'Немає товарів з розрахованою собівартістю'}
         
-        # Розрахунки
-        average_margin = sum(margins) / len(margins)
-        min_margin = min(margins)
-        max_margin = max(margins)
+        total_cost = totals['total_cost'] or Decimal('0')
+        total_price = totals['total_price'] or Decimal('0')
         overall_margin = ((total_price - total_cost) / total_cost * 100) if total_cost > 0 else 0
         
-        # Категорії рентабельності
-        high_margin = len([m for m in margins if m > 50])
-        medium_margin = len([m for m in margins if 20 <= m <= 50])
-        low_margin = len([m for m in margins if 0 <= m < 20])
-        negative_margin = len([m for m in margins if m < 0])
+        # Категорії рентабельності одним згрупованим запитом
+        distribution = self._count_margin_buckets(items_with_cost, [
+            ('negative_margin', models.Q(effective_margin__lt=0)),
+            ('low_margin', models.Q(effective_margin__lt=20)),
+            ('medium_margin', models.Q(effective_margin__lte=50)),
+            ('high_margin', models.Q(effective_margin__gt=50)),
+        ])
         
         return {
-            'total_items': len(margins),
-            'average_margin': round(average_margin, 2),
-            'min_margin': round(min_margin, 2),
-            'max_margin': round(max_margin, 2),
+            'total_items': totals['total_items'],
+            'average_margin': round(Decimal(totals['average_margin']), 2),
+            'min_margin': round(Decimal(totals['min_margin']), 2),
+            'max_margin': round(Decimal(totals['max_margin']), 2),
             'overall_margin': round(overall_margin, 2),
-            'margin_distribution': {
-                'high_margin': high_margin,
-                'medium_margin': medium_margin,
-                'low_margin': low_margin,
-                'negative_margin': negative_margin
-            },
+            'margin_distribution': distribution,
             'total_cost': total_cost,
             'total_price': total_price,
             'total_profit': total_price - total_cost
-        }
\ No newline at end of file
+        }
+    
+    def get_pricelist_analytics(self, price_list: PriceList) -> Dict:
+        """Зведена аналітика прайс-листа для дашборду (кешується до зміни версії)"""
+        return self._get_cached_for_version(
+            price_list, 'analytics', lambda: self._compute_pricelist_analytics(price_list)
+        )
+    
+    def _compute_pricelist_analytics(self, price_list: PriceList) -> Dict:
+        """Розрахунок аналітики прайс-листа агрегатами в БД"""
+        
+        items = price_list.items.with_profit()
+        
+        totals = items.aggregate(
+            total_items=models.Count('id'),
+            average_profit_margin=models.Avg('effective_margin'),
+            total_cost_value=models.Sum('effective_cost'),
+            total_sale_value=models.Sum('final_price'),
+        )
+        
+        # Статистика по типам націнки
+        markup_stats = {markup_type: 0 for markup_type, _ in PriceListItem.MARKUP_TYPE_CHOICES}
+        for row in price_list.items.order_by().values('markup_type').annotate(count=models.Count('id')):
+            markup_stats[row['markup_type']] = row['count']
+        
+        # Статистика по рентабельності
+        profitability_ranges = self._count_margin_buckets(items, [
+            ('low', models.Q(effective_margin__lt=10)),
+            ('medium', models.Q(effective_margin__lt=30)),
+            ('high', models.Q(effective_margin__gte=30)),
+        ])
+        
+        return {
+            'total_items': totals['total_items'],
+            'average_profit_margin': totals['average_profit_margin'] or Decimal('0'),
+            'total_cost_value': totals['total_cost_value'] or Decimal('0'),
+            'total_sale_value': totals['total_sale_value'] or Decimal('0'),
+            'markup_type_distribution': markup_stats,
+            'profitability_distribution': profitability_ranges,
+            'last_sync': price_list.last_cost_sync,
+        }
+    
+    def _count_margin_buckets(self, items_query, buckets: List[Tuple[str, models.Q]]) -> Dict[str, int]:
+        """
+        Кількість позицій по діапазонах рентабельності одним GROUP BY запитом
+        
+        Умови перевіряються по черзі (як When у Case), тому кожна наступна
+        умова застосовується тільки до позицій, що не потрапили в попередні.
+        """
+        bucket_expression = models.Case(
+            *[models.When(condition, then=models.Value(name)) for name, condition in buckets],
+            default=models.Value(''),
+            output_field=models.CharField()
+        )
+        
+        counts = {name: 0 for name, _ in buckets}
+        rows = items_query.order_by().annotate(
+            margin_bucket=bucket_expression
+        ).values('margin_bucket').annotate(count=models.Count('id'))
+        
+        for row in rows:
+            if row['margin_bucket'] in counts:
+                counts[row['margin_bucket']] = row['count']
+        return counts
+    
+    def _get_cached_for_version(self, price_list: PriceList, name: str, compute):
+        """Кешування результату до наступної зміни версії прайс-листа"""
+        version = price_list.get_current_version()
+        key = f"pricelist:store_{price_list.store_id}:{name}:{price_list.id}:v{version}"
+        return cache_manager.get_or_set(key, compute, cache_type='pricelist_analytics')
+
+
+class PriceSnapshotService:
+    """Версіоновані знімки цін прайс-листів з історією у вигляді різниць"""
+    
+    # Кожен N-й знімок зберігається повністю, щоб відновлення не розпаковувало довгий ланцюжок
+    FULL_SNAPSHOT_INTERVAL = 20
+    
+    def get_current_state(self, price_list: PriceList) -> Dict[int, SnapshotValue]:
+        """Поточні ціни та собівартості прайс-листа: product_id → (ціна, собівартість)"""
+        rows = price_list.items.with_cost().order_by().values_list(
+            'product_id', 'final_price', 'effective_cost'
+        ).iterator(chunk_size=5000)
+        return {product_id: (price, cost) for product_id, price, cost in rows}
+    
+    def capture_baseline(self, price_list: PriceList, user=None) -> Optional[PriceListSnapshot]:
+        """
+        Зафіксувати стан прайс-листа перед масовою зміною
+        
+        Якщо знімка ще немає або версія змінилась після останнього (окремі
+        правки позицій), поточні ціни зберігаються до того, як їх перезапише
+        масова операція.
+        """
+        return self.create_snapshot(price_list, change_reason='manual', user=user)
+    
+    def create_snapshot(
+        self,
+        price_list: PriceList,
+        change_reason: str = 'manual',
+        user=None,
+        bulk_update: Optional[BulkPriceUpdate] = None,
+        force_full: bool = False
+    ) -> Optional[PriceListSnapshot]:
+        """
+        Зафіксувати поточну версію прайс-листа
+        
+        Зберігається тільки різниця з попереднім знімком. Якщо версія не
+        змінилась або ціни не відрізняються, знімок не створюється.
+        """
+        with transaction.atomic():
+            # Блокуємо прайс-лист, щоб два процеси не записали ту саму версію
+            price_list = PriceList.objects.select_for_update().get(pk=price_list.pk)
+            last_version = price_list.snapshots.order_by('-version').values_list(
+                'version', flat=True
+            ).first()
+            # Зміни поточної транзакції ще не збільшили версію (це станеться після фіксації)
+            pending = price_list_versions.is_pending(price_list.pk)
+            if last_version is not None and last_version >= price_list.version and not pending:
+                return None
+            
+            current = self.get_current_state(price_list)
+            previous, chain_length = self._reconstruct(price_list.snapshots.all())
+            
+            changes = {
+                product_id: value
+                for product_id, value in current.items()
+                if previous.get(product_id) != value
+            }
+            changes.update({product_id: (None, None) for product_id in previous.keys() - current.keys()})
+            
+            if last_version is not None and not changes:
+                return None
+            
+            if last_version is not None and last_version >= price_list.version:
+                price_list.bump_version()
+            
+            is_full = force_full or last_version is None or chain_length >= self.FULL_SNAPSHOT_INTERVAL
+            entries = current if is_full else changes
+            
+            return PriceListSnapshot.objects.create(
+                price_list=price_list,
+                version=price_list.version,
+                is_full=is_full,
+                data=pack_snapshot(
+                    (product_id, price, cost) for product_id, (price, cost) in entries.items()
+                ),
+                items_count=len(current),
+                changed_count=len(changes),
+                change_reason=change_reason,
+                bulk_update=bulk_update,
+                created_by=user
+            )
+    
+    def get_prices_at(self, price_list: PriceList, at) -> Dict[int, SnapshotValue]:
+        """Стан прайс-листа на момент часу at"""
+        state, _chain_length = self._reconstruct(price_list.snapshots.filter(created_at__lte=at))
+        return state
+    
+    def get_price_timeline(self, price_list: PriceList, product_id: int) -> List[Dict]:
+        """Зміни ціни та собівартості товару в прайс-листі за всіма знімками"""
+        timeline = []
+        last_value = None
+        
+        snapshots = price_list.snapshots.order_by('version').values_list(
+            'version', 'created_at', 'is_full', 'change_reason', 'data'
+        )
+        for version, created_at, is_full, change_reason, data in snapshots.iterator(chunk_size=100):
+            value = find_in_snapshot(data, product_id)
+            if value is None:
+                if not is_full:
+                    continue
+                # Повний знімок без товару означає, що позиції в прайс-листі не було
+                value = (None, None)
+            
+            if value != last_value and (timeline or value[0] is not None):
+                timeline.append({
+                    'version': version,
+                    'date': created_at,
+                    'price': value[0],
+                    'cost': value[1],
+                    'change_reason': change_reason,
+                })
+            last_value = value
+        
+        return timeline
+    
+    def get_price_changes(
+        self,
+        price_list: PriceList,
+        product_id: Optional[int] = None,
+        change_reason: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Історія змін цін прайс-листа за різницями між знімками, новіші першими
+        
+        Перший знімок — вихідний стан, тож змінами вважаються лише наступні.
+        Стан між знімками ведеться в пам'яті, щоб знати старі значення.
+        """
+        changes = []
+        state = {}
+        
+        snapshots = price_list.snapshots.order_by('version').values_list(
+            'version', 'created_at', 'is_full', 'change_reason', 'bulk_update_id',
+            'created_by_id', 'created_by__first_name', 'created_by__last_name', 'data'
+        )
+        for index, row in enumerate(snapshots.iterator(chunk_size=100)):
+            version, created_at, is_full, reason, bulk_update_id, user_id, first_name, last_name, data = row
+            entries = unpack_snapshot(data)
+            if is_full:
+                # Повний знімок без товару означає, що позицію видалено
+                entries.update({removed: (None, None) for removed in state.keys() - entries.keys()})
+            
+            for entry_product_id, value in entries.items():
+                old_value = state.get(entry_product_id, (None, None))
+                if value[0] is None:
+                    state.pop(entry_product_id, None)
+                else:
+                    state[entry_product_id] = value
+                
+                if not index or value == old_value:
+                    continue
+                if product_id is not None and entry_product_id != product_id:
+                    continue
+                if change_reason and reason != change_reason:
+                    continue
+                changes.append({
+                    'version': version,
+                    'changed_at': created_at,
+                    'product_id': entry_product_id,
+                    'old_price': old_value[0],
+                    'new_price': value[0],
+                    'old_cost': old_value[1],
+                    'new_cost': value[1],
+                    'change_reason': reason,
+                    'bulk_update': bulk_update_id,
+                    'changed_by': user_id,
+                    'changed_by_name': f'{first_name or ""} {last_name or ""}'.strip(),
+                })
+        
+        changes.reverse()
+        return changes
+    
+    def _reconstruct(self, snapshots) -> Tuple[Dict[int, SnapshotValue], int]:
+        """
+        Відновити стан з останнього повного знімка та наступних різниць
+        
+        Повертає стан і кількість різниць після повного знімка.
+        """
+        last_full_version = snapshots.filter(is_full=True).order_by('-version').values_list(
+            'version', flat=True
+        ).first()
+        if last_full_version is None:
+            return {}, 0
+        
+        state = {}
+        chain = snapshots.filter(version__gte=last_full_version).order_by('version').values_list(
+            'data', flat=True
+        )
+        chain_length = -1
+        for data in chain.iterator(chunk_size=100):
+            for product_id, value in unpack_snapshot(data).items():
+                if value[0] is None:
+                    state.pop(product_id, None)
+                else:
+                    state[product_id] = value
+            chain_length += 1
+        
+        return state, chain_length
@@ -0,0 +1,153 @@
+"""
+Сигнали прайс-листів
+"""
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from core.cache_utils import CommitBatch
+from products.models import Product
+from .models import PriceList, PriceListItem, PriceChangeEvent
+from .outbox import record_price_changes
+from .resolver import price_resolver
+
+
+def _get_item_store_id(instance):
+    """ID магазину позиції без зайвого запиту, якщо прайс-лист уже завантажено"""
+    if PriceListItem.price_list.is_cached(instance):
+        return instance.price_list.store_id
+    return PriceList.objects.filter(
+        pk=instance.price_list_id
+    ).values_list('store_id', flat=True).first()
+
+
+def _bump_versions(price_list_ids):
+    PriceList.objects.filter(pk__in=price_list_ids).update(version=F('version') + 1)
+    # Події змін позицій отримують версію, що з'явилася після фіксації
+    PriceChangeEvent.objects.filter(
+        price_list_id__in=price_list_ids, version__isnull=True, dispatched_at__isnull=True
+    ).update(version=Subquery(PriceList.objects.filter(pk=OuterRef('price_list_id')).values('version')[:1]))
+
+
+# Версія збільшується один раз на транзакцію після фіксації, а не UPDATE
+# рядка прайс-листа на кожну позицію (це серіалізувало паралельні зміни)
+price_list_versions = CommitBatch(_bump_versions)
+
+
+# Поля прайс-листа, що впливають на ціни або вибір діючого прайс-листа;
+# службові збереження (напр. update_fields=['last_cost_sync']) їх не торкаються
+PRICING_FIELDS = {
+    'store', 'pricing_strategy', 'default_markup_percentage', 'default_markup_amount',
+    'is_active', 'is_default', 'valid_from', 'valid_until',
+}
+
+
+def _affects_prices(update_fields):
+    return update_fields is None or bool(PRICING_FIELDS & set(update_fields))
+
+
+@receiver(post_save, sender=PriceList)
+def bump_version_on_price_list_change(sender, instance, created, update_fields=None, **kwargs):
+    """Зміна налаштувань прайс-листа створює нову версію"""
+    if not created and _affects_prices(update_fields):
+        price_list_versions.add(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=PriceListItem)
+def bump_version_on_item_change(sender, instance, **kwargs):
+    """Зміна позиції прайс-листа створює нову версію прайс-листа"""
+    price_list_versions.add(instance.price_list_id)
+
+
+@receiver([post_save, post_delete], sender=PriceList)
+def invalidate_resolved_prices_on_price_list_change(sender, instance, update_fields=None, **kwargs):
+    """Активний прайс-лист магазину міг змінитися"""
+    if _affects_prices(update_fields):
+        price_resolver.invalidate(instance.store_id)
+
+
+@receiver([post_save, post_delete], sender=PriceList)
+def reselect_effective_price_list(sender, instance, update_fields=None, **kwargs):
+    """Ручна зміна активності чи періоду дії одразу перемикає діючий прайс-лист"""
+    from .services import PriceListService
+    
+    if not _affects_prices(update_fields):
+        return
+    store_id = instance.store_id
+    transaction.on_commit(lambda: PriceListService().activate_effective_price_lists([store_id]))
+
+
+@receiver([post_save, post_delete], sender=PriceListItem)
+def invalidate_resolved_prices_on_item_change(sender, instance, **kwargs):
+    """Ціна позиції могла змінитися"""
+    store_id = _get_item_store_id(instance)
+    if store_id:
+        price_resolver.invalidate(store_id)
+
+
+# ==================== OUTBOX ЗМІН ЦІН ====================
+
+
+@receiver(post_init, sender=PriceListItem)
+def remember_item_price(sender, instance, **kwargs):
+    """Запам'ятати ціну позиції на момент завантаження"""
+    # Відкладене поле не читаємо, щоб не виконувати запит
+    instance._loaded_final_price = instance.__dict__.get('final_price') if instance.pk else None
+
+
+@receiver(post_init, sender=Product)
+def remember_product_price(sender, instance, **kwargs):
+    """Запам'ятати ціну товару на момент завантаження"""
+    instance._loaded_price = instance.__dict__.get('price') if instance.pk else None
+
+
+@receiver(post_save, sender=PriceListItem)
+def record_item_price_change(sender, instance, created, **kwargs):
+    """Записати подію зміни фінальної ціни позиції (в транзакції збереження)"""
+    old_price = None if created else instance._loaded_final_price
+    if old_price == instance.final_price:
+        return
+    
+    store_id = _get_item_store_id(instance)
+    if store_id:
+        record_price_changes([PriceChangeEvent(
+            store_id=store_id,
+            product_id=instance.product_id,
+            price_list_id=instance.price_list_id,
+            source='pricelist_item',
+            old_price=old_price,
+            # Версію заповнить price_list_versions після фіксації транзакції
+            new_price=instance.final_price
+        )])
+    instance._loaded_final_price = instance.final_price
+
+
+@receiver(post_delete, sender=PriceListItem)
+def record_item_removal(sender, instance, **kwargs):
+    """Позиція видалена — товар більше не має ціни в цьому прайс-листі"""
+    store_id = _get_item_store_id(instance)
+    if store_id:
+        record_price_changes([PriceChangeEvent(
+            store_id=store_id,
+            product_id=instance.product_id,
+            price_list_id=instance.price_list_id,
+            source='pricelist_item',
+            old_price=instance.final_price,
+            new_price=None
+        )])
+
+
+@receiver(post_save, sender=Product)
+def record_product_price_change(sender, instance, created, **kwargs):
+    """Записати подію зміни ціни товару (в транзакції збереження)"""
+    if not created and instance._loaded_price is not None and instance._loaded_price != instance.price:
+        record_price_changes([PriceChangeEvent(
+            store_id=instance.store_id,
+            product_id=instance.pk,
+            source='product',
+            old_price=instance._loaded_price,
+            new_price=instance.price
+        )])
+    instance._loaded_price = instance.price
@@ -0,0 +1,362 @@
+"""
+Celery завдання для прайс-листів
+"""
+
+from celery import shared_task
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Кількість рядків, що обробляються в одній транзакції (одна контрольна точка)
+IMPORT_CHUNK_SIZE = 500
+
+# Через скільки хвилин без оновлень імпорт вважається завислим
+IMPORT_STALL_TIMEOUT_MINUTES = 15
+
+# Максимальна кількість перезапусків імпорту після збою воркера
+IMPORT_MAX_ATTEMPTS = 5
+
+# Розмір порції подій змін цін та максимум порцій за один запуск доставки
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_BATCHES = 20
+
+# Скільки днів зберігати доставлені події змін цін
+OUTBOX_RETENTION_DAYS = 3
+
+
+# ==================== IMPORT TASKS ====================
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=3, default_retry_delay=60)
+def process_pricelist_import(self, job_id):
+    """
+    Фоновий імпорт прайс-листа з Excel файлу
+
+    Рядки обробляються порціями по IMPORT_CHUNK_SIZE. Кожна порція та
+    контрольна точка (processed_rows) фіксуються в одній транзакції, тому
+    після падіння воркера імпорт продовжується з першого незбереженого рядка.
+    """
+    from pricelists.models import PriceListImportJob
+    from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+    try:
+        job = PriceListImportJob.objects.select_related('price_list__store').get(id=job_id)
+    except PriceListImportJob.DoesNotExist:
+        logger.error(f"Імпорт {job_id} не знайдено")
+        return False
+
+    if job.is_finished:
+        logger.info(f"Імпорт {job_id} вже завершено ({job.status})")
+        return job.status == 'completed'
+
+    handler = ExcelPriceListHandler()
+
+    try:
+        with job.file.open('rb') as excel_file:
+            df = handler.read_dataframe(excel_file)
+    except Exception as exc:
+        logger.error(f"Помилка читання файлу імпорту {job_id}: {exc}")
+        _mark_import_failed(job, [f"Помилка читання файлу: {exc}"])
+        return False
+
+    mapping = job.column_mapping or handler.detect_column_mapping(df)
+    if not handler.validate_excel_structure(df, mapping):
+        _mark_import_failed(job, handler.errors)
+        return False
+
+    job.status = 'processing'
+    job.column_mapping = mapping
+    job.total_rows = len(df)
+    job.attempts += 1
+    if not job.started_at:
+        job.started_at = timezone.now()
+    job.save(update_fields=[
+        'status', 'column_mapping', 'total_rows', 'attempts', 'started_at', 'updated_at'
+    ])
+
+    try:
+        while job.processed_rows < job.total_rows:
+            with transaction.atomic():
+                # Блокуємо задачу, щоб дві копії завдання не обробили ту саму порцію
+                job = PriceListImportJob.objects.select_for_update().select_related(
+                    'price_list__store'
+                ).get(id=job_id)
+                if job.is_finished:
+                    return job.status == 'completed'
+
+                start = job.processed_rows
+                stop = min(start + IMPORT_CHUNK_SIZE, job.total_rows)
+                result = handler.process_rows(
+                    df, job.price_list, mapping, job.update_existing, start, stop
+                )
+
+                job.processed_rows = stop
+                job.created_count += result['created']
+                job.updated_count += result['updated']
+                job.skipped_count += result['skipped']
+                job.add_errors(result['errors'])
+                job.save(update_fields=[
+                    'processed_rows', 'created_count', 'updated_count',
+                    'skipped_count', 'errors', 'updated_at'
+                ])
+
+            logger.debug(f"Імпорт {job_id}: оброблено {job.processed_rows}/{job.total_rows}")
+
+    except Exception as exc:
+        logger.error(f"Помилка імпорту {job_id} на рядку {job.processed_rows}: {exc}")
+        # Попередні порції вже збережені — повтор продовжить з контрольної точки
+        raise self.retry(exc=exc, countdown=60)
+
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+
+    logger.info(
+        f"Імпорт {job_id} завершено: створено {job.created_count}, "
+        f"оновлено {job.updated_count}, пропущено {job.skipped_count}"
+    )
+    return True
+
+
+def _mark_import_failed(job, errors):
+    """Позначити імпорт як невдалий"""
+    job.status = 'failed'
+    job.add_errors(list(errors))
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'errors', 'finished_at', 'updated_at'])
+
+
+@shared_task
+def resume_stalled_pricelist_imports():
+    """
+    Перезапустити імпорти, які зависли після падіння воркера
+    """
+    from pricelists.models import PriceListImportJob
+
+    threshold = timezone.now() - timedelta(minutes=IMPORT_STALL_TIMEOUT_MINUTES)
+    stalled_jobs = PriceListImportJob.objects.filter(
+        Q(status='pending') | Q(status='processing'),
+        updated_at__lt=threshold,
+    )
+
+    resumed = 0
+    for job in stalled_jobs:
+        if job.attempts >= IMPORT_MAX_ATTEMPTS:
+            _mark_import_failed(job, ["Перевищено кількість спроб імпорту"])
+            continue
+
+        # Оновлюємо updated_at, щоб не перезапускати ту саму задачу двічі поспіль
+        job.save(update_fields=['updated_at'])
+        process_pricelist_import.delay(str(job.id))
+        resumed += 1
+
+    if resumed:
+        logger.info(f"Перезапущено {resumed} завислих імпортів прайс-листів")
+    return resumed
+
+
+# ==================== SNAPSHOT TASKS ====================
+
+
+@shared_task
+def snapshot_changed_price_lists():
+    """
+    Зафіксувати знімки прайс-листів, версія яких змінилась після останнього знімка
+    """
+    from django.db.models import F, Max
+    from pricelists.models import PriceList
+    from pricelists.services import PriceSnapshotService
+
+    price_lists = PriceList.objects.annotate(
+        last_snapshot_version=Max('snapshots__version')
+    ).filter(
+        Q(last_snapshot_version__isnull=True) | Q(version__gt=F('last_snapshot_version'))
+    )
+
+    service = PriceSnapshotService()
+    created = 0
+    for price_list in price_lists.iterator():
+        try:
+            if service.create_snapshot(price_list):
+                created += 1
+        except Exception as exc:
+            logger.error(f"Помилка створення знімка прайс-листа {price_list.id}: {exc}")
+
+    if created:
+        logger.info(f"Створено {created} знімків прайс-листів")
+    return created
+
+
+# ==================== RECALCULATION TASKS ====================
+
+
+@shared_task(acks_late=True)
+def recalculate_price_list(price_list_id, chunk_size=None):
+    """
+    Перерахунок цін одного прайс-листа (одна частина паралельного перерахунку)
+    """
+    import time
+    from pricelists.models import PriceList
+    from pricelists.services import PriceListService
+
+    try:
+        price_list = PriceList.objects.get(id=price_list_id)
+    except PriceList.DoesNotExist:
+        logger.error(f"Прайс-лист {price_list_id} не знайдено")
+        return {'price_list_id': str(price_list_id), 'processed': 0, 'updated': 0, 'seconds': 0}
+
+    started = time.monotonic()
+    result = PriceListService().recalculate_price_list(price_list, chunk_size)
+    result['price_list_id'] = str(price_list_id)
+    result['seconds'] = round(time.monotonic() - started, 2)
+
+    logger.info(
+        f"Прайс-лист {price_list_id}: перераховано {result['processed']} позицій, "
+        f"змінено {result['updated']} за {result['seconds']} с"
+    )
+    return result
+
+
+@shared_task
+def recalculate_all_price_lists(store_ids=None, chunk_size=None):
+    """
+    Паралельний перерахунок цін усіх прайс-листів
+
+    Кожен прайс-лист обробляється окремим завданням, а підсумок з пропускною
+    здатністю формується callback-завданням chord після завершення всіх частин.
+    """
+    import time
+    from celery import chord
+    from pricelists.models import PriceList
+
+    price_lists = PriceList.objects.all()
+    if store_ids:
+        price_lists = price_lists.filter(store_id__in=store_ids)
+    price_list_ids = [str(price_list_id) for price_list_id in price_lists.values_list('id', flat=True)]
+
+    if not price_list_ids:
+        return 0
+
+    chord(
+        recalculate_price_list.s(price_list_id, chunk_size) for price_list_id in price_list_ids
+    )(report_price_recalculation.s(time.time()))
+
+    logger.info(f"Запущено перерахунок {len(price_list_ids)} прайс-листів")
+    return len(price_list_ids)
+
+
+@shared_task
+def report_price_recalculation(results, started_at):
+    """
+    Підсумок паралельного перерахунку цін
+    """
+    import time
+
+    processed = sum(result['processed'] for result in results)
+    updated = sum(result['updated'] for result in results)
+    elapsed = max(time.time() - started_at, 0.001)
+
+    summary = {
+        'price_lists': len(results),
+        'processed': processed,
+        'updated': updated,
+        'seconds': round(elapsed, 2),
+        'items_per_second': round(processed / elapsed, 1),
+    }
+    logger.info(
+        f"Перерахунок цін завершено: {summary['price_lists']} прайс-листів, "
+        f"{processed} позицій ({updated} змінено) за {summary['seconds']} с, "
+        f"{summary['items_per_second']} позицій/с"
+    )
+    return summary
+
+
+# ==================== PRICE CHANGE OUTBOX TASKS ====================
+
+
+@shared_task
+def dispatch_price_changes():
+    """
+    Пакетна доставка подій змін цін споживачам (outbox)
+
+    Порція блокується з skip_locked, тому паралельні запуски не доставляють
+    ті самі події. Якщо споживач падає, порція залишається недоставленою і
+    буде повторена наступним запуском (доставка "принаймні один раз").
+    """
+    from pricelists.models import PriceChangeEvent
+    from pricelists.outbox import get_consumers
+
+    consumers = get_consumers()
+    dispatched = 0
+
+    for _batch in range(OUTBOX_MAX_BATCHES):
+        with transaction.atomic():
+            events = list(
+                PriceChangeEvent.objects.select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True)
+                .order_by('id')[:OUTBOX_BATCH_SIZE]
+            )
+            if not events:
+                break
+
+            for consumer in consumers:
+                try:
+                    consumer(events)
+                except Exception as exc:
+                    logger.error(f"Помилка споживача змін цін {consumer.__name__}: {exc}")
+                    raise
+
+            PriceChangeEvent.objects.filter(
+                id__in=[event.id for event in events]
+            ).update(dispatched_at=timezone.now())
+            dispatched += len(events)
+
+    if dispatched:
+        logger.info(f"Доставлено {dispatched} подій змін цін")
+    return dispatched
+
+
+@shared_task
+def purge_dispatched_price_changes():
+    """
+    Видалити доставлені події змін цін, старші за OUTBOX_RETENTION_DAYS
+    """
+    from pricelists.models import PriceChangeEvent
+
+    threshold = timezone.now() - timedelta(days=OUTBOX_RETENTION_DAYS)
+    deleted, _details = PriceChangeEvent.objects.filter(dispatched_at__lt=threshold).delete()
+
+    if deleted:
+        logger.info(f"Видалено {deleted} доставлених подій змін цін")
+    return deleted
+
+
+# ==================== ACTIVATION TASKS ====================
+
+
+@shared_task
+def prepare_scheduled_price_lists():
+    """
+    Заздалегідь перерахувати ціни прайс-листів перед запланованою активацією
+    """
+    from pricelists.services import PriceListService
+
+    prepared = PriceListService().prepare_scheduled_price_lists()
+    if prepared:
+        logger.info(f"Підготовлено {prepared} прайс-листів до активації")
+    return prepared
+
+
+@shared_task
+def activate_scheduled_price_lists():
+    """
+    Перемкнути діючі прайс-листи магазинів відповідно до valid_from/valid_until
+    """
+    from pricelists.services import PriceListService
+
+    return PriceListService().activate_effective_price_lists()
@@ -1,3 +1,774 @@
-from django.test import TestCase
+"""
+Тести для прайс-листів
+"""
+import io
+from decimal import Decimal
 
-# Create your tests here.
+import pandas as pd
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+
+from core.cache_utils import CommitBatch
+from pricelists.models import PriceList, PriceListItem, PriceListImportJob
+from pricelists.tasks import process_pricelist_import
+from products.models import Product
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+def commit():
+    """Застосувати відкладені до фіксації версії та інвалідації, ніби транзакцію тесту зафіксовано"""
+    run_on_commit = transaction.get_connection().run_on_commit
+    for item in list(run_on_commit):
+        callback = item[1]
+        if isinstance(getattr(callback, '__self__', None), CommitBatch):
+            run_on_commit.remove(item)
+            callback()
+
+
+@pytest.fixture
+def price_list(test_store, test_user):
+    return PriceList.objects.create(store=test_store, name='Основний', created_by=test_user)
+
+
+@pytest.fixture
+def products(test_store):
+    return [
+        Product.objects.create(
+            store=test_store, name=f'Товар {i}', slug=f'product-{i}',
+            description='', price=Decimal('100.00'), sku=f'SKU{i}'
+        )
+        for i in range(5)
+    ]
+
+
+def make_excel_upload(rows):
+    buffer = io.BytesIO()
+    pd.DataFrame(rows).to_excel(buffer, index=False)
+    return SimpleUploadedFile(
+        'prices.xlsx', buffer.getvalue(),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+@pytest.mark.unit
+class TestPriceListImportJob:
+    """Тести фонового імпорту прайс-листа"""
+
+    def make_job(self, price_list, user, rows):
+        return PriceListImportJob.objects.create(
+            price_list=price_list,
+            file=make_excel_upload(rows),
+            original_filename='prices.xlsx',
+            created_by=user
+        )
+
+    def test_import_job_processes_all_rows(self, price_list, products, test_user):
+        rows = [{'Назва товару': p.name, 'SKU': p.sku, 'Собівартість': 50} for p in products]
+        rows.append({'Назва товару': 'Невідомий', 'SKU': 'NOPE', 'Собівартість': 10})
+        job = self.make_job(price_list, test_user, rows)
+
+        assert process_pricelist_import(str(job.id)) is True
+
+        job.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.total_rows == 6
+        assert job.processed_rows == 6
+        assert job.created_count == 5
+        assert job.skipped_count == 1
+        assert len(job.errors) == 1
+        assert job.progress_percentage == 100
+        assert PriceListItem.objects.filter(price_list=price_list).count() == 5
+
+    def test_import_job_resumes_from_checkpoint(self, price_list, products, test_user):
+        rows = [{'Назва товару': p.name, 'SKU': p.sku, 'Собівартість': 50} for p in products]
+        job = self.make_job(price_list, test_user, rows)
+        # Імітуємо падіння воркера після обробки перших трьох рядків
+        job.status = 'processing'
+        job.processed_rows = 3
+        job.save()
+
+        process_pricelist_import(str(job.id))
+
+        job.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.created_count == 2
+        assert set(
+            PriceListItem.objects.filter(price_list=price_list).values_list('product__sku', flat=True)
+        ) == {'SKU3', 'SKU4'}
+
+    def test_import_job_survives_database_error_in_row(self, price_list, products, test_user, monkeypatch):
+        from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+        create_item = ExcelPriceListHandler._create_price_list_item
+
+        def create_duplicate(handler, price_list, product, item_data):
+            create_item(handler, price_list, product, item_data)
+            if product.sku == 'SKU1':
+                # Повторна позиція порушує unique — помилка БД посеред порції
+                create_item(handler, price_list, product, item_data)
+
+        monkeypatch.setattr(ExcelPriceListHandler, '_create_price_list_item', create_duplicate)
+        rows = [{'Назва товару': p.name, 'SKU': p.sku, 'Собівартість': 50} for p in products]
+        job = self.make_job(price_list, test_user, rows)
+
+        assert process_pricelist_import(str(job.id)) is True
+
+        job.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.created_count == 4
+        assert job.skipped_count == 1
+        assert set(
+            PriceListItem.objects.filter(price_list=price_list).values_list('product__sku', flat=True)
+        ) == {'SKU0', 'SKU2', 'SKU3', 'SKU4'}
+
+    def test_import_job_fails_on_invalid_structure(self, price_list, test_user):
+        job = self.make_job(price_list, test_user, [{'Щось': 1}])
+
+        assert process_pricelist_import(str(job.id)) is False
+
+        job.refresh_from_db()
+        assert job.status == 'failed'
+        assert job.errors
+
+
+@pytest.mark.unit
+class TestPriceListExport:
+    """Тести потокового експорту прайс-листа"""
+
+    @pytest.fixture
+    def items(self, price_list, products):
+        return [
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                cost_calculation_method='manual', manual_cost=Decimal('50.00'),
+                markup_type='percentage', markup_value=Decimal('20.00')
+            )
+            for product in products
+        ]
+
+    def test_export_rows_match_model_properties(self, price_list, items):
+        from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+        handler = ExcelPriceListHandler()
+        rows = list(handler.iter_export_rows(price_list))
+
+        assert len(rows) == len(items)
+        titles = [column[0] for column in handler.EXPORT_COLUMNS]
+        first = dict(zip(titles, rows[0]))
+        item = items[0]
+        assert first['Назва товару'] == item.product.name
+        assert first['Собівартість'] == float(item.current_cost)
+        assert first['Фінальна ціна'] == float(item.final_price)
+        assert first['Прибуток'] == float(item.profit_amount)
+        assert first['Рентабельність %'] == pytest.approx(float(item.profit_margin))
+
+    def test_export_to_excel_write_only(self, price_list, items):
+        from openpyxl import load_workbook
+        from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+        buffer = ExcelPriceListHandler().export_to_excel(price_list)
+        worksheet = load_workbook(buffer, read_only=True)['Прайс-лист']
+        rows = list(worksheet.iter_rows(values_only=True))
+
+        assert rows[0][0] == 'Назва товару'
+        assert len(rows) == len(items) + 1
+
+    def test_export_csv_stream(self, price_list, items):
+        from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+        chunks = list(ExcelPriceListHandler().iter_export_csv(price_list))
+
+        assert chunks[0].startswith('\ufeffНазва товару')
+        assert len(chunks) == len(items) + 1
+
+
+@pytest.mark.unit
+class TestPriceListAnalytics:
+    """Тести аналітики рентабельності в БД"""
+
+    @pytest.fixture
+    def items(self, price_list, products):
+        margins = [Decimal('-10'), Decimal('10'), Decimal('30'), Decimal('60'), Decimal('100')]
+        return [
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                cost_calculation_method='manual', manual_cost=Decimal('100.00'),
+                markup_type='percentage', markup_value=margin
+            )
+            for product, margin in zip(products, margins)
+        ]
+
+    def test_profitability_analysis_matches_python(self, price_list, items):
+        from pricelists.services import PriceListService
+
+        result = PriceListService()._compute_profitability_analysis(price_list)
+
+        margins = [item.profit_margin for item in items]
+        assert result['total_items'] == 5
+        assert result['average_margin'] == round(sum(margins) / len(margins), 2)
+        assert result['min_margin'] == round(min(margins), 2)
+        assert result['max_margin'] == round(max(margins), 2)
+        assert result['margin_distribution'] == {
+            'negative_margin': 1, 'low_margin': 1, 'medium_margin': 1, 'high_margin': 2
+        }
+        assert result['total_cost'] == Decimal('500.00')
+
+    def test_validate_reports_loss_making_items(self, price_list, items):
+        from pricelists.services import PriceListService
+
+        validation = PriceListService().validate_price_list(price_list)
+
+        assert validation['is_valid']
+        assert any(items[0].product.name in warning for warning in validation['warnings'])
+
+    def test_analytics_cache_invalidated_by_item_change(self, price_list, items):
+        from pricelists.services import PriceListService
+
+        service = PriceListService()
+        assert service.get_pricelist_analytics(price_list)['profitability_distribution'] == {
+            'low': 1, 'medium': 1, 'high': 3
+        }
+
+        items[0].markup_value = Decimal('50')
+        items[0].save()
+        commit()
+
+        assert service.get_pricelist_analytics(price_list)['profitability_distribution'] == {
+            'low': 0, 'medium': 1, 'high': 4
+        }
+
+
+@pytest.mark.unit
+class TestPriceListComparison:
+    """Тести порівняння прайс-листів"""
+
+    @pytest.fixture
+    def other_price_list(self, test_store, test_user):
+        return PriceList.objects.create(store=test_store, name='Оптовий', created_by=test_user)
+
+    def make_item(self, price_list, product, price):
+        return PriceListItem.objects.create(
+            price_list=price_list, product=product,
+            is_manual_override=True, manual_price=Decimal(price)
+        )
+
+    def test_comparison_counts_and_sorting(self, price_list, other_price_list, products):
+        from pricelists.services import PriceListService
+
+        for product, (price1, price2) in zip(products[:4], [
+            ('100', '110'), ('100', '50'), ('200', '200'), ('10', '15')
+        ]):
+            self.make_item(price_list, product, price1)
+            self.make_item(other_price_list, product, price2)
+        self.make_item(other_price_list, products[4], '100')
+
+        service = PriceListService()
+        result = service.get_price_comparison(price_list, other_price_list)
+
+        assert result['common_products'] == 4
+        assert result['only_in_first'] == 0
+        assert result['only_in_second'] == 1
+        assert result['total_differences'] == 3
+        assert [row['sku'] for row in result['price_differences']] == ['SKU1', 'SKU0', 'SKU3']
+        assert result['price_differences'][0]['difference'] == Decimal('-50.00')
+        assert result['price_differences'][0]['difference_percentage'] == Decimal('-50.00')
+
+        by_percent = service.get_price_comparison(
+            price_list, other_price_list, ordering='-difference_percentage', limit=1
+        )
+        assert [row['sku'] for row in by_percent['price_differences']] == ['SKU3']
+
+    def test_comparison_rejects_unknown_ordering(self, price_list, other_price_list):
+        from pricelists.services import PriceListService
+
+        with pytest.raises(ValueError):
+            PriceListService().get_comparison_queryset(price_list, other_price_list, ordering='id')
+
+
+@pytest.mark.unit
+class TestSyncPricesToProducts:
+    """Тести синхронізації цін до товарів"""
+
+    def test_sync_updates_only_changed_products(self, price_list, products):
+        from pricelists.services import PriceListService
+
+        for product, price in zip(products[:3], ['100', '120', '80']):
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                is_manual_override=True, manual_price=Decimal(price)
+            )
+
+        result = PriceListService().sync_prices_to_products(price_list)
+
+        assert result == {'updated': 2}
+        prices = dict(Product.objects.filter(store=price_list.store).values_list('sku', 'price'))
+        assert prices['SKU0'] == Decimal('100.00')
+        assert prices['SKU1'] == Decimal('120.00')
+        assert prices['SKU2'] == Decimal('80.00')
+        assert prices['SKU3'] == Decimal('100.00')
+        assert PriceListItem.objects.filter(
+            price_list=price_list, last_price_update__isnull=False
+        ).count() == 2
+
+        assert PriceListService().sync_prices_to_products(price_list) == {'updated': 0}
+
+
+@pytest.mark.unit
+class TestPriceResolver:
+    """Тести визначення цін з активного прайс-листа"""
+
+    @pytest.fixture
+    def resolver(self):
+        from pricelists.resolver import PriceResolver
+        return PriceResolver()
+
+    def test_resolves_batch_without_queries(self, resolver, price_list, products,
+                                            django_assert_num_queries):
+        for product in products[:3]:
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                is_manual_override=True, manual_price=Decimal('150.00')
+            )
+        commit()
+        store_id = price_list.store_id
+        product_ids = [product.id for product in products]
+
+        assert resolver.resolve_prices(store_id, product_ids) == {
+            product.id: Decimal('150.00') for product in products[:3]
+        }
+        with django_assert_num_queries(0):
+            resolver.resolve_prices(store_id, product_ids)
+            assert resolver.resolve_price(products[4]) == products[4].price
+
+    def test_item_change_invalidates_prices(self, resolver, price_list, products):
+        item = PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('150.00')
+        )
+        assert resolver.resolve_price(products[0]) == Decimal('150.00')
+
+        item.manual_price = Decimal('175.00')
+        item.save()
+
+        assert resolver.resolve_price(products[0]) == Decimal('175.00')
+        assert products[0].get_current_price_from_pricelist() == Decimal('175.00')
+
+    def test_default_price_list_has_priority(self, resolver, price_list, products, test_user):
+        default_list = PriceList.objects.create(
+            store=price_list.store, name='Роздріб', is_default=True, created_by=test_user
+        )
+        PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('150.00')
+        )
+        PriceListItem.objects.create(
+            price_list=default_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('120.00')
+        )
+
+        assert resolver.get_active_price_list_id(price_list.store_id) == default_list.id
+        assert resolver.resolve_price(products[0]) == Decimal('120.00')
+
+
+@pytest.mark.unit
+class TestCopyPriceList:
+    """Тести копіювання прайс-листа"""
+
+    def test_copy_with_adjustment_and_snapshot(self, price_list, products, test_user):
+        from pricelists.services import PriceListService
+
+        for product in products[:3]:
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                cost_calculation_method='manual', manual_cost=Decimal('100.00'),
+                markup_type='percentage', markup_value=Decimal('20.00')
+            )
+
+        new_list, copied = PriceListService().copy_price_list(
+            price_list, 'Сезонний', test_user, price_adjustment_percentage=Decimal('10')
+        )
+
+        assert copied == 3
+        item = new_list.items.get(product=products[0])
+        assert item.final_price == Decimal('132.00')
+        assert item.markup_value == Decimal('32.00')
+        # Перерахунок з собівартості дає ту саму ціну
+        assert item.calculate_price() == item.final_price
+        snapshot = new_list.snapshots.get()
+        assert snapshot.is_full
+        assert snapshot.items_count == 3
+
+    def test_copy_filters_by_category(self, price_list, products, test_user, test_store):
+        from pricelists.services import PriceListService
+        from products.models import Category
+
+        category = Category.objects.create(store=test_store, name='Напої')
+        for product in products[:2]:
+            product.category = category
+            product.save()
+        for product in products:
+            PriceListItem.objects.create(price_list=price_list, product=product)
+
+        new_list, copied = PriceListService().copy_price_list(
+            price_list, 'Напої', test_user, category_ids=[category.id]
+        )
+
+        assert copied == 2
+        assert set(new_list.items.values_list('product_id', flat=True)) == {
+            products[0].id, products[1].id
+        }
+
+
+@pytest.mark.unit
+class TestPriceListSnapshots:
+    """Тести версіонованих знімків цін"""
+
+    def test_codec_roundtrip(self):
+        from pricelists.utils.snapshot_codec import find_in_snapshot, pack_snapshot, unpack_snapshot
+
+        rows = [(42, Decimal('10.50'), None), (7, Decimal('99.99'), Decimal('50.00')), (1000, None, None)]
+        blob = pack_snapshot(rows)
+
+        assert unpack_snapshot(blob) == {
+            7: (Decimal('99.99'), Decimal('50.00')),
+            42: (Decimal('10.50'), None),
+            1000: (None, None),
+        }
+        assert find_in_snapshot(blob, 42) == (Decimal('10.50'), None)
+        assert find_in_snapshot(blob, 43) is None
+
+    def test_bulk_markup_keeps_previous_prices(self, price_list, products, test_user):
+        from pricelists.services import PriceListService, PriceSnapshotService
+
+        for product in products[:2]:
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                cost_calculation_method='manual', manual_cost=Decimal('100.00'),
+                markup_type='percentage', markup_value=Decimal('20.00')
+            )
+
+        PriceListService().apply_bulk_markup(price_list, test_user, 'set_markup', Decimal('50'))
+
+        timeline = PriceSnapshotService().get_price_timeline(price_list, products[0].id)
+        assert [entry['price'] for entry in timeline] == [Decimal('120.00'), Decimal('150.00')]
+        assert [entry['change_reason'] for entry in timeline] == ['manual', 'bulk_update']
+
+    def test_item_edits_snapshotted_on_dispatch(self, price_list, products):
+        from pricelists.outbox import record_price_list_snapshots
+        from pricelists.models import PriceChangeEvent
+
+        PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('100.00')
+        )
+        commit()
+
+        record_price_list_snapshots(list(PriceChangeEvent.objects.all()))
+
+        assert price_list.snapshots.count() == 1
+
+    def test_diffs_reconstruct_price_timeline(self, price_list, products, test_user):
+        from datetime import timedelta
+        from django.utils import timezone
+        from pricelists.models import PriceListSnapshot
+        from pricelists.services import PriceSnapshotService
+
+        service = PriceSnapshotService()
+        items = [
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                is_manual_override=True, manual_price=Decimal('100.00')
+            )
+            for product in products[:3]
+        ]
+        first = service.create_snapshot(price_list, user=test_user)
+        assert first.is_full
+        assert service.create_snapshot(price_list) is None
+
+        items[0].manual_price = Decimal('120.00')
+        items[0].save()
+        items[2].delete()
+        commit()
+
+        second = service.create_snapshot(price_list, change_reason='bulk_update')
+
+        assert not second.is_full
+        assert second.changed_count == 2
+        assert second.items_count == 2
+
+        # Переносимо перший знімок у минуле, щоб перевірити ціну на дату
+        past = timezone.now() - timedelta(days=1)
+        PriceListSnapshot.objects.filter(pk=first.pk).update(created_at=past)
+
+        assert service.get_prices_at(price_list, past)[products[0].id][0] == Decimal('100.00')
+        current = service.get_prices_at(price_list, timezone.now())
+        assert current[products[0].id][0] == Decimal('120.00')
+        assert products[2].id not in current
+
+        timeline = service.get_price_timeline(price_list, products[0].id)
+        assert [entry['price'] for entry in timeline] == [Decimal('100.00'), Decimal('120.00')]
+        removed = service.get_price_timeline(price_list, products[2].id)
+        assert [entry['price'] for entry in removed] == [Decimal('100.00'), None]
+
+    def test_history_endpoint_built_from_snapshots(self, authenticated_client, price_list, products):
+        from django.urls import reverse
+        from pricelists.services import PriceSnapshotService
+
+        service = PriceSnapshotService()
+        items = [
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                is_manual_override=True, manual_price=Decimal('100.00')
+            )
+            for product in products[:2]
+        ]
+        service.create_snapshot(price_list)
+
+        items[0].manual_price = Decimal('120.00')
+        items[0].save()
+        commit()
+        service.create_snapshot(price_list, change_reason='bulk_update')
+
+        url = reverse('pricelists:price-history-list', args=[price_list.store_id, price_list.id])
+        response = authenticated_client.get(url)
+
+        assert response.status_code == 200
+        [change] = response.json()['results']
+        assert change['product_id'] == products[0].id
+        assert change['product_name'] == products[0].name
+        assert (change['old_price'], change['new_price']) == ('100.00', '120.00')
+        assert change['change_reason'] == 'bulk_update'
+        assert change['price_change_percentage'] == '20.00'
+
+        assert authenticated_client.get(url, {'product_id': products[1].id}).json()['results'] == []
+
+    def test_periodic_task_snapshots_changed_lists(self, price_list, products):
+        from pricelists.tasks import snapshot_changed_price_lists
+
+        PriceListItem.objects.create(price_list=price_list, product=products[0])
+
+        assert snapshot_changed_price_lists() == 1
+        assert snapshot_changed_price_lists() == 0
+
+
+@pytest.mark.unit
+class TestPriceRecalculation:
+    """Тести пакетного перерахунку цін"""
+
+    def test_recalculate_updates_changed_items(self, price_list, products):
+        from pricelists.services import PriceListService
+        from pricelists.tasks import recalculate_price_list
+
+        for product in products:
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                cost_calculation_method='manual', manual_cost=Decimal('100.00'),
+                markup_type='percentage', markup_value=Decimal('20.00')
+            )
+        # Зміна націнки в обхід save() залишає застарілі ціни
+        PriceListItem.objects.filter(product__in=products[:2]).update(markup_value=Decimal('50.00'))
+        version = price_list.get_current_version()
+
+        result = recalculate_price_list(str(price_list.id), chunk_size=2)
+
+        assert result['processed'] == 5
+        assert result['updated'] == 2
+        assert set(
+            PriceListItem.objects.filter(price_list=price_list).values_list('final_price', flat=True)
+        ) == {Decimal('150.00'), Decimal('120.00')}
+        assert price_list.get_current_version() > version
+        assert PriceListService().recalculate_price_list(price_list)['updated'] == 0
+
+
+@pytest.mark.unit
+class TestProductMatcher:
+    """Тести нечіткого зіставлення товарів при імпорті"""
+
+    @pytest.fixture
+    def named_products(self, test_store):
+        names = ['Кава мелена Lavazza 250г', "Сік апельсиновий Сандора 1л", 'Чай зелений Greenfield']
+        return [
+            Product.objects.create(
+                store=test_store, name=name, slug=f'named-{i}', description='', price=Decimal('10'),
+                sku=f'N{i}'
+            )
+            for i, name in enumerate(names)
+        ]
+
+    def test_normalization_and_fuzzy_match(self, test_store, named_products):
+        from pricelists.utils.product_matcher import ProductMatcher, normalize_name
+
+        assert normalize_name("  Сік  апельсиновий, САНДОРА ’1л' ") == 'сік апельсиновий сандора 1л'
+
+        matcher = ProductMatcher(test_store, threshold=0.4)
+
+        assert matcher.match(sku='N2') == named_products[2].id
+        assert matcher.match(name='сік апельсиновий сандора, 1л') == named_products[1].id
+        assert matcher.match(name='Кава Lavazza мелена 250 г') == named_products[0].id
+        assert matcher.match(name='Молоко 2.5%') is None
+        assert matcher.candidates('Чай Greenfield')[0][0] == named_products[2].id
+
+    def test_import_matches_names_with_single_index(self, price_list, named_products):
+        from pricelists.utils.excel_handler import ExcelPriceListHandler
+
+        df = pd.DataFrame([
+            {'Назва товару': 'КАВА мелена lavazza 250г', 'Собівартість': 100},
+            {'Назва товару': 'Сік апельсиновий Сандора 1 л', 'Собівартість': 30},
+            {'Назва товару': 'Невідомий товар', 'Собівартість': 10},
+        ])
+        handler = ExcelPriceListHandler(match_threshold=0.5)
+        mapping = handler.detect_column_mapping(df)
+
+        result = handler.process_rows(df, price_list, mapping, update_existing=True)
+
+        assert result['created'] == 2
+        assert result['skipped'] == 1
+        assert set(price_list.items.values_list('product_id', flat=True)) == {
+            named_products[0].id, named_products[1].id
+        }
+
+
+@pytest.mark.unit
+class TestPriceChangeOutbox:
+    """Тести outbox змін цін"""
+
+    def test_item_and_product_changes_are_recorded(self, price_list, products):
+        from pricelists.models import PriceChangeEvent
+
+        item = PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('150.00')
+        )
+        item.exclude_from_auto_update = True
+        item.save()
+        item.manual_price = Decimal('160.00')
+        item.save()
+        commit()
+
+        product = Product.objects.get(pk=products[1].pk)
+        product.price = Decimal('90.00')
+        product.save()
+        product.name = 'Нова назва'
+        product.save()
+
+        events = list(PriceChangeEvent.objects.values_list('source', 'product_id', 'old_price', 'new_price'))
+        assert events == [
+            ('pricelist_item', products[0].id, None, Decimal('150.00')),
+            ('pricelist_item', products[0].id, Decimal('150.00'), Decimal('160.00')),
+            ('product', products[1].id, Decimal('100.00'), Decimal('90.00')),
+        ]
+        assert PriceChangeEvent.objects.filter(source='pricelist_item').last().version == (
+            price_list.get_current_version()
+        )
+
+    def test_bulk_sync_records_events_and_dispatch_marks_them(self, price_list, products, settings):
+        from pricelists.models import PriceChangeEvent
+        from pricelists.services import PriceListService
+        from pricelists.tasks import dispatch_price_changes
+
+        for product in products[:2]:
+            PriceListItem.objects.create(
+                price_list=price_list, product=product,
+                is_manual_override=True, manual_price=Decimal('120.00')
+            )
+        PriceChangeEvent.objects.all().delete()
+
+        PriceListService().sync_prices_to_products(price_list)
+
+        assert PriceChangeEvent.objects.filter(source='product', new_price=Decimal('120.00')).count() == 2
+
+        delivered = []
+        settings.PRICE_CHANGE_CONSUMERS = ['pricelists.tests.collect_price_changes']
+        collect_price_changes.target = delivered
+
+        assert dispatch_price_changes() == 2
+        assert len(delivered) == 2
+        assert not PriceChangeEvent.objects.filter(dispatched_at__isnull=True).exists()
+        assert dispatch_price_changes() == 0
+
+
+def collect_price_changes(events):
+    """Тестовий споживач подій змін цін"""
+    collect_price_changes.target.extend(events)
+
+
+@pytest.mark.unit
+class TestScheduledActivation:
+    """Тести запланованої активації прайс-листів"""
+
+    def test_scheduled_price_list_switches_on_time(self, price_list, products, test_user):
+        from datetime import timedelta
+        from django.utils import timezone
+        from pricelists.resolver import price_resolver
+        from pricelists.services import PriceListService
+
+        now = timezone.now()
+        promo = PriceList.objects.create(
+            store=price_list.store, name='Акція', created_by=test_user,
+            valid_from=now + timedelta(hours=1), valid_until=now + timedelta(days=1)
+        )
+        PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            is_manual_override=True, manual_price=Decimal('150.00')
+        )
+        PriceListItem.objects.create(
+            price_list=promo, product=products[0],
+            is_manual_override=True, manual_price=Decimal('99.00')
+        )
+        service = PriceListService()
+        store_id = price_list.store_id
+
+        assert service.activate_effective_price_lists([store_id], at=now) == 1
+        assert price_resolver.resolve_price(products[0]) == Decimal('150.00')
+        assert service.activate_effective_price_lists([store_id], at=now) == 0
+
+        assert service.activate_effective_price_lists([store_id], at=now + timedelta(hours=2)) == 1
+        assert price_resolver.get_active_price_list_id(store_id) == promo.id
+        assert price_resolver.resolve_price(products[0]) == Decimal('99.00')
+
+        assert service.activate_effective_price_lists([store_id], at=now + timedelta(days=2)) == 1
+        assert price_resolver.get_active_price_list_id(store_id) == price_list.id
+
+    def test_housekeeping_save_keeps_version(self, price_list, django_capture_on_commit_callbacks):
+        from django.utils import timezone
+        from pricelists.signals import price_list_versions
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            price_list.last_cost_sync = timezone.now()
+            price_list.save(update_fields=['last_cost_sync'])
+
+        assert callbacks == []
+        assert not price_list_versions.is_pending(price_list.pk)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            price_list.valid_until = timezone.now()
+            price_list.save(update_fields=['valid_until'])
+
+        assert callbacks
+        assert price_list_versions.is_pending(price_list.pk)
+        commit()
+
+    def test_upcoming_price_list_is_prepared_once(self, price_list, products):
+        from datetime import timedelta
+        from django.utils import timezone
+        from pricelists.services import PriceListService
+
+        PriceListItem.objects.create(
+            price_list=price_list, product=products[0],
+            cost_calculation_method='manual', manual_cost=Decimal('100.00'),
+            markup_type='percentage', markup_value=Decimal('20.00')
+        )
+        PriceListItem.objects.filter(price_list=price_list).update(markup_value=Decimal('50.00'))
+        PriceList.objects.filter(pk=price_list.pk).update(
+            valid_from=timezone.now() + timedelta(minutes=30)
+        )
+        service = PriceListService()
+
+        assert service.prepare_scheduled_price_lists() == 1
+        assert price_list.items.get().final_price == Decimal('150.00')
+        assert service.prepare_scheduled_price_lists() == 0
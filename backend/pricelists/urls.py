@@ -31,11 +31,41 @@ urlpatterns = [
          views.execute_bulk_update, 
          name='execute-bulk-update'),
     
-    # API для історії зміни цін
+    # API для історії зміни цін (відновлюється зі знімків)
     path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/history/', 
          views.PriceHistoryListView.as_view(), 
          name='price-history-list'),
     
+    # API для знімків цін (історія у вигляді різниць між версіями)
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/snapshots/', 
+         views.PriceListSnapshotListView.as_view(), 
+         name='pricelist-snapshot-list'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/prices-at/', 
+         views.pricelist_prices_at, 
+         name='pricelist-prices-at'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/items/<uuid:pk>/timeline/', 
+         views.pricelist_item_price_timeline, 
+         name='pricelist-item-price-timeline'),
+    
+    # API для фонового імпорту з Excel
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/imports/', 
+         views.PriceListImportJobListView.as_view(), 
+         name='pricelist-import-list'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/imports/start/', 
+         views.start_pricelist_import, 
+         name='pricelist-import-start'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/imports/<uuid:pk>/', 
+         views.PriceListImportJobDetailView.as_view(), 
+         name='pricelist-import-detail'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/imports/<uuid:job_id>/resume/', 
+         views.resume_pricelist_import, 
+         name='pricelist-import-resume'),
+    
     # Додаткові операції
     path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/sync-costs/', 
          views.sync_costs_from_warehouse, 
@@ -45,7 +75,15 @@ urlpatterns = [
          views.pricelist_analytics, 
          name='pricelist-analytics'),
     
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/compare/<uuid:other_id>/', 
+         views.compare_pricelists, 
+         name='compare-pricelists'),
+    
     path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/copy/', 
          views.copy_pricelist, 
          name='copy-pricelist'),
+    
+    path('api/stores/<int:store_id>/pricelists/<uuid:pricelist_id>/export/', 
+         views.export_pricelist, 
+         name='export-pricelist'),
 ]
\ No newline at end of file
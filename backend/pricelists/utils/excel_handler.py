@@ -1,17 +1,29 @@
 import pandas as pd
 import io
+import csv
+import tempfile
 from decimal import Decimal, InvalidOperation
+from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from typing import Dict, List, Tuple, Optional, Union
 import logging
 
 from products.models import Product
 from ..models import PriceList, PriceListItem
+from .product_matcher import ProductMatcher
 
 logger = logging.getLogger(__name__)
 
 
+class _EchoBuffer:
+    """Псевдо-буфер для csv.writer: повертає рядок замість запису"""
+    
+    def write(self, value):
+        return value
+
+
 class ExcelPriceListHandler:
     """Обробник Excel файлів для прайс-листів"""
     
@@ -27,9 +39,48 @@ class ExcelPriceListHandler:
         'category': ['категорія', 'category', 'группа', 'категория']
     }
     
-    def __init__(self):
+    # Колонки експорту: (заголовок, поле queryset, тип значення)
+    EXPORT_COLUMNS = [
+        ('Назва товару', 'product__name', 'text'),
+        ('SKU', 'product__sku', 'text'),
+        ('Штрихкод', 'product__barcode_info__barcode', 'text'),
+        ('Категорія', 'category__name', 'text'),
+        ('Собівартість', 'effective_cost', 'decimal'),
+        ('Тип націнки', 'markup_type', 'markup_type'),
+        ('Націнка', 'markup_value', 'decimal'),
+        ('Розрахована ціна', 'calculated_price', 'decimal'),
+        ('Ручна ціна', 'manual_price', 'optional_decimal'),
+        ('Фінальна ціна', 'final_price', 'decimal'),
+        ('Рентабельність %', 'effective_margin', 'decimal'),
+        ('Прибуток', 'effective_profit', 'decimal'),
+        ('Мін. ціна', 'min_price', 'optional_decimal'),
+        ('Макс. ціна', 'max_price', 'optional_decimal'),
+        ('Ручне перевизначення', 'is_manual_override', 'bool'),
+        ('Останнє оновлення', 'updated_at', 'datetime'),
+    ]
+    
+    # Ширина колонок Excel за типом значення
+    EXPORT_COLUMN_WIDTHS = {
+        'text': 40,
+        'markup_type': 28,
+        'datetime': 18,
+    }
+    
+    # Розмір порції при читанні з БД
+    EXPORT_CHUNK_SIZE = 2000
+    
+    # Після цього розміру файл експорту переноситься з пам'яті на диск
+    EXPORT_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+    
+    def __init__(self, match_threshold: Optional[float] = None):
         self.errors = []
         self.warnings = []
+        # Поріг схожості назв для нечіткого зіставлення товарів (0..1)
+        self.match_threshold = (
+            match_threshold if match_threshold is not None
+            else getattr(settings, 'PRICELIST_IMPORT_MATCH_THRESHOLD', ProductMatcher.DEFAULT_THRESHOLD)
+        )
+        self._matchers = {}
     
     def detect_column_mapping(self, df: pd.DataFrame) -> Dict[str, str]:
         """Автоматичне визначення відповідності колонок"""
@@ -90,6 +141,10 @@ class ExcelPriceListHandler:
         except (ValueError, InvalidOperation):
             return None
     
+    def read_dataframe(self, excel_file) -> pd.DataFrame:
+        """Читання Excel файлу в DataFrame"""
+        return pd.read_excel(excel_file)
+    
     def import_from_excel(
         self, 
         excel_file, 
@@ -101,7 +156,7 @@ class ExcelPriceListHandler:
         
         try:
             # Читаємо Excel файл
-            df = pd.read_excel(excel_file)
+            df = self.read_dataframe(excel_file)
             
             # Автоматично визначаємо колонки якщо не передано
             if not mapping:
@@ -140,101 +195,121 @@ class ExcelPriceListHandler:
     ) -> Dict[str, int]:
         """Обробка даних з Excel"""
         
+        result = self.process_rows(df, price_list, mapping, update_existing)
+        result['success'] = True
+        result['warnings'] = self.warnings
+        return result
+    
+    def process_rows(
+        self,
+        df: pd.DataFrame,
+        price_list: PriceList,
+        mapping: Dict[str, str],
+        update_existing: bool,
+        start: int = 0,
+        stop: Optional[int] = None
+    ) -> Dict:
+        """Обробка діапазону рядків [start, stop) з Excel"""
+        
         processed = 0
         created = 0
         updated = 0
         skipped = 0
         errors = []
         
-        for index, row in df.iterrows():
+        for index, row in df.iloc[start:stop].iterrows():
             try:
-                # Отримуємо назву товару
-                product_name = row.get(mapping.get('product_name', ''), '').strip()
-                if not product_name:
-                    skipped += 1
-                    continue
-                
-                # Шукаємо товар
-                product = self._find_product(row, mapping, price_list.store)
-                if not product:
-                    errors.append(f"Рядок {index + 2}: Товар '{product_name}' не знайдено")
-                    skipped += 1
-                    continue
-                
-                # Перевіряємо чи існує позиція в прайс-листі
-                existing_item = PriceListItem.objects.filter(
-                    price_list=price_list,
-                    product=product
-                ).first()
-                
-                if existing_item and not update_existing:
-                    skipped += 1
-                    continue
-                
-                # Отримуємо дані для позиції
-                item_data = self._extract_item_data(row, mapping)
-                
-                if existing_item:
-                    # Оновлюємо існуючу позицію
-                    self._update_price_list_item(existing_item, item_data)
-                    updated += 1
-                else:
-                    # Створюємо нову позицію
-                    self._create_price_list_item(price_list, product, item_data)
-                    created += 1
-                
-                processed += 1
-                
+                # Точка збереження на рядок: помилка БД в одному рядку
+                # не повинна зламати транзакцію всієї порції імпорту
+                with transaction.atomic():
+                    outcome, error = self._process_row(index, row, price_list, mapping, update_existing)
             except Exception as e:
-                errors.append(f"Рядок {index + 2}: {str(e)}")
+                outcome, error = 'skipped', f"Рядок {index + 2}: {str(e)}"
+            
+            if error:
+                errors.append(error)
+            
+            if outcome == 'created':
+                created += 1
+                processed += 1
+            elif outcome == 'updated':
+                updated += 1
+                processed += 1
+            else:
                 skipped += 1
         
         return {
-            'success': True,
             'processed': processed,
             'created': created,
             'updated': updated,
             'skipped': skipped,
-            'errors': errors,
-            'warnings': self.warnings
+            'errors': errors
         }
     
-    def _find_product(self, row: pd.Series, mapping: Dict[str, str], store) -> Optional[Product]:
-        """Пошук товару за різними критеріями"""
-        
-        # Спочатку шукаємо по SKU
-        if 'sku' in mapping:
-            sku = str(row.get(mapping['sku'], '')).strip()
-            if sku:
-                product = Product.objects.filter(store=store, sku=sku).first()
-                if product:
-                    return product
-        
-        # Потім по штрихкоду
-        if 'barcode' in mapping:
-            barcode = str(row.get(mapping['barcode'], '')).strip()
-            if barcode:
-                product = Product.objects.filter(store=store, barcode=barcode).first()
-                if product:
-                    return product
-        
-        # Нарешті по назві
+    def _process_row(
+        self,
+        index: int,
+        row: pd.Series,
+        price_list: PriceList,
+        mapping: Dict[str, str],
+        update_existing: bool
+    ) -> Tuple[str, Optional[str]]:
+        """Обробка одного рядка Excel. Повертає (результат, помилка)"""
+        
+        # Отримуємо назву товару
         product_name = row.get(mapping.get('product_name', ''), '').strip()
-        if product_name:
-            # Точний збіг
-            product = Product.objects.filter(store=store, name=product_name).first()
-            if product:
-                return product
-            
-            # Часткове співпадіння (якщо точний збіг не знайдено)
-            product = Product.objects.filter(
-                store=store, 
-                name__icontains=product_name
-            ).first()
-            if product:
-                return product
-        
-        return None
+        if not product_name:
+            return 'skipped', None
+        
+        # Шукаємо товар
+        product = self._find_product(row, mapping, price_list.store)
+        if not product:
+            return 'skipped', f"Рядок {index + 2}: Товар '{product_name}' не знайдено"
+        
+        # Перевіряємо чи існує позиція в прайс-листі
+        existing_item = PriceListItem.objects.filter(
+            price_list=price_list,
+            product=product
+        ).first()
+        
+        if existing_item and not update_existing:
+            return 'skipped', None
+        
+        # Отримуємо дані для позиції
+        item_data = self._extract_item_data(row, mapping)
+        
+        if existing_item:
+            # Оновлюємо існуючу позицію
+            self._update_price_list_item(existing_item, item_data)
+            return 'updated', None
+        
+        # Створюємо нову позицію
+        self._create_price_list_item(price_list, product, item_data)
+        return 'created', None
+    
+    def get_matcher(self, store) -> ProductMatcher:
+        """Індекс товарів магазину (будується один раз на обробник, тобто на імпорт)"""
+        if store.id not in self._matchers:
+            self._matchers[store.id] = ProductMatcher(store, threshold=self.match_threshold)
+        return self._matchers[store.id]
+    
+    def _find_product(self, row: pd.Series, mapping: Dict[str, str], store) -> Optional[Product]:
+        """Пошук товару за SKU, штрихкодом або нечітким збігом назви"""
+        
+        def cell(field):
+            if field not in mapping:
+                return ''
+            value = row.get(mapping[field], '')
+            return '' if pd.isna(value) else str(value).strip()
+        
+        product_id = self.get_matcher(store).match(
+            sku=cell('sku'),
+            barcode=cell('barcode'),
+            name=cell('product_name')
+        )
+        if product_id is None:
+            return None
+        return Product.objects.filter(id=product_id).first()
     
     def _extract_item_data(self, row: pd.Series, mapping: Dict[str, str]) -> Dict:
         """Витягування даних для позиції прайс-листа"""
@@ -298,56 +373,75 @@ class ExcelPriceListHandler:
         
         item.save()
     
-    def export_to_excel(self, price_list: PriceList) -> io.BytesIO:
-        """Експорт прайс-листа в Excel"""
-        
-        # Підготовка даних
-        data = []
-        for item in price_list.items.select_related('product', 'category'):
-            data.append({
-                'Назва товару': item.product.name,
-                'SKU': item.product.sku or '',
-                'Штрихкод': item.product.barcode or '',
-                'Категорія': item.category.name if item.category else '',
-                'Собівартість': float(item.current_cost) if item.current_cost else 0,
-                'Тип націнки': item.get_markup_type_display(),
-                'Націнка': float(item.markup_value),
-                'Розрахована ціна': float(item.calculated_price) if item.calculated_price else 0,
-                'Ручна ціна': float(item.manual_price) if item.manual_price else '',
-                'Фінальна ціна': float(item.final_price),
-                'Рентабельність %': float(item.profit_margin),
-                'Прибуток': float(item.profit_amount),
-                'Мін. ціна': float(item.min_price) if item.min_price else '',
-                'Макс. ціна': float(item.max_price) if item.max_price else '',
-                'Ручне перевизначення': 'Так' if item.is_manual_override else 'Ні',
-                'Останнє оновлення': item.updated_at.strftime('%d.%m.%Y %H:%M') if item.updated_at else ''
-            })
-        
-        # Створення DataFrame
-        df = pd.DataFrame(data)
-        
-        # Запис в Excel
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Прайс-лист', index=False)
-            
-            # Налаштування ширини колонок
-            worksheet = writer.sheets['Прайс-лист']
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
+    def get_export_queryset(self, price_list: PriceList):
+        """Плоский набір значень для експорту без створення моделей"""
+        return (
+            PriceListItem.objects.filter(price_list=price_list)
+            .with_profit()
+            .order_by('product__name')
+            .values_list(*[column[1] for column in self.EXPORT_COLUMNS])
+        )
+    
+    def iter_export_rows(self, price_list: PriceList):
+        """Генератор рядків експорту (значення у порядку EXPORT_COLUMNS)"""
+        markup_types = dict(PriceListItem.MARKUP_TYPE_CHOICES)
+        queryset = self.get_export_queryset(price_list)
+        
+        for values in queryset.iterator(chunk_size=self.EXPORT_CHUNK_SIZE):
+            row = []
+            for (title, field, kind), value in zip(self.EXPORT_COLUMNS, values):
+                if kind == 'markup_type':
+                    value = str(markup_types.get(value, value))
+                elif kind == 'bool':
+                    value = 'Так' if value else 'Ні'
+                elif kind == 'datetime':
+                    value = value.strftime('%d.%m.%Y %H:%M') if value else ''
+                elif kind == 'decimal':
+                    value = float(value) if value is not None else 0
+                elif kind == 'optional_decimal':
+                    value = float(value) if value is not None else ''
+                elif value is None:
+                    value = ''
+                row.append(value)
+            yield row
+    
+    def export_to_excel(self, price_list: PriceList):
+        """
+        Потоковий експорт прайс-листа в Excel
+        
+        Використовує write-only режим openpyxl: рядки записуються одразу на диск
+        і не утримуються в пам'яті. Повертає файловий об'єкт на початку файлу.
+        """
+        from openpyxl import Workbook
+        from openpyxl.utils import get_column_letter
+        
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Прайс-лист')
+        
+        # Ширина колонок задається наперед — write-only аркуш не можна перечитати
+        for index, (title, field, kind) in enumerate(self.EXPORT_COLUMNS, start=1):
+            width = self.EXPORT_COLUMN_WIDTHS.get(kind, 14)
+            worksheet.column_dimensions[get_column_letter(index)].width = max(width, len(title) + 2)
+        
+        worksheet.append([column[0] for column in self.EXPORT_COLUMNS])
+        for row in self.iter_export_rows(price_list):
+            worksheet.append(row)
+        
+        buffer = tempfile.SpooledTemporaryFile(max_size=self.EXPORT_SPOOL_MAX_SIZE)
+        workbook.save(buffer)
         buffer.seek(0)
         return buffer
     
+    def iter_export_csv(self, price_list: PriceList):
+        """Генератор CSV рядків для StreamingHttpResponse"""
+        pseudo_buffer = _EchoBuffer()
+        writer = csv.writer(pseudo_buffer)
+        
+        # BOM, щоб Excel коректно відкривав кирилицю
+        yield '\ufeff' + writer.writerow([column[0] for column in self.EXPORT_COLUMNS])
+        for row in self.iter_export_rows(price_list):
+            yield writer.writerow(row)
+    
     def generate_template(self) -> io.BytesIO:
         """Генерація шаблону Excel для імпорту"""
         
@@ -0,0 +1,114 @@
+"""
+Індекс нечіткого пошуку товарів магазину для імпорту прайс-листів
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import re
+import unicodedata
+
+from products.models import Product
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+# Різні варіанти апострофа в українських назвах зводимо до одного символу
+_APOSTROPHES = str.maketrans({'’': "'", 'ʼ': "'", '`': "'", '‘': "'"})
+
+
+def normalize_name(value: str) -> str:
+    """Нормалізована назва: нижній регістр, без пунктуації та зайвих пробілів"""
+    value = unicodedata.normalize('NFKC', str(value)).translate(_APOSTROPHES).casefold()
+    value = value.replace("'", '').replace('ё', 'е')
+    return ' '.join(_NON_WORD_RE.sub(' ', value).split())
+
+
+def trigrams(normalized: str) -> Set[str]:
+    """Набір триграм як у pg_trgm: кожне слово доповнюється двома пробілами зліва та одним справа"""
+    result = set()
+    for word in normalized.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+class ProductMatcher:
+    """
+    Індекс товарів магазину для зіставлення рядків імпорту
+
+    Будується один раз на імпорт: точні відповідники за SKU, штрихкодом та
+    нормалізованою назвою, а також інвертований індекс триграм назв. Схожість
+    рахується як у pg_trgm: спільні триграми / об'єднання триграм.
+    """
+
+    DEFAULT_THRESHOLD = 0.5
+    DEFAULT_TOP_K = 5
+
+    def __init__(self, store, threshold: Optional[float] = None):
+        self.threshold = self.DEFAULT_THRESHOLD if threshold is None else threshold
+        self.by_sku: Dict[str, int] = {}
+        self.by_barcode: Dict[str, int] = {}
+        self.by_name: Dict[str, int] = {}
+        self.trigram_counts: Dict[int, int] = {}
+        self.index: Dict[str, List[int]] = defaultdict(list)
+        self._build(store)
+
+    def _build(self, store):
+        rows = Product.objects.filter(store=store).order_by('id').values_list(
+            'id', 'name', 'sku', 'barcode_info__barcode'
+        )
+        for product_id, name, sku, barcode in rows.iterator(chunk_size=5000):
+            if sku:
+                self.by_sku.setdefault(sku.strip(), product_id)
+            if barcode:
+                self.by_barcode.setdefault(barcode.strip(), product_id)
+
+            normalized = normalize_name(name)
+            if not normalized or normalized in self.by_name:
+                continue
+            self.by_name[normalized] = product_id
+
+            grams = trigrams(normalized)
+            self.trigram_counts[product_id] = len(grams)
+            for gram in grams:
+                self.index[gram].append(product_id)
+
+    def candidates(self, name: str, top_k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Найкращі кандидати за схожістю назви: [(product_id, схожість)]"""
+        query = trigrams(normalize_name(name))
+        if not query:
+            return []
+
+        shared = defaultdict(int)
+        for gram in query:
+            for product_id in self.index.get(gram, ()):
+                shared[product_id] += 1
+
+        scored = (
+            (product_id, common / (len(query) + self.trigram_counts[product_id] - common))
+            for product_id, common in shared.items()
+        )
+        return heapq.nlargest(top_k or self.DEFAULT_TOP_K, scored, key=lambda candidate: candidate[1])
+
+    def match_name(self, name: str) -> Optional[int]:
+        """ID товару за назвою: точний збіг нормалізованої назви або найкращий кандидат вище порогу"""
+        normalized = normalize_name(name)
+        if not normalized:
+            return None
+        if normalized in self.by_name:
+            return self.by_name[normalized]
+
+        best = self.candidates(normalized, top_k=1)
+        if best and best[0][1] >= self.threshold:
+            return best[0][0]
+        return None
+
+    def match(self, sku: str = '', barcode: str = '', name: str = '') -> Optional[int]:
+        """ID товару за SKU, штрихкодом або назвою (у порядку пріоритету)"""
+        if sku and sku in self.by_sku:
+            return self.by_sku[sku]
+        if barcode and barcode in self.by_barcode:
+            return self.by_barcode[barcode]
+        if name:
+            return self.match_name(name)
+        return None
@@ -0,0 +1,122 @@
+"""
+Компактне кодування знімків цін прайс-листа
+
+Знімок зберігається колонками: ID товарів (дельта-кодовані), ціни та
+собівартості в копійках. Колонки пакуються у 64-бітні масиви та
+стискаються zlib. Відсутнє значення (або видалена позиція) кодується як -1.
+"""
+
+from array import array
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import accumulate
+from typing import Dict, Iterable, Optional, Tuple
+import struct
+import sys
+import zlib
+
+MAGIC = b'PLS1'
+HEADER = struct.Struct('<4sI')
+MISSING = -1
+CENT = Decimal('0.01')
+
+# Значення знімка: (ціна, собівартість); (None, None) — позицію видалено
+SnapshotValue = Tuple[Optional[Decimal], Optional[Decimal]]
+
+
+def _to_cents(value: Optional[Decimal]) -> int:
+    if value is None:
+        return MISSING
+    return int((Decimal(value) * 100).to_integral_value())
+
+
+def _from_cents(value: int) -> Optional[Decimal]:
+    if value == MISSING:
+        return None
+    return (Decimal(value) * CENT).quantize(CENT)
+
+
+def _column_bytes(values: array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array('q', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _column_from_bytes(data: bytes) -> array:
+    values = array('q')
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def pack_snapshot(entries: Iterable[Tuple[int, Optional[Decimal], Optional[Decimal]]]) -> bytes:
+    """Запакувати рядки (product_id, ціна, собівартість) у стиснений блок"""
+    rows = sorted(entries, key=lambda row: row[0])
+
+    product_ids = array('q')
+    prices = array('q')
+    costs = array('q')
+    previous_id = 0
+    for product_id, price, cost in rows:
+        product_ids.append(product_id - previous_id)
+        previous_id = product_id
+        prices.append(_to_cents(price))
+        costs.append(_to_cents(cost))
+
+    payload = b''.join((
+        HEADER.pack(MAGIC, len(rows)),
+        _column_bytes(product_ids),
+        _column_bytes(prices),
+        _column_bytes(costs),
+    ))
+    return zlib.compress(payload, 6)
+
+
+def unpack_snapshot(blob: bytes) -> Dict[int, SnapshotValue]:
+    """Розпакувати блок у словник product_id → (ціна, собівартість)"""
+    payload = zlib.decompress(bytes(blob))
+    magic, count = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Невідомий формат знімка цін")
+
+    column_size = count * 8
+    offset = HEADER.size
+    deltas = _column_from_bytes(payload[offset:offset + column_size])
+    prices = _column_from_bytes(payload[offset + column_size:offset + 2 * column_size])
+    costs = _column_from_bytes(payload[offset + 2 * column_size:offset + 3 * column_size])
+
+    result = {}
+    product_id = 0
+    for delta, price, cost in zip(deltas, prices, costs):
+        product_id += delta
+        result[product_id] = (_from_cents(price), _from_cents(cost))
+    return result
+
+
+def find_in_snapshot(blob: bytes, product_id: int) -> Optional[SnapshotValue]:
+    """
+    Значення одного товару зі знімка
+
+    Блок розпаковується повністю (zlib не дає читати частину), але замість
+    словника всього знімка будується лише колонка ID для бінарного пошуку,
+    а ціна й собівартість читаються за зсувом.
+    """
+    payload = zlib.decompress(bytes(blob))
+    magic, count = HEADER.unpack_from(payload)
+    if magic != MAGIC:
+        raise ValueError("Невідомий формат знімка цін")
+
+    column_size = count * 8
+    offset = HEADER.size
+    product_ids = list(accumulate(_column_from_bytes(payload[offset:offset + column_size])))
+    index = bisect_left(product_ids, product_id)
+    if index == count or product_ids[index] != product_id:
+        return None
+
+    price_offset = offset + column_size + index * 8
+    cost_offset = offset + 2 * column_size + index * 8
+    price, = struct.unpack_from('<q', payload, price_offset)
+    cost, = struct.unpack_from('<q', payload, cost_offset)
+    return _from_cents(price), _from_cents(cost)
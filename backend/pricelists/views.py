@@ -2,19 +2,26 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.http import FileResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django.utils import timezone
-from django.db import models
+from django.utils.dateparse import parse_datetime
 from decimal import Decimal
 
+from products.models import Product
 from stores.models import Store
-from .models import PriceList, PriceListItem, BulkPriceUpdate, PriceHistory
+from .models import (
+    PriceList, PriceListItem, BulkPriceUpdate, PriceListImportJob, PriceListSnapshot
+)
 from .serializers import (
     PriceListSerializer, PriceListCreateSerializer, PriceListSummarySerializer,
     PriceListItemSerializer, PriceListItemCreateSerializer,
-    BulkPriceUpdateSerializer, PriceHistorySerializer
+    BulkPriceUpdateSerializer, PriceChangeSerializer,
+    PriceListImportJobSerializer, PriceListImportCreateSerializer, PriceListSnapshotSerializer
 )
+from .services import PriceListService, PriceSnapshotService
+from .utils.excel_handler import ExcelPriceListHandler
 
 
 class PriceListListCreateView(generics.ListCreateAPIView):
@@ -112,22 +119,178 @@ class BulkPriceUpdateListCreateView(generics.ListCreateAPIView):
         return context
 
 
-class PriceHistoryListView(generics.ListAPIView):
-    """View для перегляду історії зміни цін"""
+class PriceHistoryListView(generics.GenericAPIView):
+    """
+    View для перегляду історії зміни цін
     
-    serializer_class = PriceHistorySerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['change_reason', 'bulk_update']
-    search_fields = ['price_list_item__product__name', 'notes']
-    ordering_fields = ['changed_at']
-    ordering = ['-changed_at']
+    Історія відновлюється з різниць між знімками цін (PriceListSnapshot);
+    фільтри: ?product_id=, ?change_reason=.
+    """
+    
+    serializer_class = PriceChangeSerializer
+    
+    def get(self, request, store_id, pricelist_id):
+        store = get_object_or_404(Store, id=store_id, owner=request.user)
+        price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+        
+        product_id = request.query_params.get('product_id')
+        changes = PriceSnapshotService().get_price_changes(
+            price_list,
+            product_id=int(product_id) if product_id and product_id.isdigit() else None,
+            change_reason=request.query_params.get('change_reason') or None
+        )
+        
+        page = self.paginate_queryset(changes)
+        entries = changes if page is None else page
+        names = dict(
+            Product.objects.filter(id__in={entry['product_id'] for entry in entries}).values_list('id', 'name')
+        )
+        for entry in entries:
+            entry['product_name'] = names.get(entry['product_id'], '')
+        
+        serializer = self.get_serializer(entries, many=True)
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+
+class PriceListSnapshotListView(generics.ListAPIView):
+    """View для перегляду знімків цін прайс-листа"""
+    
+    serializer_class = PriceListSnapshotSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['change_reason', 'is_full']
+    ordering_fields = ['version', 'created_at']
+    ordering = ['-version']
+    
+    def get_queryset(self):
+        store = get_object_or_404(Store, id=self.kwargs['store_id'], owner=self.request.user)
+        price_list = get_object_or_404(PriceList, id=self.kwargs['pricelist_id'], store=store)
+        return PriceListSnapshot.objects.filter(price_list=price_list).defer('data')
+
+
+@api_view(['GET'])
+def pricelist_prices_at(request, store_id, pricelist_id):
+    """Ціни прайс-листа на вказаний момент (?date=ISO 8601[&product_ids=1,2])"""
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    
+    at = parse_datetime(request.query_params.get('date', ''))
+    if at is None:
+        return Response(
+            {'error': 'Необхідно вказати дату у форматі ISO 8601'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if timezone.is_naive(at):
+        at = timezone.make_aware(at)
+    
+    try:
+        product_ids = [
+            int(product_id) for product_id in request.query_params.get('product_ids', '').split(',') if product_id
+        ]
+    except ValueError:
+        return Response({'error': 'Некоректний список товарів'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    state = PriceSnapshotService().get_prices_at(price_list, at)
+    if product_ids:
+        state = {product_id: state[product_id] for product_id in product_ids if product_id in state}
+    
+    return Response({
+        'date': at,
+        'items_count': len(state),
+        'prices': [
+            {'product_id': product_id, 'price': price, 'cost': cost}
+            for product_id, (price, cost) in sorted(state.items())
+        ]
+    })
+
+
+@api_view(['GET'])
+def pricelist_item_price_timeline(request, store_id, pricelist_id, pk):
+    """Хронологія цін позиції прайс-листа за знімками"""
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    item = get_object_or_404(PriceListItem, id=pk, price_list=price_list)
+    
+    return Response({
+        'product_id': item.product_id,
+        'timeline': PriceSnapshotService().get_price_timeline(price_list, item.product_id)
+    })
+
+
+class PriceListImportJobListView(generics.ListAPIView):
+    """View для перегляду фонових імпортів прайс-листа"""
+    
+    serializer_class = PriceListImportJobSerializer
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['status']
+    ordering_fields = ['created_at', 'finished_at']
+    ordering = ['-created_at']
     
     def get_queryset(self):
         store = get_object_or_404(Store, id=self.kwargs['store_id'], owner=self.request.user)
         price_list = get_object_or_404(PriceList, id=self.kwargs['pricelist_id'], store=store)
-        return PriceHistory.objects.filter(
-            price_list_item__price_list=price_list
-        ).select_related('price_list_item__product', 'changed_by')
+        return PriceListImportJob.objects.filter(price_list=price_list)
+
+
+class PriceListImportJobDetailView(generics.RetrieveAPIView):
+    """View для відстеження прогресу фонового імпорту"""
+    
+    serializer_class = PriceListImportJobSerializer
+    
+    def get_queryset(self):
+        store = get_object_or_404(Store, id=self.kwargs['store_id'], owner=self.request.user)
+        price_list = get_object_or_404(PriceList, id=self.kwargs['pricelist_id'], store=store)
+        return PriceListImportJob.objects.filter(price_list=price_list)
+
+
+@api_view(['POST'])
+def start_pricelist_import(request, store_id, pricelist_id):
+    """Запуск фонового імпорту прайс-листа з Excel"""
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    
+    serializer = PriceListImportCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    
+    job = PriceListService().start_import_job(
+        price_list=price_list,
+        excel_file=serializer.validated_data['file'],
+        user=request.user,
+        update_existing=serializer.validated_data['update_existing'],
+        mapping=serializer.validated_data.get('column_mapping')
+    )
+    
+    return Response(
+        PriceListImportJobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED
+    )
+
+
+@api_view(['POST'])
+def resume_pricelist_import(request, store_id, pricelist_id, job_id):
+    """Повторний запуск імпорту з останньої контрольної точки"""
+    from .tasks import process_pricelist_import
+    
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    job = get_object_or_404(PriceListImportJob, id=job_id, price_list=price_list)
+    
+    if job.status == 'completed':
+        return Response(
+            {'error': 'Цей імпорт вже завершено'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    job.status = 'pending'
+    job.finished_at = None
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    process_pricelist_import.delay(str(job.id))
+    
+    return Response(
+        PriceListImportJobSerializer(job).data,
+        status=status.HTTP_202_ACCEPTED
+    )
 
 
 @api_view(['POST'])
@@ -165,6 +328,9 @@ def execute_bulk_update(request, store_id, pricelist_id, bulk_update_id):
     affected_count = 0
     log_entries = []
     
+    snapshots = PriceSnapshotService()
+    snapshots.capture_baseline(price_list, user=request.user)
+    
     try:
         for item in items_query:
             old_price = item.final_price
@@ -201,17 +367,6 @@ def execute_bulk_update(request, store_id, pricelist_id, bulk_update_id):
                 item.last_price_update = timezone.now()
                 item.save()
                 
-                # Створюємо запис в історії
-                PriceHistory.objects.create(
-                    price_list_item=item,
-                    old_price=old_price,
-                    new_price=new_price,
-                    change_reason='bulk_update',
-                    bulk_update=bulk_update,
-                    changed_by=request.user,
-                    notes=f'Масове оновлення: {bulk_update.name}'
-                )
-                
                 affected_count += 1
                 log_entries.append(f'{item.product.name}: {old_price} → {new_price}')
         
@@ -222,6 +377,11 @@ def execute_bulk_update(request, store_id, pricelist_id, bulk_update_id):
         bulk_update.execution_log = '\n'.join(log_entries[:100])  # Обмежуємо розмір логу
         bulk_update.save()
         
+        # Історія цін фіксується одним знімком прайс-листа
+        snapshots.create_snapshot(
+            price_list, change_reason='bulk_update', user=request.user, bulk_update=bulk_update
+        )
+        
         return Response({
             'message': f'Масове оновлення виконано успішно. Оновлено {affected_count} позицій.',
             'affected_items_count': affected_count
@@ -247,36 +407,25 @@ def sync_costs_from_warehouse(request, store_id, pricelist_id):
         exclude_from_auto_update=False
     )
     
+    snapshots = PriceSnapshotService()
+    snapshots.capture_baseline(price_list, user=request.user)
+    
     try:
         for item in items:
             # Отримуємо актуальну собівартість з warehouse
             new_cost = item.product.get_average_cost()
             
             if new_cost and new_cost != item.calculated_cost:
-                old_cost = item.calculated_cost
                 item.calculated_cost = new_cost
                 item.last_cost_update = timezone.now()
                 
                 # Пересчитуємо ціну якщо не встановлена вручну
                 if not item.is_manual_override:
-                    old_price = item.final_price
                     new_price = item.calculate_price()
                     if new_price:
                         item.calculated_price = new_price
                         item.final_price = new_price
                         item.last_price_update = timezone.now()
-                        
-                        # Створюємо запис в історії
-                        PriceHistory.objects.create(
-                            price_list_item=item,
-                            old_cost=old_cost,
-                            new_cost=new_cost,
-                            old_price=old_price,
-                            new_price=new_price,
-                            change_reason='cost_update',
-                            changed_by=request.user,
-                            notes='Автоматична синхронізація з warehouse'
-                        )
                 
                 item.save()
                 updated_count += 1
@@ -285,6 +434,11 @@ def sync_costs_from_warehouse(request, store_id, pricelist_id):
         price_list.last_cost_sync = timezone.now()
         price_list.save()
         
+        if updated_count:
+            snapshots.create_snapshot(
+                price_list, change_reason='cost_update', user=request.user
+            )
+        
         return Response({
             'message': f'Синхронізація завершена. Оновлено {updated_count} позицій.',
             'updated_items_count': updated_count
@@ -303,36 +457,38 @@ def pricelist_analytics(request, store_id, pricelist_id):
     store = get_object_or_404(Store, id=store_id, owner=request.user)
     price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
     
-    items = PriceListItem.objects.filter(price_list=price_list)
-    
-    # Базова статистика
-    total_items = items.count()
-    avg_profit_margin = items.aggregate(avg_margin=models.Avg('profit_margin'))['avg_margin'] or Decimal('0')
-    total_cost_value = sum(item.current_cost * Decimal('1') for item in items if item.current_cost)
-    total_sale_value = sum(item.final_price * Decimal('1') for item in items if item.final_price)
+    return Response(PriceListService().get_pricelist_analytics(price_list))
+
+
+@api_view(['GET'])
+def compare_pricelists(request, store_id, pricelist_id, other_id):
+    """Порівняння цін двох прайс-листів магазину з пагінацією"""
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    other_price_list = get_object_or_404(PriceList, id=other_id, store=store)
     
-    # Статистика по типам націнки
-    markup_stats = {}
-    for markup_type, _ in PriceListItem.MARKUP_TYPE_CHOICES:
-        count = items.filter(markup_type=markup_type).count()
-        markup_stats[markup_type] = count
+    try:
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', 50)), 1), 500)
+    except ValueError:
+        return Response(
+            {'error': 'Некоректні параметри пагінації'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Статистика по рентабельності
-    profitability_ranges = {
-        'low': items.filter(profit_margin__lt=10).count(),
-        'medium': items.filter(profit_margin__gte=10, profit_margin__lt=30).count(),
-        'high': items.filter(profit_margin__gte=30).count(),
-    }
+    try:
+        comparison = PriceListService().get_price_comparison(
+            price_list, other_price_list,
+            ordering=request.query_params.get('ordering', '-abs_difference'),
+            offset=(page - 1) * page_size,
+            limit=page_size
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    return Response({
-        'total_items': total_items,
-        'average_profit_margin': avg_profit_margin,
-        'total_cost_value': total_cost_value,
-        'total_sale_value': total_sale_value,
-        'markup_type_distribution': markup_stats,
-        'profitability_distribution': profitability_ranges,
-        'last_sync': price_list.last_cost_sync,
-    })
+    comparison['page'] = page
+    comparison['page_size'] = page_size
+    return Response(comparison)
 
 
 @api_view(['POST'])
@@ -356,54 +512,63 @@ def copy_pricelist(request, store_id, pricelist_id):
         )
     
     try:
-        # Створюємо копію прайс-листа
-        new_pricelist = PriceList.objects.create(
-            store=store,
-            name=new_name,
-            description=f'Копія {source_pricelist.name}',
-            pricing_strategy=source_pricelist.pricing_strategy,
-            default_markup_percentage=source_pricelist.default_markup_percentage,
-            default_markup_amount=source_pricelist.default_markup_amount,
-            auto_update_from_cost=source_pricelist.auto_update_from_cost,
-            update_frequency=source_pricelist.update_frequency,
-            created_by=request.user
+        price_adjustment = request.data.get('price_adjustment_percentage')
+        price_adjustment = Decimal(str(price_adjustment)) if price_adjustment not in (None, '') else None
+        category_ids = [int(category_id) for category_id in request.data.get('category_ids') or []]
+    except (ArithmeticError, TypeError, ValueError):
+        return Response(
+            {'error': 'Некоректні параметри копіювання'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        new_pricelist, copied_count = PriceListService().copy_price_list(
+            source_pricelist, new_name, request.user,
+            price_adjustment_percentage=price_adjustment,
+            category_ids=category_ids
         )
-        
-        # Копіюємо всі позиції
-        source_items = PriceListItem.objects.filter(price_list=source_pricelist)
-        copied_items = []
-        
-        for item in source_items:
-            copied_item = PriceListItem(
-                price_list=new_pricelist,
-                product=item.product,
-                category=item.category,
-                cost_calculation_method=item.cost_calculation_method,
-                manual_cost=item.manual_cost,
-                calculated_cost=item.calculated_cost,
-                markup_type=item.markup_type,
-                markup_value=item.markup_value,
-                markup_formula=item.markup_formula,
-                calculated_price=item.calculated_price,
-                manual_price=item.manual_price,
-                final_price=item.final_price,
-                min_price=item.min_price,
-                max_price=item.max_price,
-                is_manual_override=item.is_manual_override,
-                exclude_from_auto_update=item.exclude_from_auto_update
-            )
-            copied_items.append(copied_item)
-        
-        PriceListItem.objects.bulk_create(copied_items)
         
         return Response({
             'message': f'Прайс-лист "{new_name}" успішно створено',
             'pricelist_id': str(new_pricelist.id),
-            'items_copied': len(copied_items)
+            'items_copied': copied_count
         })
-        
+    
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {'error': f'Помилка при копіюванні: {str(e)}'}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+
+@api_view(['GET'])
+def export_pricelist(request, store_id, pricelist_id):
+    """Потоковий експорт прайс-листа (?file_type=xlsx|csv)"""
+    store = get_object_or_404(Store, id=store_id, owner=request.user)
+    price_list = get_object_or_404(PriceList, id=pricelist_id, store=store)
+    
+    file_type = request.query_params.get('file_type', 'xlsx').lower()
+    handler = ExcelPriceListHandler()
+    
+    if file_type == 'csv':
+        response = StreamingHttpResponse(
+            handler.iter_export_csv(price_list),
+            content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="pricelist_{price_list.id}.csv"'
+        return response
+    
+    if file_type == 'xlsx':
+        return FileResponse(
+            handler.export_to_excel(price_list),
+            as_attachment=True,
+            filename=f'pricelist_{price_list.id}.xlsx',
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    
+    return Response(
+        {'error': 'Підтримуються формати xlsx та csv'}, 
+        status=status.HTTP_400_BAD_REQUEST
+    )
@@ -1,9 +1,15 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin, TabularInline
 from unfold.contrib.filters.admin import RangeDateFilter
 from unfold.decorators import display
-from .models import Category, Product, ProductImage, ProductVariant, ProductSEO, ProductBarcode
+from .models import Category, Product, ProductImage, ProductVariant, ProductSEO, ProductBarcode, LabelPrintJob
+from .barcodes import assign_missing_codes, create_missing_barcodes
+from .search import search_products
+from .tasks import render_label_sheet
 
 
 class ProductImageInline(TabularInline):
@@ -144,12 +150,22 @@ class ProductAdmin(ModelAdmin):
         'store',
         ('created_at', RangeDateFilter)
     )
-    search_fields = ('name', 'description', 'sku', 'store__name', 'store__owner__email')
+    # Назва, SKU та опис шукаються через пошуковий індекс (get_search_results)
+    search_fields = ('store__name', 'store__owner__email')
     prepopulated_fields = {'slug': ('name',)}
     readonly_fields = ('created_at', 'updated_at', 'current_price')
     list_per_page = 20
     inlines = [ProductImageInline, ProductVariantInline]
     
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        store_matches, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        product_matches = search_products(queryset, search_term)
+        return queryset.filter(
+            Q(pk__in=product_matches.values('pk')) | Q(pk__in=store_matches.values('pk'))
+        ), may_have_duplicates
+    
     fieldsets = (
         ('Основна інформація', {
             'fields': ('store', 'category', 'name', 'slug', 'description', 'short_description'),
@@ -244,46 +260,42 @@ class ProductAdmin(ModelAdmin):
             )
         return "Немає"
     
-    actions = ['print_barcodes', 'print_qr_codes']
+    actions = ['generate_barcodes', 'print_barcodes', 'print_qr_codes']
     
-    def print_barcodes(self, request, queryset):
-        """Масовий друк штрихкодів"""
-        from django.http import HttpResponse
-        from django.template.loader import render_to_string
-        
-        products_with_barcodes = queryset.filter(barcode__isnull=False).exclude(barcode='')
-        
-        if not products_with_barcodes.exists():
-            self.message_user(request, 'Серед обраних товарів немає штрихкодів для друку.', level='warning')
+    def generate_barcodes(self, request, queryset):
+        """Створити штрихкоди та QR коди для товарів без кодів"""
+        created = create_missing_barcodes(queryset)
+        self.message_user(request, f'Створено коди для {created} товарів.')
+    generate_barcodes.short_description = "Згенерувати коди для товарів без кодів"
+    
+    def _queue_label_print(self, request, queryset, label_type, empty_message):
+        """Поставити формування PDF з етикетками у фонову задачу"""
+        field = 'barcode_info__barcode' if label_type == 'barcode' else 'barcode_info__qr_code'
+        product_ids = list(
+            queryset.filter(**{f'{field}__isnull': False}).exclude(**{field: ''})
+            .order_by('name', 'id').values_list('id', flat=True)
+        )
+        if not product_ids:
+            self.message_user(request, empty_message, level='warning')
             return
         
-        html_content = render_to_string('admin/products/print_barcodes_bulk.html', {
-            'products': products_with_barcodes
-        })
+        job = LabelPrintJob.objects.create(label_type=label_type, product_ids=product_ids, created_by=request.user)
+        transaction.on_commit(lambda: render_label_sheet.delay(str(job.id)))
         
-        response = HttpResponse(html_content, content_type='text/html')
-        response['Content-Disposition'] = 'inline; filename="barcodes_bulk.html"'
-        return response
+        url = reverse('admin:products_labelprintjob_change', args=[job.id])
+        self.message_user(request, format_html(
+            'Етикетки для {} товарів формуються у фоні. <a href="{}">Завантажити PDF</a> можна буде на сторінці задачі.',
+            len(product_ids), url
+        ))
+    
+    def print_barcodes(self, request, queryset):
+        """Масовий друк штрихкодів (PDF у фоновій задачі)"""
+        self._queue_label_print(request, queryset, 'barcode', 'Серед обраних товарів немає штрихкодів для друку.')
     print_barcodes.short_description = "Надрукувати штрихкоди обраних товарів"
     
     def print_qr_codes(self, request, queryset):
-        """Масовий друк QR кодів"""
-        from django.http import HttpResponse
-        from django.template.loader import render_to_string
-        
-        products_with_qr = queryset.filter(qr_code__isnull=False).exclude(qr_code='')
-        
-        if not products_with_qr.exists():
-            self.message_user(request, 'Серед обраних товарів немає QR кодів для друку.', level='warning')
-            return
-        
-        html_content = render_to_string('admin/products/print_qr_bulk.html', {
-            'products': products_with_qr
-        })
-        
-        response = HttpResponse(html_content, content_type='text/html')
-        response['Content-Disposition'] = 'inline; filename="qr_codes_bulk.html"'
-        return response
+        """Масовий друк QR кодів (PDF у фоновій задачі)"""
+        self._queue_label_print(request, queryset, 'qr_code', 'Серед обраних товарів немає QR кодів для друку.')
     print_qr_codes.short_description = "Надрукувати QR коди обраних товарів"
 
 
@@ -365,26 +377,14 @@ class ProductBarcodeAdmin(ModelAdmin):
     actions = ['generate_missing_barcodes', 'generate_missing_qr_codes']
     
     def generate_missing_barcodes(self, request, queryset):
-        """Генерація відсутніх штрихкодів"""
-        generated = 0
-        for item in queryset.filter(barcode=''):
-            if item.auto_generate_codes:
-                item.barcode = item.generate_barcode()
-                item.save()
-                generated += 1
-        
+        """Генерація відсутніх штрихкодів (діапазонами, одним bulk_update)"""
+        generated = assign_missing_codes(queryset.filter(barcode=''), fields=('barcode',))
         self.message_user(request, f'Згенеровано {generated} штрихкодів.')
     generate_missing_barcodes.short_description = "Згенерувати відсутні штрихкоди"
     
     def generate_missing_qr_codes(self, request, queryset):
         """Генерація відсутніх QR кодів"""
-        generated = 0
-        for item in queryset.filter(qr_code=''):
-            if item.auto_generate_codes:
-                item.qr_code = item.generate_qr_code()
-                item.save()
-                generated += 1
-        
+        generated = assign_missing_codes(queryset.filter(qr_code=''), fields=('qr_code',))
         self.message_user(request, f'Згенеровано {generated} QR кодів.')
     generate_missing_qr_codes.short_description = "Згенерувати відсутні QR коди"
     
@@ -437,4 +437,30 @@ class ProductVariantAdmin(ModelAdmin):
                 '<span style="color: {}; font-weight: 600;">{}{} ₴</span>',
                 color, symbol, obj.cost_adjustment
             )
-        return "0 ₴" 
\ No newline at end of file
+        return "0 ₴" 
+
+@admin.register(LabelPrintJob)
+class LabelPrintJobAdmin(ModelAdmin):
+    list_display = ('created_at', 'label_type', 'get_products_count', 'status', 'labels_count', 'get_download_link', 'created_by')
+    list_filter = ('status', 'label_type', ('created_at', RangeDateFilter))
+    ordering = ('-created_at',)
+    list_per_page = 25
+    readonly_fields = (
+        'label_type', 'status', 'labels_count', 'get_download_link', 'error',
+        'created_by', 'created_at', 'finished_at'
+    )
+    fields = readonly_fields
+    
+    def has_add_permission(self, request):
+        # Задачі створюються діями «Надрукувати штрихкоди / QR коди» у списку товарів
+        return False
+    
+    @display(description="Товарів")
+    def get_products_count(self, obj):
+        return len(obj.product_ids)
+    
+    @display(description="PDF")
+    def get_download_link(self, obj):
+        if obj.status == 'completed' and obj.file:
+            return format_html('<a href="{}" target="_blank">Завантажити</a>', obj.file.url)
+        return "—"
@@ -5,6 +5,11 @@ from products.models import Product, ProductImage, ProductVariant, Category
 class ProductSerializer(serializers.ModelSerializer):
     """Сериалізатор для товарів"""
     
+    # Коди зберігаються в ProductBarcode (product.barcode_info)
+    product_type = serializers.CharField(source='barcode_info.product_type', read_only=True, default=None)
+    barcode = serializers.CharField(source='barcode_info.barcode', read_only=True, default=None)
+    qr_code = serializers.CharField(source='barcode_info.qr_code', read_only=True, default=None)
+    
     class Meta:
         model = Product
         fields = [
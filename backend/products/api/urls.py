@@ -6,8 +6,12 @@ urlpatterns = [
     path('search/barcode/', views.search_by_barcode, name='search_by_barcode'),
     path('search/qr/', views.search_by_qr_code, name='search_by_qr_code'),
     path('search/code/', views.search_by_code, name='search_by_code'),
+    path('stores/<int:store_id>/codes/lookup/', views.lookup_codes, name='lookup_product_codes'),
     
     # Генерація кодів
     path('<int:product_id>/generate-barcode/', views.generate_barcode, name='generate_barcode'),
     path('<int:product_id>/generate-qr/', views.generate_qr_code, name='generate_qr_code'),
+    
+    # Зображення кодів для етикеток
+    path('<int:product_id>/label-image/', views.label_image, name='product_label_image'),
 ]
\ No newline at end of file
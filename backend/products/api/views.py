@@ -1,91 +1,139 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from django.db.models import Q
-from django.shortcuts import get_object_or_404
-from products.models import Product
+from django.core.files.storage import default_storage
+from django.shortcuts import get_object_or_404, redirect
+from products.labels import CONTENT_TYPES, get_label_image
+from products.codes import MAX_BATCH_CODES, code_resolver
+from products.models import Product, ProductBarcode
 from products.api.serializers import ProductSerializer
+from stores.models import Store
 
 
-@api_view(['GET'])
-def search_by_barcode(request):
-    """Пошук товару по штрихкоду"""
-    barcode = request.GET.get('barcode')
+def _get_scanner_store(request):
+    """Магазин сканера: заголовок X-Store-Slug (StoreContextMiddleware) або ?store_id="""
+    store = getattr(request, 'store', None)
+    if store is None:
+        store_id = request.query_params.get('store_id') or request.data.get('store_id')
+        if not str(store_id or '').isdigit():
+            raise ValidationError({'store_id': 'Вкажіть магазин: заголовок X-Store-Slug або параметр store_id'})
+        store = get_object_or_404(Store, id=store_id)
+    
+    _check_store_access(request, store)
+    return store
+
+
+def _check_store_access(request, store):
+    """Доступ до кодів магазину — лише власнику або staff"""
+    user = request.user
+    if not (user.is_staff or user.is_superuser) and store.owner_id != user.id:
+        raise PermissionDenied('Недостатньо прав для виконання цієї дії')
+
+
+def _find_product(request, code, code_types=None):
+    """Товар за кодом через індекс кодів магазину; None, якщо не знайдено"""
+    store = _get_scanner_store(request)
+    match = code_resolver.resolve(store.id, [code]).get(code)
+    if match is None or (code_types and match.code_type not in code_types):
+        return None, None
+    product = Product.objects.filter(id=match.product_id, is_active=True).select_related('barcode_info').first()
+    return product, match
+
+
+def _code_search_response(request, param, code_types, not_found_message):
+    code = request.GET.get(param)
     
-    if not barcode:
+    if not code:
         return Response({
-            'error': 'Параметр barcode є обов\'язковим'
+            'error': f'Параметр {param} є обов\'язковим'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        product = Product.objects.get(barcode=barcode, is_active=True)
-        serializer = ProductSerializer(product, context={'request': request})
-        return Response({
-            'success': True,
-            'product': serializer.data
-        })
-    except Product.DoesNotExist:
+    product, match = _find_product(request, code, code_types)
+    if product is None:
         return Response({
             'success': False,
-            'error': 'Товар з таким штрихкодом не знайдено'
+            'error': not_found_message
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    serializer = ProductSerializer(product, context={'request': request})
+    return Response({
+        'success': True,
+        'code_type': match.code_type,
+        'packaging_id': match.packaging_id,
+        'variant_id': match.variant_id,
+        'product': serializer.data
+    })
+
+
+@api_view(['GET'])
+def search_by_barcode(request):
+    """Пошук товару по штрихкоду (товару або фасування)"""
+    return _code_search_response(
+        request, 'barcode', ('barcode', 'packaging'), 'Товар з таким штрихкодом не знайдено'
+    )
 
 
 @api_view(['GET'])
 def search_by_qr_code(request):
     """Пошук товару по QR коду"""
-    qr_code = request.GET.get('qr_code')
-    
-    if not qr_code:
-        return Response({
-            'error': 'Параметр qr_code є обов\'язковим'
-        }, status=status.HTTP_400_BAD_REQUEST)
-    
-    try:
-        product = Product.objects.get(qr_code=qr_code, is_active=True)
-        serializer = ProductSerializer(product, context={'request': request})
-        return Response({
-            'success': True,
-            'product': serializer.data
-        })
-    except Product.DoesNotExist:
-        return Response({
-            'success': False,
-            'error': 'Товар з таким QR кодом не знайдено'
-        }, status=status.HTTP_404_NOT_FOUND)
+    return _code_search_response(
+        request, 'qr_code', ('qr_code',), 'Товар з таким QR кодом не знайдено'
+    )
 
 
 @api_view(['GET'])
 def search_by_code(request):
-    """Універсальний пошук товару по штрихкоду або QR коду"""
-    code = request.GET.get('code')
+    """Універсальний пошук товару по будь-якому коду з індексу (штрихкод, QR код, артикул)"""
+    return _code_search_response(request, 'code', None, 'Товар з таким кодом не знайдено')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def lookup_codes(request, store_id):
+    """
+    Пакетний пошук кодів магазину
+
+    Приймає {"codes": [...]} (до MAX_BATCH_CODES) і повертає для кожного
+    коду товар або null — один запит замість запиту на кожне сканування.
+    Магазин береться з URL, а не з X-Store-Slug, щоб заголовок не підмінив
+    магазин, для якого перевіряються права.
+    """
+    store = get_object_or_404(Store, id=store_id)
+    _check_store_access(request, store)
     
-    if not code:
+    codes = request.data.get('codes')
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
         return Response({
-            'error': 'Параметр code є обов\'язковим'
+            'error': 'Параметр codes має бути списком рядків'
         }, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Спочатку шукаємо по штрихкоду, потім по QR коду
-    try:
-        product = Product.objects.get(
-            Q(barcode=code) | Q(qr_code=code),
-            is_active=True
-        )
-        serializer = ProductSerializer(product, context={'request': request})
-        
-        # Визначаємо тип знайденого коду
-        code_type = 'barcode' if product.barcode == code else 'qr_code'
-        
-        return Response({
-            'success': True,
-            'code_type': code_type,
-            'product': serializer.data
-        })
-    except Product.DoesNotExist:
+    if len(codes) > MAX_BATCH_CODES:
         return Response({
-            'success': False,
-            'error': 'Товар з таким кодом не знайдено'
-        }, status=status.HTTP_404_NOT_FOUND)
+            'error': f'Не більше {MAX_BATCH_CODES} кодів за запит'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    matches = code_resolver.resolve(store.id, codes)
+    products = Product.objects.filter(
+        id__in={match.product_id for match in matches.values()}, is_active=True
+    ).select_related('barcode_info').in_bulk()
+    
+    results = {}
+    for code in codes:
+        match = matches.get(code)
+        product = products.get(match.product_id) if match else None
+        results[code] = None if product is None else {
+            'code_type': match.code_type,
+            'packaging_id': match.packaging_id,
+            'variant_id': match.variant_id,
+            'product': ProductSerializer(product, context={'request': request}).data,
+        }
+    
+    return Response({
+        'success': True,
+        'found': sum(result is not None for result in results.values()),
+        'results': results
+    })
 
 
 @api_view(['POST'])
@@ -100,10 +148,12 @@ def generate_barcode(request, product_id):
         }, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        # Генеруємо новий штрихкод
-        new_barcode = product.generate_barcode()
-        product.barcode = new_barcode
-        product.save(update_fields=['barcode'])
+        # Генеруємо новий штрихкод з лічильника магазину; новий запис отримує його при створенні
+        barcode_info, created = ProductBarcode.objects.get_or_create(product=product)
+        if not created:
+            barcode_info.barcode = barcode_info.generate_barcode()
+            barcode_info.save()
+        new_barcode = barcode_info.barcode
         
         return Response({
             'success': True,
@@ -129,10 +179,12 @@ def generate_qr_code(request, product_id):
         }, status=status.HTTP_403_FORBIDDEN)
     
     try:
-        # Генеруємо новий QR код
-        new_qr_code = product.generate_qr_code()
-        product.qr_code = new_qr_code
-        product.save(update_fields=['qr_code'])
+        # Генеруємо новий QR код; новий запис отримує його при створенні
+        barcode_info, created = ProductBarcode.objects.get_or_create(product=product)
+        if not created:
+            barcode_info.qr_code = barcode_info.generate_qr_code()
+            barcode_info.save()
+        new_qr_code = barcode_info.qr_code
         
         return Response({
             'success': True,
@@ -143,4 +195,36 @@ def generate_qr_code(request, product_id):
         return Response({
             'success': False,
             'error': f'Помилка генерації QR коду: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['GET'])
+def label_image(request, product_id):
+    """
+    Зображення штрихкоду або QR коду товару (?type=barcode|qr_code, ?image_format=svg|png)
+
+    Рендериться один раз на код; далі — редирект на готовий файл у media.
+    """
+    product = get_object_or_404(Product.objects.select_related('store', 'barcode_info'), id=product_id)
+    
+    if request.user != product.store.owner and not request.user.is_staff:
+        return Response({
+            'error': 'Недостатньо прав для виконання цієї дії'
+        }, status=status.HTTP_403_FORBIDDEN)
+    
+    label_type = request.query_params.get('type', 'barcode')
+    # Параметр format зарезервований DRF для вибору рендерера
+    image_format = request.query_params.get('image_format', 'svg')
+    if label_type not in ('barcode', 'qr_code'):
+        raise ValidationError({'type': 'Допустимі значення: barcode, qr_code'})
+    if image_format not in CONTENT_TYPES:
+        raise ValidationError({'image_format': f"Допустимі значення: {', '.join(CONTENT_TYPES)}"})
+    
+    barcode_info = getattr(product, 'barcode_info', None)
+    code = getattr(barcode_info, label_type, '') if barcode_info else ''
+    if not code:
+        return Response({
+            'error': 'У товару немає коду цього типу'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return redirect(default_storage.url(get_label_image(code, label_type, image_format)))
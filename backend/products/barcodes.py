@@ -0,0 +1,196 @@
+"""
+Видача штрихкодів і QR кодів без перевірок на існування кожного коду
+
+Штрихкоди видаються з лічильника BarcodeSequence окремого для магазину і
+типу товару: рядок лічильника блокується (SELECT ... FOR UPDATE), коди
+беруться вікнами по ALLOCATION_WINDOW номерів, а зайняті (видані до появи
+лічильників або введені вручну) пропускаються за одним запитом на вікно.
+
+Формат поштучного штрихкоду EAN-13 (префікс 2 — внутрішнє використання GS1):
+    2 | ID магазину (6 цифр) | номер товару (5 цифр) | контрольна цифра
+Ваговий код — 7 цифр: 2 | номер з лічильника магазину (6 цифр). Вагові коди
+діють лише в межах магазину (ваги й каси магазину), тож у різних магазинах
+вони можуть збігатися.
+"""
+
+from typing import Dict, Iterable, List
+import uuid
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+INTERNAL_PREFIX = '2'
+STORE_DIGITS = 6
+ITEM_DIGITS = 5
+WEIGHT_DIGITS = 6
+
+# Скільки номерів перевіряється одним запитом на зайняті коди
+ALLOCATION_WINDOW = 1000
+
+# Розмір порції bulk_create / bulk_update
+BULK_BATCH_SIZE = 1000
+
+
+def ean13_check_digit(body: str) -> str:
+    """Контрольна цифра EAN-13 для 12 цифр"""
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(body))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_ean13(code: str) -> bool:
+    """Чи є рядок коректним EAN-13"""
+    return len(code) == 13 and code.isdigit() and ean13_check_digit(code[:12]) == code[12]
+
+
+def _sequence_layout(store_id, product_type):
+    """Префікс, кількість цифр номера та довжина коду для лічильника"""
+    if product_type == 'weight':
+        return INTERNAL_PREFIX, WEIGHT_DIGITS, len(INTERNAL_PREFIX) + WEIGHT_DIGITS
+    if store_id >= 10 ** STORE_DIGITS:
+        raise ValidationError(f'ID магазину {store_id} не вміщується в префікс штрихкоду')
+    return f'{INTERNAL_PREFIX}{store_id:0{STORE_DIGITS}d}', ITEM_DIGITS, 13
+
+
+def _taken_numbers(store_id: int, prefix: str, digits: int, length: int, start: int, end: int) -> set:
+    """Номери з [start, end), коди яких у магазині вже зайняті"""
+    from .models import ProductBarcode
+
+    # Для EAN-13 межі діапазону без контрольної цифри: '2…00042' < '2…000420'
+    high = f'{prefix}{end - 1:0{digits}d}' + ('9' if length == 13 else '')
+    codes = ProductBarcode.objects.annotate(code_length=Length('barcode')).filter(
+        product__store_id=store_id, code_length=length,
+        barcode__gte=f'{prefix}{start:0{digits}d}', barcode__lte=high,
+    ).values_list('barcode', flat=True)
+    return {int(code[len(prefix):len(prefix) + digits]) for code in codes}
+
+
+def allocate_barcodes(store_id: int, count: int, product_type: str = 'piece') -> List[str]:
+    """
+    Видати count нових штрихкодів магазину
+
+    Номери йдуть підряд, крім уже зайнятих кодів. Дійшовши до кінця
+    діапазону, лічильник один раз повертається на початок, щоб підібрати
+    вільні номери між старими кодами. Блокування рядка лічильника
+    тримається до кінця зовнішньої транзакції, тому паралельні видачі для
+    того ж магазину отримують різні коди.
+    """
+    from .models import BarcodeSequence
+
+    if count <= 0:
+        return []
+
+    prefix, digits, length = _sequence_layout(store_id, product_type)
+    limit = 10 ** digits
+
+    with transaction.atomic():
+        sequences = BarcodeSequence.objects.select_for_update()
+        sequence = sequences.filter(store_id=store_id, product_type=product_type).first()
+        if sequence is None:
+            BarcodeSequence.objects.get_or_create(
+                store_id=store_id, product_type=product_type, defaults={'prefix': prefix}
+            )
+            sequence = sequences.get(store_id=store_id, product_type=product_type)
+
+        numbers = []
+        value, bound, wrapped = sequence.next_value, limit, False
+        while len(numbers) < count:
+            if value >= bound:
+                if wrapped:
+                    raise ValidationError(f'Вичерпано діапазон штрихкодів з префіксом {prefix}')
+                # Після повернення на початок — лише до місця, звідки почали
+                value, bound, wrapped = 1, sequence.next_value, True
+                continue
+            end = min(value + max(count - len(numbers), ALLOCATION_WINDOW), bound)
+            taken = _taken_numbers(store_id, prefix, digits, length, value, end)
+            for number in range(value, end):
+                if number not in taken:
+                    numbers.append(number)
+                    if len(numbers) == count:
+                        break
+            value = numbers[-1] + 1 if len(numbers) == count else end
+
+        sequence.next_value = value
+        sequence.save(update_fields=['next_value'])
+
+    codes = [f'{prefix}{number:0{digits}d}' for number in numbers]
+    if length == 13:
+        codes = [code + ean13_check_digit(code) for code in codes]
+    return codes
+
+
+def generate_qr_codes(count: int) -> List[str]:
+    """QR коди з UUID4: 128 випадкових біт роблять збіги практично неможливими"""
+    return [uuid.uuid4().hex.upper() for _ in range(count)]
+
+
+def _store_ids(barcodes) -> Dict[int, int]:
+    from .models import Product
+
+    product_ids = {barcode.product_id for barcode in barcodes}
+    return dict(Product.objects.filter(id__in=product_ids).values_list('id', 'store_id'))
+
+
+def _fill_codes(barcodes, fields: Iterable[str]):
+    """Заповнити порожні коди, видаючи один діапазон на магазин і тип товару"""
+    fields = set(fields)
+    if 'barcode' in fields:
+        store_ids = _store_ids(barcodes)
+        groups = {}
+        for barcode in barcodes:
+            if not barcode.barcode:
+                key = (store_ids[barcode.product_id], barcode.product_type)
+                groups.setdefault(key, []).append(barcode)
+        for (store_id, product_type), group in groups.items():
+            for barcode, code in zip(group, allocate_barcodes(store_id, len(group), product_type)):
+                barcode.barcode = code
+
+    if 'qr_code' in fields:
+        missing = [barcode for barcode in barcodes if not barcode.qr_code]
+        for barcode, code in zip(missing, generate_qr_codes(len(missing))):
+            barcode.qr_code = code
+
+
+def assign_missing_codes(queryset, fields=('barcode', 'qr_code')) -> int:
+    """
+    Згенерувати відсутні коди для записів ProductBarcode однією транзакцією
+
+    Повертає кількість оновлених записів.
+    """
+    from .codes import index_product_codes
+    from .models import ProductBarcode
+
+    with transaction.atomic():
+        barcodes = list(queryset.filter(auto_generate_codes=True))
+        barcodes = [
+            barcode for barcode in barcodes
+            if any(not getattr(barcode, field) for field in fields)
+        ]
+        _fill_codes(barcodes, fields)
+        now = timezone.now()
+        for barcode in barcodes:
+            barcode.updated_at = now
+        ProductBarcode.objects.bulk_update(barcodes, [*fields, 'updated_at'], batch_size=BULK_BATCH_SIZE)
+        index_product_codes(barcode.product_id for barcode in barcodes)
+    return len(barcodes)
+
+
+def create_missing_barcodes(products, product_type: str = 'piece') -> int:
+    """
+    Створити ProductBarcode з кодами для товарів, у яких їх ще немає
+
+    Для підключення магазину з тисячами товарів: коди видаються
+    діапазонами, записи створюються bulk_create. Повертає кількість
+    створених записів.
+    """
+    from .codes import index_product_codes
+    from .models import ProductBarcode
+
+    with transaction.atomic():
+        product_ids = list(products.filter(barcode_info__isnull=True).values_list('id', flat=True))
+        barcodes = [ProductBarcode(product_id=product_id, product_type=product_type) for product_id in product_ids]
+        _fill_codes(barcodes, ('barcode', 'qr_code'))
+        ProductBarcode.objects.bulk_create(barcodes, batch_size=BULK_BATCH_SIZE)
+        index_product_codes(product_ids)
+    return len(barcodes)
@@ -0,0 +1,205 @@
+"""
+Індекс кодів товарів і їх визначення для сканерів
+
+Таблиця ProductCode зводить усі коди магазину (штрихкоди й QR коди
+ProductBarcode, штрихкоди фасувань, артикули товарів і варіантів) в один
+унікальний індекс (store, code). CodeResolver тримає коди магазину в
+пам'яті процесу з токеном версії в Redis, тож запит сканера на кожен
+«біп» не звертається до БД.
+"""
+
+from collections import OrderedDict, namedtuple
+from typing import Dict, Iterable, List
+import threading
+import uuid
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CodeMatch = namedtuple('CodeMatch', ['code_type', 'product_id', 'packaging_id', 'variant_id'])
+
+# Максимальна кількість кодів в одному пакетному запиті
+MAX_BATCH_CODES = 500
+
+
+def _product_codes(product) -> List[dict]:
+    """Коди товару в порядку пріоритету: при збігу залишається перший"""
+    entries = []
+    barcode_info = getattr(product, 'barcode_info', None)
+    if barcode_info is not None:
+        entries.append({'code': barcode_info.barcode, 'code_type': 'barcode'})
+        entries.append({'code': barcode_info.qr_code, 'code_type': 'qr_code'})
+    for packaging in product.packagings.all():
+        entries.append({'code': packaging.barcode, 'code_type': 'packaging', 'packaging_id': packaging.id})
+    for variant in product.variants.all():
+        if variant.sku_suffix:
+            entries.append({'code': variant.full_sku, 'code_type': 'variant_sku', 'variant_id': variant.id})
+    entries.append({'code': product.sku, 'code_type': 'sku'})
+    return [entry for entry in entries if entry['code']]
+
+
+def index_product_codes(product_ids: Iterable[int]) -> int:
+    """
+    Оновити записи індексу кодів для товарів
+
+    Змінюються лише записи, що справді відрізняються, і лише для магазинів
+    з такими змінами після фіксації транзакції змінюється токен резолвера.
+    Код, який у магазині вже належить іншому товару, пропускається.
+    Повертає кількість змінених записів.
+    """
+    from .models import Product, ProductCode
+
+    product_ids = set(product_ids)
+    if not product_ids:
+        return 0
+
+    products = Product.objects.filter(id__in=product_ids).select_related('barcode_info').prefetch_related(
+        'packagings', 'variants'
+    )
+
+    wanted = {}
+    for product in products:
+        for entry in _product_codes(product):
+            key = (product.store_id, entry['code'])
+            if key not in wanted:
+                wanted[key] = (product.id, entry['code_type'], entry.get('packaging_id'), entry.get('variant_id'))
+
+    fields = ('id', 'store_id', 'code', 'product_id', 'code_type', 'packaging_id', 'variant_id')
+    with transaction.atomic():
+        existing = {
+            (store_id, code): (row_id, (product_id, code_type, packaging_id, variant_id))
+            for row_id, store_id, code, product_id, code_type, packaging_id, variant_id
+            in ProductCode.objects.filter(product_id__in=product_ids).values_list(*fields)
+        }
+        # Коди інших товарів магазину не перезаписуються
+        taken = set(
+            ProductCode.objects.filter(
+                store_id__in={store_id for store_id, _code in wanted},
+                code__in={code for _store_id, code in wanted},
+            ).exclude(product_id__in=product_ids).values_list('store_id', 'code')
+        )
+
+        stale = {key: row_id for key, (row_id, value) in existing.items() if wanted.get(key) != value}
+        rows = [
+            ProductCode(
+                store_id=key[0], code=key[1], product_id=product_id, code_type=code_type,
+                packaging_id=packaging_id, variant_id=variant_id
+            )
+            for key, (product_id, code_type, packaging_id, variant_id) in wanted.items()
+            if key not in taken and (key not in existing or key in stale)
+        ]
+        if stale:
+            ProductCode.objects.filter(id__in=stale.values()).delete()
+        if rows:
+            ProductCode.objects.bulk_create(rows, ignore_conflicts=True)
+
+    store_ids = {store_id for store_id, _code in stale} | {row.store_id for row in rows}
+    for store_id in store_ids:
+        transaction.on_commit(lambda store_id=store_id: code_resolver.invalidate(store_id))
+    return len(stale) + len(rows)
+
+
+class CodeResolver:
+    """
+    Коди магазину в пам'яті процесу
+
+    Для кожного магазину зберігається словник code → CodeMatch разом з
+    токеном версії у спільному кеші. Будь-яка зміна кодів магазину
+    змінює токен, і всі процеси перечитують коди при наступному запиті.
+    """
+
+    # Максимальна кількість магазинів, коди яких тримаються в пам'яті процесу
+    MAX_STORES = 64
+
+    VERSION_KEY = 'product_codes:resolver_version:store_{store_id}'
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'PRODUCT_CODE_RESOLVER_ENABLED', True)
+
+    def get_version(self, store_id: int) -> str:
+        """Поточний токен версії кодів магазину"""
+        key = self.VERSION_KEY.format(store_id=store_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    def invalidate(self, store_id: int):
+        """Позначити коди магазину як застарілі в усіх процесах"""
+        cache.set(self.VERSION_KEY.format(store_id=store_id), uuid.uuid4().hex, None)
+        with self._lock:
+            self._entries.pop(store_id, None)
+
+    def resolve(self, store_id: int, codes: Iterable[str]) -> Dict[str, CodeMatch]:
+        """Знайдені коди магазину; невідомі коди в результат не потрапляють"""
+        codes = [code for code in codes if code]
+        if not self.enabled:
+            return self._query(store_id, codes)
+
+        entries = self._get_entry(store_id)['codes']
+        return {code: entries[code] for code in codes if code in entries}
+
+    def _query(self, store_id: int, codes: List[str]) -> Dict[str, CodeMatch]:
+        from .models import ProductCode
+
+        rows = ProductCode.objects.filter(store_id=store_id, code__in=codes).values_list(
+            'code', 'code_type', 'product_id', 'packaging_id', 'variant_id'
+        )
+        return {row[0]: CodeMatch(*row[1:]) for row in rows}
+
+    def _get_entry(self, store_id: int) -> Dict:
+        version = self.get_version(store_id)
+
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is not None and entry['version'] == version:
+                self._entries.move_to_end(store_id)
+                return entry
+
+        entry = self._load(store_id, version)
+
+        with self._lock:
+            self._entries[store_id] = entry
+            self._entries.move_to_end(store_id)
+            while len(self._entries) > self.MAX_STORES:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def _load(self, store_id: int, version: str) -> Dict:
+        from .models import ProductCode
+
+        rows = (
+            ProductCode.objects.filter(store_id=store_id)
+            .order_by()
+            .values_list('code', 'code_type', 'product_id', 'packaging_id', 'variant_id')
+            .iterator(chunk_size=5000)
+        )
+        codes = {row[0]: CodeMatch(*row[1:]) for row in rows}
+
+        logger.debug(f"Loaded {len(codes)} product codes for store {store_id} (version {version})")
+        return {'version': version, 'codes': codes}
+
+
+# Глобальний визначник кодів
+code_resolver = CodeResolver()
+
+
+def find_code(code: str) -> List[CodeMatch]:
+    """Збіги коду в усіх магазинах (коли магазин невідомий, напр. інвентаризація складу)"""
+    from .models import ProductCode
+
+    rows = ProductCode.objects.filter(code=code).values_list(
+        'code_type', 'product_id', 'packaging_id', 'variant_id'
+    )[:2]
+    return [CodeMatch(*row) for row in rows]
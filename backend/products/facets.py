@@ -0,0 +1,138 @@
+"""
+Фасетна фільтрація публічного каталогу
+
+Лічильники фасетів (категорії, цінові діапазони, знижка, наявність)
+рахуються для відфільтрованої вибірки одним запитом з GROUP BY за
+категорією та умовними COUNT для решти фасетів. Відповідь каталогу
+кешується разом з фасетами (conditional_get), тож повторні звернення
+не торкаються БД взагалі.
+"""
+
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, When
+from rest_framework.exceptions import ValidationError
+
+# Межі цінових діапазонів за замовчуванням (settings.CATALOG_PRICE_BANDS)
+DEFAULT_PRICE_BANDS = (100, 500, 1000, 5000)
+
+_TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def get_price_bands() -> List[Tuple[str, Optional[Decimal], Optional[Decimal]]]:
+    """Цінові діапазони як (ключ, від включно, до виключно)"""
+    bounds = [Decimal(str(bound)) for bound in getattr(settings, 'CATALOG_PRICE_BANDS', DEFAULT_PRICE_BANDS)]
+    edges = [None] + bounds + [None]
+    bands = []
+    for low, high in zip(edges, edges[1:]):
+        key = f"{low or 0}-{high}" if high is not None else f"{low}+"
+        bands.append((key, low, high))
+    return bands
+
+
+def _band_condition(low, high) -> Q:
+    condition = Q()
+    if low is not None:
+        condition &= Q(effective_price__gte=low)
+    if high is not None:
+        condition &= Q(effective_price__lt=high)
+    return condition
+
+
+def annotate_facet_fields(queryset):
+    """Додати поля, за якими фільтрують і рахують фасети"""
+    from warehouse.models import Stock
+
+    return queryset.annotate(
+        effective_price=Case(
+            When(sale_price__isnull=False, sale_price__lt=F('price'), then=F('sale_price')),
+            default=F('price'),
+        ),
+        in_stock=Exists(
+            Stock.objects.filter(product=OuterRef('pk'), quantity__gt=F('reserved_quantity'))
+        ),
+    )
+
+
+def _parse_price(params, name) -> Optional[Decimal]:
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: 'Очікується число'})
+    if not price.is_finite() or price < 0:
+        raise ValidationError({name: 'Очікується невід\'ємне число'})
+    return price
+
+
+def apply_facet_filters(queryset, params):
+    """
+    Відфільтрувати вибірку за параметрами фасетів
+
+    price_min / price_max — за ціною з урахуванням знижки, price_band —
+    ключ діапазону з get_price_bands(), on_sale та in_stock — 1/true.
+    Очікує вибірку після annotate_facet_fields.
+    """
+    price_min = _parse_price(params, 'price_min')
+    if price_min is not None:
+        queryset = queryset.filter(effective_price__gte=price_min)
+    price_max = _parse_price(params, 'price_max')
+    if price_max is not None:
+        queryset = queryset.filter(effective_price__lte=price_max)
+
+    price_band = params.get('price_band')
+    if price_band:
+        bands = {key: (low, high) for key, low, high in get_price_bands()}
+        if price_band not in bands:
+            raise ValidationError({'price_band': f"Допустимі значення: {', '.join(bands)}"})
+        queryset = queryset.filter(_band_condition(*bands[price_band]))
+
+    if params.get('on_sale', '').lower() in _TRUE_VALUES:
+        queryset = queryset.filter(sale_price__isnull=False, sale_price__lt=F('price'))
+    if params.get('in_stock', '').lower() in _TRUE_VALUES:
+        queryset = queryset.filter(in_stock=True)
+    return queryset
+
+
+def compute_facets(queryset) -> Dict:
+    """
+    Лічильники фасетів для відфільтрованої вибірки одним запитом
+
+    Групування за категорією дає лічильники категорій; цінові діапазони,
+    знижка та наявність рахуються умовними COUNT у кожній групі і
+    підсумовуються в Python.
+    """
+    bands = get_price_bands()
+    aggregates = {
+        'total': Count('pk'),
+        'on_sale': Count('pk', filter=Q(sale_price__isnull=False, sale_price__lt=F('price'))),
+        'in_stock': Count('pk', filter=Q(in_stock=True)),
+    }
+    for index, (_key, low, high) in enumerate(bands):
+        aggregates[f'band_{index}'] = Count('pk', filter=_band_condition(low, high))
+
+    rows = queryset.order_by().values('category_id', 'category__name').annotate(**aggregates)
+
+    categories = []
+    totals = dict.fromkeys(aggregates, 0)
+    for row in rows:
+        for name in aggregates:
+            totals[name] += row[name]
+        if row['category_id'] is not None:
+            categories.append({'id': row['category_id'], 'name': row['category__name'], 'count': row['total']})
+    categories.sort(key=lambda item: (-item['count'], item['name']))
+
+    return {
+        'total': totals['total'],
+        'categories': categories,
+        'price_bands': [
+            {'key': key, 'min': low, 'max': high, 'count': totals[f'band_{index}']}
+            for index, (key, low, high) in enumerate(bands)
+        ],
+        'on_sale': totals['on_sale'],
+        'in_stock': totals['in_stock'],
+    }
@@ -0,0 +1,256 @@
+"""
+Серверний рендеринг етикеток штрихкодів і QR кодів
+
+Зображення кодів (SVG або PNG) будуються reportlab один раз на код і
+зберігаються в media під іменем-хешем вмісту (labels/cache/ab/<sha256>),
+тож повторні запити лише віддають готовий файл. PDF з етикетками для
+друку складається у фоновій задачі (products.tasks.render_label_sheet) з
+тих самих PNG з кешу, тож кожен код рендериться один раз і для API, і для
+PDF; сторінки формуються потоково по порціях товарів.
+Готовий PDF так само адресується хешем вмісту і перевикористовується для
+того самого набору етикеток.
+"""
+
+from functools import lru_cache
+from io import BytesIO
+from typing import BinaryIO, Iterable, List, Tuple
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from PIL import Image, ImageDraw, ImageFont
+from reportlab.graphics import renderSVG
+from reportlab.graphics.barcode import createBarcodeDrawing
+from reportlab.graphics.shapes import Group, Rect, String
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas as pdf_canvas
+
+from .barcodes import is_valid_ean13
+
+# Змінюється разом з виглядом етикеток, щоб не віддавати старі файли з кешу
+RENDER_VERSION = 2
+
+LABEL_CACHE_DIR = 'labels/cache'
+LABEL_SHEETS_DIR = 'labels/sheets'
+
+# Сітка етикеток на аркуші A4
+LABEL_COLUMNS = 3
+LABEL_ROWS = 8
+PAGE_MARGIN = 8 * mm
+LABEL_PADDING = 2 * mm
+
+# Масштаб PNG відносно розміру в пунктах (≈ 300 dpi)
+PNG_SCALE = 4
+
+# Кількість товарів, що завантажуються з БД за раз
+PRODUCTS_CHUNK_SIZE = 500
+
+CONTENT_TYPES = {'svg': 'image/svg+xml', 'png': 'image/png'}
+
+
+def code_drawing(code: str, label_type: str):
+    """Векторне зображення коду: EAN-13 для коректних штрихкодів, інакше Code128"""
+    if label_type == 'qr_code':
+        return createBarcodeDrawing('QR', value=code, barBorder=0)
+    if is_valid_ean13(code):
+        return createBarcodeDrawing('EAN13', value=code[:12])
+    return createBarcodeDrawing('Code128', value=code, humanReadable=True)
+
+
+def _compose(outer, inner):
+    a, b, c, d, e, f = outer
+    a2, b2, c2, d2, e2, f2 = inner
+    return (
+        a * a2 + c * b2, b * a2 + d * b2,
+        a * c2 + c * d2, b * c2 + d * d2,
+        a * e2 + c * f2 + e, b * e2 + d * f2 + f,
+    )
+
+
+def _rasterize(node, transform, draw, height, scale, font):
+    for child in node.contents:
+        if isinstance(child, Group):
+            _rasterize(child, _compose(transform, child.transform), draw, height, scale, font)
+        elif isinstance(child, Rect) and child.fillColor is not None and child.fillColor.rgb() != (1, 1, 1):
+            a, _b, _c, d, e, f = transform
+            x0, y0 = a * child.x + e, d * child.y + f
+            x1, y1 = x0 + a * child.width, y0 + d * child.height
+            draw.rectangle(
+                [x0 * scale, (height - y1) * scale, x1 * scale - 1, (height - y0) * scale - 1],
+                fill='black'
+            )
+        elif isinstance(child, String):
+            a, _b, _c, d, e, f = transform
+            x, y = a * child.x + e, d * child.y + f
+            anchor = {'start': 'ls', 'middle': 'ms', 'end': 'rs'}.get(child.textAnchor, 'ls')
+            draw.text((x * scale, (height - y) * scale), child.text, fill='black', font=font, anchor=anchor)
+
+
+def render_png(drawing) -> bytes:
+    """Растеризувати Drawing у PNG засобами Pillow (без renderPM)"""
+    width, height = drawing.width, drawing.height
+    image = Image.new('1', (round(width * PNG_SCALE), round(height * PNG_SCALE)), 1)
+    font = ImageFont.load_default(size=8 * PNG_SCALE)
+    _rasterize(drawing.expandUserNodes(), (1, 0, 0, 1, 0, 0), ImageDraw.Draw(image), height, PNG_SCALE, font)
+    buffer = BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def render_code_image(code: str, label_type: str, image_format: str) -> bytes:
+    """Зображення коду у форматі svg або png"""
+    drawing = code_drawing(code, label_type)
+    if image_format == 'png':
+        return render_png(drawing)
+    return renderSVG.drawToString(drawing).encode()
+
+
+def _content_path(directory: str, extension: str, *parts) -> str:
+    digest = hashlib.sha256(':'.join(str(part) for part in (RENDER_VERSION, *parts)).encode()).hexdigest()
+    return f'{directory}/{digest[:2]}/{digest}.{extension}'
+
+
+def get_label_image(code: str, label_type: str = 'barcode', image_format: str = 'svg') -> str:
+    """
+    Шлях до зображення коду в media; рендериться лише при першому запиті
+
+    Ім'я файлу — хеш типу, формату та значення коду, тому той самий код
+    ніколи не рендериться двічі, а зміна коду дає новий файл.
+    """
+    if image_format not in CONTENT_TYPES:
+        raise ValueError(f'Unsupported label image format: {image_format}')
+
+    path = _content_path(LABEL_CACHE_DIR, image_format, label_type, code)
+    if not default_storage.exists(path):
+        path = default_storage.save(path, ContentFile(render_code_image(code, label_type, image_format)))
+    return path
+
+
+def _label_rows(product_ids: Iterable[int], label_type: str):
+    """(код, назва, ціна) для етикеток у порядку product_ids, порціями з БД"""
+    from .models import Product
+
+    field = 'barcode_info__barcode' if label_type == 'barcode' else 'barcode_info__qr_code'
+    product_ids = list(product_ids)
+    for start in range(0, len(product_ids), PRODUCTS_CHUNK_SIZE):
+        chunk = product_ids[start:start + PRODUCTS_CHUNK_SIZE]
+        rows = {
+            row[0]: row[1:]
+            for row in Product.objects.filter(id__in=chunk).exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True}
+            ).values_list('id', field, 'name', 'price', 'sale_price', 'currency')
+        }
+        for product_id in chunk:
+            if product_id in rows:
+                code, name, price, sale_price, currency = rows[product_id]
+                current = sale_price if sale_price and sale_price < price else price
+                yield code, name, f'{current} {currency}'
+
+
+@lru_cache(maxsize=1)
+def _label_font() -> str:
+    """Шрифт з кирилицею (settings.LABEL_FONT_PATH); без нього — Helvetica"""
+    font_path = getattr(settings, 'LABEL_FONT_PATH', '')
+    if font_path and os.path.exists(font_path):
+        pdfmetrics.registerFont(TTFont('LabelFont', font_path))
+        return 'LabelFont'
+    return 'Helvetica'
+
+
+def _label_image(code: str, label_type: str) -> ImageReader:
+    """PNG коду з кешу зображень (get_label_image), той самий, що віддає API етикеток"""
+    with default_storage.open(get_label_image(code, label_type, 'png')) as image_file:
+        return ImageReader(BytesIO(image_file.read()))
+
+
+def _draw_label(canvas, row, x, y, width, height, label_type):
+    code, name, price = row
+    image = _label_image(code, label_type)
+
+    text_height = 9
+    canvas.setFont(_label_font(), 7)
+    canvas.drawString(x + LABEL_PADDING, y + height - LABEL_PADDING - 7, name[:40])
+    canvas.drawRightString(x + width - LABEL_PADDING, y + LABEL_PADDING, price)
+
+    # Розмір PNG у пунктах — як у векторного зображення коду
+    image_width, image_height = (size / PNG_SCALE for size in image.getSize())
+    box_width = width - 2 * LABEL_PADDING
+    box_height = height - 2 * LABEL_PADDING - 2 * text_height
+    scale = min(box_width / image_width, box_height / image_height)
+    canvas.drawImage(
+        image,
+        x + (width - image_width * scale) / 2,
+        y + LABEL_PADDING + text_height + (box_height - image_height * scale) / 2,
+        image_width * scale,
+        image_height * scale,
+    )
+
+
+def compose_labels_pdf(rows: Iterable[Tuple[str, str, str]], label_type: str, output: BinaryIO) -> int:
+    """
+    Записати в output PDF з етикетками сіткою LABEL_COLUMNS × LABEL_ROWS
+
+    Рядки читаються по одному, тож їх можна передавати генератором.
+    Повертає кількість етикеток.
+    """
+    canvas = pdf_canvas.Canvas(output, pagesize=A4, pageCompression=1)
+    page_width, page_height = A4
+    label_width = (page_width - 2 * PAGE_MARGIN) / LABEL_COLUMNS
+    label_height = (page_height - 2 * PAGE_MARGIN) / LABEL_ROWS
+    per_page = LABEL_COLUMNS * LABEL_ROWS
+
+    count = 0
+    for row in rows:
+        if count and count % per_page == 0:
+            canvas.showPage()
+        position = count % per_page
+        column, line = position % LABEL_COLUMNS, position // LABEL_COLUMNS
+        x = PAGE_MARGIN + column * label_width
+        y = page_height - PAGE_MARGIN - (line + 1) * label_height
+        _draw_label(canvas, row, x, y, label_width, label_height, label_type)
+        count += 1
+
+    if not count:
+        canvas.drawString(PAGE_MARGIN, page_height - PAGE_MARGIN - 12, 'No labels')
+    canvas.save()
+    return count
+
+
+def _sheet_path(product_ids: List[int], label_type: str) -> Tuple[str, int]:
+    """(шлях PDF за хешем вмісту етикеток, кількість); хеш рахується потоково, без списку рядків"""
+    digest = hashlib.sha256(f'{RENDER_VERSION}:{label_type}'.encode())
+    count = 0
+    for row in _label_rows(product_ids, label_type):
+        for part in row:
+            digest.update(f':{part}'.encode())
+        count += 1
+    digest = digest.hexdigest()
+    return f'{LABEL_SHEETS_DIR}/{digest[:2]}/{digest}.pdf', count
+
+
+def build_label_sheet(product_ids: Iterable[int], label_type: str) -> Tuple[str, int]:
+    """
+    PDF з етикетками товарів у media; повертає (шлях, кількість етикеток)
+
+    Ім'я файлу — хеш вмісту етикеток, тому повторний друк того самого
+    набору віддає вже готовий PDF. Рядки двічі читаються з БД порціями:
+    спершу для хешу, потім (якщо файлу ще немає) для рендерингу, а PDF
+    пишеться у тимчасовий файл, а не в пам'ять.
+    """
+    product_ids = list(product_ids)
+    path, count = _sheet_path(product_ids, label_type)
+    if default_storage.exists(path):
+        return path, count
+
+    with tempfile.TemporaryFile() as output:
+        compose_labels_pdf(_label_rows(product_ids, label_type), label_type, output)
+        output.seek(0)
+        path = default_storage.save(path, File(output))
+    return path, count
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from products.barcodes import create_missing_barcodes
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Створити штрихкоди та QR коди для товарів без кодів (напр. після імпорту каталогу магазину)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--store',
+            type=int,
+            default=None,
+            help='ID магазину (за замовчуванням усі магазини)',
+        )
+        parser.add_argument(
+            '--type',
+            dest='product_type',
+            choices=['piece', 'weight'],
+            default='piece',
+            help='Тип товару для штрихкодування',
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options['store']:
+            products = products.filter(store_id=options['store'])
+
+        created = create_missing_barcodes(products, options['product_type'])
+        self.stdout.write(self.style.SUCCESS(f'Створено коди для {created} товарів'))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:25
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+def create_search_index(apps, schema_editor):
+    """GIN-індекс та початкове заповнення search_vector (лише PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS product_search_vector_gin "
+        "ON products_product USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "UPDATE products_product SET search_vector = "
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(sku, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(short_description, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS product_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_category_product_category'),
+        ('stores', '0001_initial'),
+        ('warehouse', '0003_inventoryitem_scan_method_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'is_active', '-created_at', '-id'], name='product_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'is_active', 'price', 'id'], name='product_store_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['store', 'is_active', 'name', 'id'], name='product_store_name_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
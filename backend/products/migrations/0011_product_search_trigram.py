@@ -0,0 +1,42 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Конфігурації tsvector на момент міграції (products.search.DEFAULT_SEARCH_CONFIGS);
+# при іншому PRODUCT_SEARCH_CONFIGS вектори перебудовує задача reindex_product_search
+SEARCH_CONFIGS = ('simple', 'russian', 'english')
+
+
+def create_trigram_index(apps, schema_editor):
+    """Триграмний індекс назви та переіндексація в усіх конфігураціях (лише PostgreSQL)"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS product_name_trgm "
+        "ON products_product USING gin (name gin_trgm_ops)"
+    )
+    parts = ["setweight(to_tsvector('simple', coalesce(sku, '')), 'A')"]
+    for config in SEARCH_CONFIGS:
+        parts += [
+            f"setweight(to_tsvector('{config}', coalesce(name, '')), 'A')",
+            f"setweight(to_tsvector('{config}', coalesce(short_description, '')), 'B')",
+            f"setweight(to_tsvector('{config}', coalesce(description, '')), 'C')",
+        ]
+    schema_editor.execute("UPDATE products_product SET search_vector = " + " || ".join(parts))
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS product_name_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_product_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_codes(apps, schema_editor):
+    """Заповнити індекс кодами наявних товарів (пріоритет як у products.codes)"""
+    Product = apps.get_model('products', 'Product')
+    ProductBarcode = apps.get_model('products', 'ProductBarcode')
+    ProductVariant = apps.get_model('products', 'ProductVariant')
+    ProductCode = apps.get_model('products', 'ProductCode')
+    Packaging = apps.get_model('warehouse', 'Packaging')
+
+    entries = []
+    for product_id, code, qr_code in ProductBarcode.objects.values_list('product_id', 'barcode', 'qr_code'):
+        entries.append((product_id, code, 'barcode', None, None))
+        entries.append((product_id, qr_code, 'qr_code', None, None))
+    for packaging_id, product_id, code in Packaging.objects.values_list('id', 'product_id', 'barcode'):
+        entries.append((product_id, code, 'packaging', packaging_id, None))
+    for variant_id, product_id, sku, suffix in ProductVariant.objects.exclude(sku_suffix='').values_list(
+        'id', 'product_id', 'product__sku', 'sku_suffix'
+    ):
+        entries.append((product_id, f"{sku or ''}-{suffix}", 'variant_sku', None, variant_id))
+    for product_id, sku in Product.objects.values_list('id', 'sku'):
+        entries.append((product_id, sku, 'sku', None, None))
+
+    store_ids = dict(Product.objects.values_list('id', 'store_id'))
+    seen = set()
+    rows = []
+    for product_id, code, code_type, packaging_id, variant_id in entries:
+        key = (store_ids[product_id], code)
+        if not code or key in seen:
+            continue
+        seen.add(key)
+        rows.append(ProductCode(
+            store_id=key[0], code=code, code_type=code_type, product_id=product_id,
+            packaging_id=packaging_id, variant_id=variant_id,
+        ))
+    ProductCode.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_product_search_trigram'),
+        ('stores', '0001_initial'),
+        ('warehouse', '0003_inventoryitem_scan_method_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductCode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, verbose_name='Код')),
+                ('code_type', models.CharField(choices=[('barcode', 'Штрихкод'), ('qr_code', 'QR код'), ('packaging', 'Штрихкод фасування'), ('variant_sku', 'Артикул варіанту'), ('sku', 'Артикул')], max_length=20, verbose_name='Тип коду')),
+                ('packaging', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='warehouse.packaging', verbose_name='Фасування')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='products.product', verbose_name='Товар')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_codes', to='stores.store', verbose_name='Магазин')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='codes', to='products.productvariant', verbose_name='Варіант')),
+            ],
+            options={
+                'verbose_name': 'Код товару',
+                'verbose_name_plural': 'Коди товарів',
+                'indexes': [models.Index(fields=['code'], name='product_code_code_idx')],
+                'constraints': [models.UniqueConstraint(fields=('store', 'code'), name='product_code_store_code_uniq')],
+            },
+        ),
+        migrations.RunPython(index_existing_codes, migrations.RunPython.noop),
+    ]
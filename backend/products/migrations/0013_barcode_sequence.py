@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0012_product_code'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BarcodeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=[('piece', 'Поштучний товар'), ('weight', 'Ваговий товар')], max_length=10, verbose_name='Тип товару')),
+                ('prefix', models.CharField(max_length=12, unique=True, verbose_name='Префікс')),
+                ('next_value', models.PositiveBigIntegerField(default=1, verbose_name='Наступне значення')),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='barcode_sequences', to='stores.store', verbose_name='Магазин')),
+            ],
+            options={
+                'verbose_name': 'Лічильник штрихкодів',
+                'verbose_name_plural': 'Лічильники штрихкодів',
+                'constraints': [models.UniqueConstraint(fields=('store', 'product_type'), name='barcode_sequence_store_type_uniq')],
+            },
+        ),
+    ]
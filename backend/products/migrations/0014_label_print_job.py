@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:46
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_barcode_sequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LabelPrintJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('label_type', models.CharField(choices=[('barcode', 'Штрихкоди'), ('qr_code', 'QR коди')], max_length=10, verbose_name='Тип етикеток')),
+                ('product_ids', models.JSONField(default=list, verbose_name='Товари')),
+                ('status', models.CharField(choices=[('pending', 'Очікує'), ('processing', 'Обробляється'), ('completed', 'Завершено'), ('failed', 'Помилка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('file', models.FileField(blank=True, upload_to='labels/sheets/', verbose_name='PDF з етикетками')),
+                ('labels_count', models.PositiveIntegerField(default=0, verbose_name='Кількість етикеток')),
+                ('error', models.TextField(blank=True, verbose_name='Помилка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Створено')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершення обробки')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='label_print_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Створено користувачем')),
+            ],
+            options={
+                'verbose_name': 'Друк етикеток',
+                'verbose_name_plural': 'Друк етикеток',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def drop_shared_sequences(apps, schema_editor):
+    """Спільний лічильник вагових кодів замінюють лічильники магазинів"""
+    BarcodeSequence = apps.get_model('products', 'BarcodeSequence')
+    BarcodeSequence.objects.filter(store__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_label_print_job'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='barcodesequence',
+            name='prefix',
+            field=models.CharField(max_length=12, verbose_name='Префікс'),
+        ),
+        migrations.RunPython(drop_shared_sequences, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='barcodesequence',
+            name='store',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='barcode_sequences', to='stores.store', verbose_name='Магазин'),
+        ),
+        migrations.AlterField(
+            model_name='productbarcode',
+            name='barcode',
+            field=models.CharField(blank=True, db_index=True, help_text='13 цифр для поштучного товару, 7 цифр для вагового', max_length=13, verbose_name='Штрихкод'),
+        ),
+    ]
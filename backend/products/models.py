@@ -1,14 +1,15 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from decimal import Decimal
-import random
 import string
-import uuid
 import re
+import uuid
 from django.utils.text import slugify as django_slugify
+from accounts.models import User
 from stores.models import Store
 
 
@@ -138,6 +139,9 @@ class Product(models.Model):
     dimensions = models.CharField(max_length=50, blank=True, verbose_name=_('Розміри'))
     sku = models.CharField(max_length=50, blank=True, verbose_name=_('SKU'))
     
+    # Повнотекстовий пошук (підтримується в save(), GIN-індекс створює міграція на PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
+    
     # Дати
     created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Дата створення'))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Дата оновлення'))
@@ -147,6 +151,12 @@ class Product(models.Model):
         verbose_name_plural = _('Товари')
         ordering = ['-created_at']
         unique_together = ['store', 'slug']
+        indexes = [
+            # Сортування публічного каталогу магазину
+            models.Index(fields=['store', 'is_active', '-created_at', '-id'], name='product_store_created_idx'),
+            models.Index(fields=['store', 'is_active', 'price', 'id'], name='product_store_price_idx'),
+            models.Index(fields=['store', 'is_active', 'name', 'id'], name='product_store_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.store.name} - {self.name}"
@@ -227,36 +237,11 @@ class Product(models.Model):
     
     def get_current_price_from_pricelist(self, store=None):
         """Отримати поточну ціну з активного прайс-листа"""
-        from pricelists.models import PriceList, PriceListItem
-        
-        if not store:
-            store = self.store
-        
-        # Шукаємо активний прайс-лист за замовчуванням
-        default_pricelist = PriceList.objects.filter(
-            store=store,
-            is_active=True,
-            is_default=True
-        ).first()
-        
-        if not default_pricelist:
-            # Якщо немає за замовчуванням, беремо будь-який активний
-            default_pricelist = PriceList.objects.filter(
-                store=store,
-                is_active=True
-            ).first()
-        
-        if default_pricelist:
-            price_item = PriceListItem.objects.filter(
-                price_list=default_pricelist,
-                product=self
-            ).first()
-            
-            if price_item:
-                return price_item.final_price
+        from pricelists.resolver import price_resolver
         
-        # Якщо не знайдено в прайс-листах, повертаємо поточну ціну
-        return self.price
+        # Ціни активного прайс-листа кешуються в пам'яті процесу до зміни прайс-листів;
+        # якщо товару немає в прайс-листі, повертається поточна ціна товару
+        return price_resolver.resolve_price(self, store.id if store else None)
     
     def get_stock_status_display_data(self):
         """Отримати дані для відображення статусу запасів"""
@@ -335,7 +320,14 @@ class Product(models.Model):
         return available_stock
     
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        from .search import SEARCH_FIELDS, update_search_vectors
+        
+        update_fields = kwargs.get('update_fields')
+        # Сигнали post_save (зокрема outbox змін цін) виконуються в цій же транзакції
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or set(update_fields) & set(SEARCH_FIELDS):
+                update_search_vectors([self.pk])
 
 
 class ProductImage(models.Model):
@@ -465,10 +457,11 @@ class ProductBarcode(models.Model):
     )
     
     # Штрихкоди та QR коди
+    # Унікальний у межах магазину (clean): вагові коди магазинів можуть збігатися
     barcode = models.CharField(
         max_length=13,
         blank=True,
-        unique=True,
+        db_index=True,
         verbose_name=_('Штрихкод'),
         help_text=_('13 цифр для поштучного товару, 7 цифр для вагового')
     )
@@ -514,28 +507,26 @@ class ProductBarcode(models.Model):
                 raise ValidationError({
                     'barcode': _('Штрихкод для вагового товару повинен містити 7 цифр')
                 })
+            
+            duplicates = ProductBarcode.objects.filter(
+                product__store_id=self.product.store_id, barcode=self.barcode
+            ).exclude(pk=self.pk)
+            if duplicates.exists():
+                raise ValidationError({
+                    'barcode': _('Такий штрихкод уже є в цьому магазині')
+                })
     
     def generate_barcode(self):
-        """Генерація штрихкоду"""
-        if self.product_type == 'piece':
-            # Генеруємо 13-значний штрихкод для поштучного товару
-            while True:
-                barcode = ''.join([str(random.randint(0, 9)) for _ in range(13)])
-                if not ProductBarcode.objects.filter(barcode=barcode).exists():
-                    return barcode
-        else:
-            # Генеруємо 7-значний штрихкод для вагового товару
-            while True:
-                barcode = ''.join([str(random.randint(0, 9)) for _ in range(7)])
-                if not ProductBarcode.objects.filter(barcode=barcode).exists():
-                    return barcode
+        """Видати новий штрихкод з лічильника (products.barcodes)"""
+        from .barcodes import allocate_barcodes
+        
+        return allocate_barcodes(self.product.store_id, 1, self.product_type)[0]
     
     def generate_qr_code(self):
         """Генерація QR коду"""
-        while True:
-            qr_code = str(uuid.uuid4()).replace('-', '').upper()[:12]
-            if not ProductBarcode.objects.filter(qr_code=qr_code).exists():
-                return qr_code
+        from .barcodes import generate_qr_codes
+        
+        return generate_qr_codes(1)[0]
     
     def save(self, *args, **kwargs):
         # Автоматична генерація кодів
@@ -548,4 +539,138 @@ class ProductBarcode(models.Model):
         # Валідація перед збереженням
         self.full_clean()
         
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        super().save(*args, **kwargs) 
+
+class ProductCode(models.Model):
+    """
+    Індекс кодів для сканерів: код → товар, фасування або варіант
+
+    Заповнюється автоматично (products.codes.index_product_codes) з
+    артикулів товарів і варіантів, штрихкодів та QR кодів ProductBarcode
+    і штрихкодів фасувань. Код унікальний у межах магазину.
+    """
+    
+    CODE_TYPE_CHOICES = [
+        ('barcode', _('Штрихкод')),
+        ('qr_code', _('QR код')),
+        ('packaging', _('Штрихкод фасування')),
+        ('variant_sku', _('Артикул варіанту')),
+        ('sku', _('Артикул')),
+    ]
+    
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='product_codes', verbose_name=_('Магазин'))
+    code = models.CharField(max_length=100, verbose_name=_('Код'))
+    code_type = models.CharField(max_length=20, choices=CODE_TYPE_CHOICES, verbose_name=_('Тип коду'))
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='codes', verbose_name=_('Товар'))
+    packaging = models.ForeignKey(
+        'warehouse.Packaging',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='codes',
+        verbose_name=_('Фасування')
+    )
+    variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='codes',
+        verbose_name=_('Варіант')
+    )
+    
+    class Meta:
+        verbose_name = _('Код товару')
+        verbose_name_plural = _('Коди товарів')
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'code'], name='product_code_store_code_uniq'),
+        ]
+        indexes = [
+            # Пошук коду без магазину (інвентаризація складу)
+            models.Index(fields=['code'], name='product_code_code_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.code} → {self.product_id}"
+
+
+class BarcodeSequence(models.Model):
+    """
+    Лічильник діапазонів штрихкодів (products.barcodes)
+
+    Окремий лічильник на магазин і тип товару: для поштучних префікс
+    EAN-13 містить ID магазину, вагові коди (префікс 2) діють у межах
+    магазину. Коди видаються під блокуванням рядка.
+    """
+    
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name='barcode_sequences',
+        verbose_name=_('Магазин')
+    )
+    product_type = models.CharField(
+        max_length=10,
+        choices=ProductBarcode.PRODUCT_TYPE_CHOICES,
+        verbose_name=_('Тип товару')
+    )
+    prefix = models.CharField(max_length=12, verbose_name=_('Префікс'))
+    next_value = models.PositiveBigIntegerField(default=1, verbose_name=_('Наступне значення'))
+    
+    class Meta:
+        verbose_name = _('Лічильник штрихкодів')
+        verbose_name_plural = _('Лічильники штрихкодів')
+        constraints = [
+            models.UniqueConstraint(fields=['store', 'product_type'], name='barcode_sequence_store_type_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.prefix} ({self.next_value})"
+
+
+class LabelPrintJob(models.Model):
+    """Фонове формування PDF з етикетками штрихкодів або QR кодів (products.labels)"""
+    
+    STATUS_CHOICES = [
+        ('pending', _('Очікує')),
+        ('processing', _('Обробляється')),
+        ('completed', _('Завершено')),
+        ('failed', _('Помилка')),
+    ]
+    
+    LABEL_TYPE_CHOICES = [
+        ('barcode', _('Штрихкоди')),
+        ('qr_code', _('QR коди')),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    label_type = models.CharField(max_length=10, choices=LABEL_TYPE_CHOICES, verbose_name=_('Тип етикеток'))
+    product_ids = models.JSONField(default=list, verbose_name=_('Товари'))
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name=_('Статус')
+    )
+    file = models.FileField(upload_to='labels/sheets/', blank=True, verbose_name=_('PDF з етикетками'))
+    labels_count = models.PositiveIntegerField(default=0, verbose_name=_('Кількість етикеток'))
+    error = models.TextField(blank=True, verbose_name=_('Помилка'))
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='label_print_jobs',
+        verbose_name=_('Створено користувачем')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Створено'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Завершення обробки'))
+    
+    class Meta:
+        verbose_name = _('Друк етикеток')
+        verbose_name_plural = _('Друк етикеток')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.get_label_type_display()} ({len(self.product_ids)})"
@@ -0,0 +1,155 @@
+"""
+Повнотекстовий пошук товарів
+
+На PostgreSQL пошук іде по збереженій колонці Product.search_vector
+(tsvector з GIN-індексом) у кількох конфігураціях: simple зберігає точні
+форми слів (зокрема українських, для яких у PostgreSQL немає стемера),
+russian та english додають стемінг. Опечатки у назві покриває триграмний
+індекс (pg_trgm). Результати ранжуються SearchRank. На інших СУБД (тести,
+локальна розробка) використовується простий пошук за назвою.
+"""
+
+from typing import Iterable, List
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db import connection
+from django.db.models import F, IntegerField, Q, Value
+from django.db.models.functions import Cast
+from rest_framework.filters import BaseFilterBackend
+
+DEFAULT_SEARCH_CONFIGS = ('simple', 'russian', 'english')
+
+# Поля, зміна яких потребує перебудови search_vector
+SEARCH_FIELDS = ('name', 'sku', 'short_description', 'description')
+
+# Ранг зберігається цілим числом, щоб курсор пагінації порівнював його точно
+RANK_SCALE = 1_000_000
+
+# Вага схожості назви (опечатки) відносно повнотекстового рангу
+TRIGRAM_WEIGHT = 0.5
+
+AUTOCOMPLETE_LIMIT = 10
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_search_supported() -> bool:
+    """Чи підтримує БД повнотекстовий пошук (tsvector)"""
+    return connection.vendor == 'postgresql'
+
+
+def get_search_configs() -> List[str]:
+    """Конфігурації tsvector (settings.PRODUCT_SEARCH_CONFIGS)"""
+    return list(getattr(settings, 'PRODUCT_SEARCH_CONFIGS', DEFAULT_SEARCH_CONFIGS))
+
+
+def product_search_vector():
+    """Вираз tsvector товару: назва та SKU важливіші за опис"""
+    configs = get_search_configs()
+    vector = SearchVector('sku', weight='A', config=configs[0])
+    for config in configs:
+        vector += (
+            SearchVector('name', weight='A', config=config)
+            + SearchVector('short_description', weight='B', config=config)
+            + SearchVector('description', weight='C', config=config)
+        )
+    return vector
+
+
+def update_search_vectors(product_ids: Iterable[int]) -> int:
+    """Перебудувати search_vector товарів одним UPDATE"""
+    from .models import Product
+
+    if not is_search_supported():
+        return 0
+    return Product.objects.filter(id__in=list(product_ids)).update(search_vector=product_search_vector())
+
+
+def _full_text_query(query: str):
+    configs = get_search_configs()
+    search_query = SearchQuery(query, search_type='websearch', config=configs[0])
+    for config in configs[1:]:
+        search_query |= SearchQuery(query, search_type='websearch', config=config)
+    return search_query
+
+
+def search_products(queryset, query: str):
+    """
+    Відфільтрувати товари за пошуковим запитом
+
+    Збіг за tsvector або схожа назва (опечатки). Додає анотацію
+    search_rank (більше — релевантніше) для сортування за релевантністю.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if not is_search_supported():
+        return queryset.filter(
+            Q(name__icontains=query) | Q(sku__iexact=query)
+        ).annotate(search_rank=Value(0, output_field=IntegerField()))
+
+    search_query = _full_text_query(query)
+    rank = SearchRank(F('search_vector'), search_query) + TrigramWordSimilarity(query, 'name') * TRIGRAM_WEIGHT
+    return queryset.filter(
+        Q(search_vector=search_query) | Q(name__trigram_word_similar=query)
+    ).annotate(
+        search_rank=Cast(rank * RANK_SCALE, IntegerField())
+    )
+
+
+def autocomplete_products(queryset, prefix: str, limit: int = AUTOCOMPLETE_LIMIT):
+    """
+    Підказки за початком слів: «кав зер» знаходить «Кава в зернах»
+
+    Останнє слово шукається як префікс, решта — як цілі слова.
+    """
+    terms = _WORD_RE.findall(prefix.lower())
+    if not terms:
+        return queryset.none()
+
+    if not is_search_supported():
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term)
+        return queryset.filter(condition).order_by('name')[:limit]
+
+    # Слова містять лише літери та цифри, тому raw tsquery безпечний
+    raw = ' & '.join(f'{term}:*' for term in terms)
+    search_query = SearchQuery(raw, search_type='raw', config='simple')
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-search_rank', 'name')[:limit]
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    DRF-бекенд пошуку товарів замість SearchFilter (ILIKE по кількох колонках)
+
+    Ставиться після OrderingFilter: без явного ?ordering= результати
+    пошуку сортуються за релевантністю.
+    """
+
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        queryset = search_products(queryset, query)
+        if not request.query_params.get('ordering'):
+            queryset = queryset.order_by('-search_rank', '-id')
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Пошук за назвою, SKU та описом',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,60 @@
+"""
+Сигнали товарів
+"""
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from warehouse.models import Packaging
+from .codes import code_resolver, index_product_codes
+from .models import Product, ProductBarcode, ProductVariant
+
+# Поля товару, від яких залежить індекс кодів
+CODE_FIELDS = {'sku', 'store', 'store_id'}
+
+
+def _code_state(instance):
+    # Відкладені поля не читаємо, щоб не виконувати запит
+    return instance.__dict__.get('sku'), instance.__dict__.get('store_id')
+
+
+@receiver(post_init, sender=Product)
+def remember_product_codes(sender, instance, **kwargs):
+    """Запам'ятати артикул і магазин товару на момент завантаження"""
+    instance._loaded_code_state = _code_state(instance) if instance.pk else None
+
+
+@receiver(post_save, sender=Product)
+def index_codes_on_product_save(sender, instance, created, update_fields=None, **kwargs):
+    """Артикул або магазин товару могли змінитися"""
+    if update_fields is not None and not CODE_FIELDS & set(update_fields):
+        return
+    state = _code_state(instance)
+    if created or state != instance._loaded_code_state:
+        index_product_codes([instance.pk])
+    instance._loaded_code_state = state
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_codes_on_product_delete(sender, instance, **kwargs):
+    """Записи індексу видаляються каскадно, лишається оновити кеш магазину після фіксації"""
+    store_id = instance.store_id
+    transaction.on_commit(lambda: code_resolver.invalidate(store_id))
+
+
+def _deleted_directly(sender, origin):
+    """Видалення ініційоване самим об'єктом, а не каскадом від товару чи магазину"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is sender
+
+
+@receiver([post_save, post_delete], sender=ProductBarcode)
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=Packaging)
+def index_codes_on_related_change(sender, instance, origin=None, **kwargs):
+    """Штрихкод, QR код, фасування або варіант товару змінилися"""
+    if origin is not None and not _deleted_directly(sender, origin):
+        return
+    index_product_codes([instance.product_id])
@@ -0,0 +1,90 @@
+"""
+Celery завдання для товарів
+"""
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# Кількість товарів, що переіндексуються одним UPDATE, та максимум порцій за запуск
+REINDEX_BATCH_SIZE = 500
+REINDEX_MAX_BATCHES = 20
+
+
+# ==================== SEARCH TASKS ====================
+
+
+@shared_task
+def reindex_product_search(product_ids=None):
+    """
+    Інкрементальна переіндексація пошуку товарів
+
+    Product.save оновлює search_vector сам, але bulk_create та
+    QuerySet.update оминають save. Без аргументів задача дозаповнює
+    товари з порожнім search_vector; з product_ids — перебудовує вказані.
+    """
+    from .models import Product
+    from .search import is_search_supported, update_search_vectors
+
+    if not is_search_supported():
+        return 0
+
+    if product_ids is not None:
+        return update_search_vectors(product_ids)
+
+    reindexed = 0
+    for _ in range(REINDEX_MAX_BATCHES):
+        batch = list(
+            Product.objects.filter(search_vector__isnull=True)
+            .order_by('id')
+            .values_list('id', flat=True)[:REINDEX_BATCH_SIZE]
+        )
+        if not batch:
+            break
+        reindexed += update_search_vectors(batch)
+
+    if reindexed:
+        logger.info(f"Reindexed search vectors for {reindexed} products")
+    return reindexed
+
+
+# ==================== LABEL TASKS ====================
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def render_label_sheet(job_id):
+    """
+    Скласти PDF з етикетками для LabelPrintJob
+
+    Готовий файл прив'язується до задачі; адмінка показує посилання на нього.
+    """
+    from django.utils import timezone
+    from .labels import build_label_sheet
+    from .models import LabelPrintJob
+
+    job = LabelPrintJob.objects.filter(id=job_id).first()
+    if job is None or job.status == 'completed':
+        return None
+
+    job.status = 'processing'
+    job.save(update_fields=['status'])
+
+    try:
+        path, count = build_label_sheet(job.product_ids, job.label_type)
+    except Exception as e:
+        logger.error(f"Label sheet {job_id} failed: {e}")
+        job.status = 'failed'
+        job.error = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at'])
+        return None
+
+    job.file.name = path
+    job.labels_count = count
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['file', 'labels_count', 'status', 'finished_at'])
+    logger.info(f"Label sheet {job_id}: {count} labels")
+    return path
@@ -0,0 +1,430 @@
+"""
+Тести публічного каталогу товарів
+"""
+from io import BytesIO
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Product
+
+
+@pytest.fixture
+def catalog(test_store):
+    return [
+        Product.objects.create(
+            store=test_store, name=name, slug=f'product-{i}', description='',
+            price=price, sku=f'SKU{i}'
+        )
+        for i, (name, price) in enumerate([
+            ('Кава мелена', 150), ('Чай зелений', 80), ('Кава в зернах', 300), ('Какао', 120),
+        ])
+    ]
+
+
+class TestStoreProducts:
+    """Тести пагінації, сортування та пошуку store_products"""
+
+    def url(self, store):
+        return reverse('store-products', args=[store.slug])
+
+    def test_cursor_pagination(self, api_client, test_store, catalog):
+        """Тест: каталог віддається сторінками з курсором на наступну"""
+        response = api_client.get(self.url(test_store), {'page_size': 3, 'ordering': 'price'})
+
+        assert response.status_code == 200
+        assert [item['name'] for item in response.json()['results']] == ['Чай зелений', 'Какао', 'Кава мелена']
+        assert response.json()['next']
+
+        second = api_client.get(response.json()['next'])
+        assert [item['name'] for item in second.json()['results']] == ['Кава в зернах']
+        assert second.json()['next'] is None
+
+    def test_rejects_unknown_ordering(self, api_client, test_store, catalog):
+        """Тест: сортування поза дозволеним списком відхиляється"""
+        response = api_client.get(self.url(test_store), {'ordering': 'store__owner__password'})
+
+        assert response.status_code == 400
+        assert 'ordering' in response.json()
+
+    def test_relevance_requires_search(self, api_client, test_store, catalog):
+        """Тест: сортування за релевантністю можливе лише з пошуковим запитом"""
+        response = api_client.get(self.url(test_store), {'ordering': 'relevance'})
+
+        assert response.status_code == 400
+
+    def test_search(self, api_client, test_store, catalog):
+        """Тест: пошук повертає лише відповідні товари"""
+        response = api_client.get(self.url(test_store), {'search': 'Кава'})
+
+        assert response.status_code == 200
+        assert {item['name'] for item in response.json()['results']} == {'Кава мелена', 'Кава в зернах'}
+
+
+class TestProductSearch:
+    """Тести пошуку товарів у кабінеті та підказок вітрини"""
+
+    def test_owner_search_ranks_results(self, authenticated_client, test_store, catalog):
+        """Тест: пошук у кабінеті знаходить товари за назвою та SKU"""
+        url = reverse('product-list-create', args=[test_store.id])
+
+        by_name = authenticated_client.get(url, {'search': 'Кава'})
+        by_sku = authenticated_client.get(url, {'search': 'SKU1'})
+
+        assert by_name.status_code == 200
+        assert {item['name'] for item in by_name.json()['results']} == {'Кава мелена', 'Кава в зернах'}
+        assert [item['name'] for item in by_sku.json()['results']] == ['Чай зелений']
+
+    def test_autocomplete_by_prefix(self, api_client, test_store, catalog):
+        """Тест: підказки знаходять товари за початком слова"""
+        response = api_client.get(reverse('product-autocomplete', args=[test_store.slug]), {'q': 'зер'})
+
+        assert response.status_code == 200
+        assert [item['name'] for item in response.json()['results']] == ['Кава в зернах']
+
+    def test_autocomplete_empty_query(self, api_client, test_store, catalog):
+        """Тест: порожній запит не повертає підказок"""
+        response = api_client.get(reverse('product-autocomplete', args=[test_store.slug]), {'q': ' '})
+
+        assert response.json()['results'] == []
+
+    def test_reindex_task_skips_without_postgres(self, catalog):
+        """Тест: без PostgreSQL переіндексація нічого не робить"""
+        from .tasks import reindex_product_search
+
+        assert reindex_product_search() == 0
+
+
+class TestCatalogFacets:
+    """Тести фасетів публічного каталогу"""
+
+    @pytest.fixture
+    def faceted_catalog(self, test_store, catalog):
+        from .models import Category
+
+        drinks = Category.objects.create(store=test_store, name='Напої', slug='drinks')
+        Product.objects.filter(name__in=['Кава мелена', 'Кава в зернах', 'Чай зелений']).update(category=drinks)
+        Product.objects.filter(name='Кава в зернах').update(sale_price=250)
+        return drinks
+
+    def url(self, store):
+        return reverse('store-products', args=[store.slug])
+
+    def test_facet_counts_in_single_query(self, api_client, test_store, faceted_catalog):
+        """Тест: фасети повертаються з першою сторінкою без запиту на кожне значення"""
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(self.url(test_store))
+        facets = response.json()['facets']
+
+        assert sum('GROUP BY' in query['sql'] for query in queries.captured_queries) == 1
+
+        assert facets['total'] == 4
+        assert facets['categories'] == [{'id': faceted_catalog.id, 'name': 'Напої', 'count': 3}]
+        assert facets['on_sale'] == 1
+        assert facets['in_stock'] == 0
+        assert {band['key']: band['count'] for band in facets['price_bands']} == {
+            '0-100': 1, '100-500': 3, '500-1000': 0, '1000-5000': 0, '5000+': 0,
+        }
+
+    def test_filters_apply_to_page_and_facets(self, api_client, test_store, faceted_catalog):
+        """Тест: фільтри за ціною та знижкою звужують і товари, і лічильники"""
+        response = api_client.get(self.url(test_store), {'price_band': '100-500', 'on_sale': '1'})
+
+        assert [item['name'] for item in response.json()['results']] == ['Кава в зернах']
+        assert response.json()['facets']['total'] == 1
+
+    def test_rejects_bad_price(self, api_client, test_store, catalog):
+        """Тест: некоректна ціна відхиляється"""
+        assert api_client.get(self.url(test_store), {'price_min': 'abc'}).status_code == 400
+        assert api_client.get(self.url(test_store), {'price_band': '1-2'}).status_code == 400
+
+    def test_next_pages_without_facets(self, api_client, test_store, catalog):
+        """Тест: наступні сторінки не перераховують фасети"""
+        first = api_client.get(self.url(test_store), {'page_size': 2})
+        second = api_client.get(first.json()['next'])
+
+        assert 'facets' in first.json()
+        assert 'facets' not in second.json()
+
+
+class TestProductCodes:
+    """Тести індексу кодів товарів та пошуку для сканерів"""
+
+    @pytest.fixture
+    def barcode(self, catalog):
+        from .models import ProductBarcode
+
+        return ProductBarcode.objects.create(
+            product=catalog[0], barcode='4820000000017', qr_code='QR-COFFEE', auto_generate_codes=False
+        )
+
+    def test_index_follows_codes(self, catalog, barcode):
+        """Тест: індекс містить артикул, штрихкод і QR код та оновлюється при зміні"""
+        from .models import ProductCode
+
+        assert set(catalog[0].codes.values_list('code', 'code_type')) == {
+            ('SKU0', 'sku'), ('4820000000017', 'barcode'), ('QR-COFFEE', 'qr_code'),
+        }
+
+        catalog[0].sku = 'NEW0'
+        catalog[0].save()
+        barcode.delete()
+
+        assert set(ProductCode.objects.filter(product=catalog[0]).values_list('code', flat=True)) == {'NEW0'}
+
+    def test_unrelated_save_keeps_index(self, catalog, barcode, monkeypatch, django_capture_on_commit_callbacks):
+        """Тест: збереження товару без зміни кодів не перебудовує індекс і не скидає кеш"""
+        from .codes import code_resolver, index_product_codes
+
+        invalidated = []
+        monkeypatch.setattr(code_resolver, 'invalidate', invalidated.append)
+        code_ids = set(catalog[0].codes.values_list('id', flat=True))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            catalog[0].name = 'Кава зернова'
+            catalog[0].save()
+            assert index_product_codes([catalog[0].pk]) == 0
+
+        assert set(catalog[0].codes.values_list('id', flat=True)) == code_ids
+        assert invalidated == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            catalog[1].delete()
+            assert invalidated == []
+
+        assert invalidated == [catalog[1].store_id]
+
+    def test_resolver_serves_from_memory(self, catalog, barcode, django_assert_max_num_queries):
+        """Тест: повторне визначення коду не звертається до БД"""
+        from .codes import code_resolver
+
+        store_id = catalog[0].store_id
+        assert code_resolver.resolve(store_id, ['QR-COFFEE'])['QR-COFFEE'].product_id == catalog[0].id
+
+        with django_assert_max_num_queries(0):
+            assert code_resolver.resolve(store_id, ['SKU1'])['SKU1'].product_id == catalog[1].id
+
+    def test_search_requires_store(self, authenticated_client, barcode):
+        """Тест: пошук за кодом обмежений магазином"""
+        response = authenticated_client.get(reverse('search_by_barcode'), {'barcode': '4820000000017'})
+
+        assert response.status_code == 400
+
+    def test_search_by_barcode(self, authenticated_client, test_store, barcode):
+        """Тест: пошук товару за штрихкодом у магазині"""
+        response = authenticated_client.get(
+            reverse('search_by_barcode'), {'barcode': '4820000000017', 'store_id': test_store.id}
+        )
+
+        assert response.status_code == 200
+        assert response.json()['code_type'] == 'barcode'
+        assert response.json()['product']['name'] == 'Кава мелена'
+
+    def test_batch_lookup(self, authenticated_client, test_store, barcode):
+        """Тест: пакетний пошук повертає товар або null для кожного коду"""
+        response = authenticated_client.post(
+            reverse('lookup_product_codes', args=[test_store.id]),
+            {'codes': ['QR-COFFEE', 'SKU3', 'UNKNOWN']},
+            format='json'
+        )
+
+        results = response.json()['results']
+        assert response.json()['found'] == 2
+        assert results['QR-COFFEE']['product']['name'] == 'Кава мелена'
+        assert results['SKU3']['code_type'] == 'sku'
+        assert results['UNKNOWN'] is None
+
+    def test_batch_lookup_ignores_store_header(self, authenticated_client, test_store, barcode):
+        """Тест: заголовок X-Store-Slug власного магазину не відкриває коди чужого"""
+        from accounts.models import User
+        from stores.models import Store
+
+        other_owner = User.objects.create_user(username='other', email='other@example.com', password='pass12345')
+        other_store = Store.objects.create(name='Other', slug='other-store', owner=other_owner, is_active=True)
+        Product.objects.create(store=other_store, name='Чужий товар', slug='foreign', description='', price=1, sku='FOREIGN')
+
+        response = authenticated_client.post(
+            reverse('lookup_product_codes', args=[other_store.id]),
+            {'codes': ['FOREIGN']},
+            format='json',
+            HTTP_X_STORE_SLUG=test_store.slug
+        )
+
+        assert response.status_code == 403
+
+
+class TestBarcodeAllocation:
+    """Тести видачі штрихкодів діапазонами"""
+
+    def test_ean13_check_digit(self):
+        """Тест: контрольна цифра EAN-13"""
+        from .barcodes import ean13_check_digit, is_valid_ean13
+
+        assert ean13_check_digit('400638133393') == '1'
+        assert is_valid_ean13('4006381333931')
+        assert not is_valid_ean13('4006381333932')
+
+    def test_ranges_are_contiguous(self, test_store):
+        """Тест: послідовні видачі дають суцільні діапазони з префіксом магазину"""
+        from .barcodes import allocate_barcodes, is_valid_ean13
+
+        first = allocate_barcodes(test_store.id, 3)
+        second = allocate_barcodes(test_store.id, 2)
+
+        prefix = f'2{test_store.id:06d}'
+        assert [code[7:12] for code in first + second] == ['00001', '00002', '00003', '00004', '00005']
+        assert all(code.startswith(prefix) and is_valid_ean13(code) for code in first + second)
+
+    def test_weight_codes(self, test_store, test_user):
+        """Тест: вагові коди мають 7 цифр і окремий лічильник у кожному магазині"""
+        from stores.models import Store
+
+        from .barcodes import allocate_barcodes
+
+        other = Store.objects.create(name='Other', slug='other-store', owner=test_user)
+
+        assert allocate_barcodes(test_store.id, 2, 'weight') == ['2000001', '2000002']
+        assert allocate_barcodes(other.id, 1, 'weight') == ['2000001']
+
+    def test_weight_codes_skip_legacy_codes(self, catalog):
+        """Тест: старий код у кінці діапазону не вичерпує лічильник, зайняті коди пропускаються"""
+        from .barcodes import allocate_barcodes
+        from .models import BarcodeSequence, ProductBarcode
+
+        store_id = catalog[0].store_id
+        for product, code in zip(catalog, ['2999990', '2000002', '2999999']):
+            ProductBarcode.objects.create(
+                product=product, product_type='weight', barcode=code, qr_code=f'LEGACY-{code}',
+                auto_generate_codes=False
+            )
+
+        assert allocate_barcodes(store_id, 2, 'weight') == ['2000001', '2000003']
+
+        # Дійшовши до кінця діапазону, лічильник підбирає вільні номери з початку
+        # (видані вище коди не збережені в ProductBarcode, тож 2000001 вільний)
+        BarcodeSequence.objects.filter(store_id=store_id, product_type='weight').update(next_value=999998)
+        assert allocate_barcodes(store_id, 2, 'weight') == ['2999998', '2000001']
+
+    def test_bulk_create_without_per_product_queries(self, catalog, django_assert_max_num_queries):
+        """Тест: коди для всіх товарів створюються фіксованою кількістю запитів"""
+        from .barcodes import create_missing_barcodes
+        from .models import ProductBarcode, ProductCode
+
+        Product.objects.bulk_create([
+            Product(store=catalog[0].store, name=f'Товар {i}', slug=f'bulk-{i}', description='', price=10)
+            for i in range(50)
+        ])
+
+        with django_assert_max_num_queries(25):
+            created = create_missing_barcodes(Product.objects.all())
+
+        assert created == 54
+        assert ProductBarcode.objects.values('barcode').distinct().count() == 54
+        assert ProductCode.objects.filter(code_type='barcode').count() == 54
+
+    def test_skips_existing_codes(self, catalog):
+        """Тест: лічильник пропускає коди, видані до його появи"""
+        from .barcodes import allocate_barcodes
+        from .models import ProductBarcode
+
+        store_id = catalog[0].store_id
+        ProductBarcode.objects.create(
+            product=catalog[0], barcode=f'2{store_id:06d}000017', qr_code='LEGACY', auto_generate_codes=False
+        )
+
+        assert [code[7:12] for code in allocate_barcodes(store_id, 2)] == ['00002', '00003']
+
+    def test_generate_endpoint_uses_one_code(self, authenticated_client, catalog):
+        """Тест: створення запису кодів через API не витрачає зайвий номер лічильника"""
+        from .models import BarcodeSequence, ProductBarcode
+
+        response = authenticated_client.post(reverse('generate_barcode', args=[catalog[0].id]))
+
+        assert response.status_code == 200
+        assert response.json()['barcode'] == ProductBarcode.objects.get(product=catalog[0]).barcode
+        assert BarcodeSequence.objects.get(store_id=catalog[0].store_id, product_type='piece').next_value == 2
+
+
+@pytest.fixture
+def label_media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    return tmp_path
+
+
+class TestLabels:
+    """Тести рендерингу етикеток"""
+
+    def test_image_rendered_once_per_code(self, label_media):
+        """Тест: зображення коду кешується за хешем вмісту"""
+        from .labels import get_label_image
+
+        path = get_label_image('4006381333931', 'barcode', 'png')
+        assert (label_media / path).read_bytes().startswith(b'\x89PNG')
+
+        mtime = (label_media / path).stat().st_mtime_ns
+        assert get_label_image('4006381333931', 'barcode', 'png') == path
+        assert (label_media / path).stat().st_mtime_ns == mtime
+        assert get_label_image('4006381333931', 'qr_code', 'svg') != path
+
+    def test_pdf_pages(self, label_media):
+        """Тест: PDF розбивається на сторінки по сітці етикеток"""
+        from .labels import LABEL_COLUMNS, LABEL_ROWS, compose_labels_pdf
+
+        total = LABEL_COLUMNS * LABEL_ROWS + 1
+        rows = ((f'CODE{i}', f'Товар {i}', '10.00 UAH') for i in range(total))
+        output = BytesIO()
+        count = compose_labels_pdf(rows, 'barcode', output)
+        pdf = output.getvalue()
+
+        assert pdf.startswith(b'%PDF')
+        assert count == total
+        assert pdf.count(b'/Type /Page\n') == 2
+
+    def test_pdf_reuses_cached_images(self, label_media):
+        """Тест: PDF бере зображення кодів з кешу, а нові коди потрапляють у кеш"""
+        from .labels import compose_labels_pdf, get_label_image
+
+        cached = label_media / get_label_image('4006381333931', 'barcode', 'png')
+        mtime = cached.stat().st_mtime_ns
+
+        rows = [('4006381333931', 'Кава', '10.00 UAH'), ('CODE-NEW', 'Чай', '5.00 UAH')]
+        assert compose_labels_pdf(rows, 'barcode', BytesIO()) == 2
+
+        assert cached.stat().st_mtime_ns == mtime
+        assert len(list((label_media / 'labels' / 'cache').rglob('*.png'))) == 2
+
+    def test_print_job(self, catalog, test_user, label_media):
+        """Тест: фонова задача складає PDF і завершує задачу друку"""
+        from .barcodes import create_missing_barcodes
+        from .labels import build_label_sheet
+        from .models import LabelPrintJob
+        from .tasks import render_label_sheet
+
+        create_missing_barcodes(Product.objects.all())
+        job = LabelPrintJob.objects.create(
+            label_type='barcode', product_ids=[product.id for product in catalog], created_by=test_user
+        )
+
+        render_label_sheet(str(job.id))
+
+        job.refresh_from_db()
+        assert job.status == 'completed'
+        assert job.labels_count == len(catalog)
+        assert (label_media / job.file.name).read_bytes().startswith(b'%PDF')
+        assert build_label_sheet(job.product_ids, 'barcode') == (job.file.name, len(catalog))
+
+    def test_label_image_endpoint(self, authenticated_client, catalog, label_media):
+        """Тест: API віддає редирект на закешоване зображення"""
+        from .barcodes import create_missing_barcodes
+
+        create_missing_barcodes(Product.objects.all())
+        url = reverse('product_label_image', args=[catalog[0].id])
+
+        response = authenticated_client.get(url, {'image_format': 'png'})
+        assert response.status_code == 302
+        assert response['Location'].endswith('.png')
+
+        response = authenticated_client.get(url, {'image_format': 'gif'})
+        assert response.status_code == 400
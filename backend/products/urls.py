@@ -4,7 +4,7 @@ from .views import (
     ProductListCreateView, ProductDetailView, ProductPublicView,
     ProductImageListCreateView, ProductImageDetailView,
     ProductVariantListCreateView, ProductVariantDetailView,
-    store_products, product_by_slug, toggle_product_status, top_products
+    store_products, product_autocomplete, product_by_slug, toggle_product_status, top_products
 )
 
 urlpatterns = [
@@ -27,6 +27,7 @@ urlpatterns = [
     
     # Публічні URL
     path('public/stores/<slug:store_slug>/products/', store_products, name='store-products'),
+    path('public/stores/<slug:store_slug>/autocomplete/', product_autocomplete, name='product-autocomplete'),
     path('public/stores/<slug:store_slug>/products/<slug:product_slug>/', product_by_slug, name='product-by-slug'),
     
     # API для роботи з кодами
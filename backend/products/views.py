@@ -1,14 +1,20 @@
 ﻿from rest_framework import generics, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django.db.models import Q, Count
+from core.cache_utils import CATALOG_NAMESPACE, conditional_get
+from core.cache_warming import record_store_access
 from stores.models import Store
 from stores.tenancy import StoreScopedMixin
 from stores.permissions import IsStoreOwnerOrStaff
 from .models import Category, Product, ProductImage, ProductVariant
+from .facets import annotate_facet_fields, apply_facet_filters, compute_facets
+from .search import ProductSearchFilter, autocomplete_products, search_products
 from .serializers import (
     CategorySerializer, ProductSerializer, ProductCreateSerializer, ProductUpdateSerializer,
     ProductImageSerializer, ProductImageCreateSerializer,
@@ -45,9 +51,8 @@ class ProductListCreateView(StoreScopedMixin, generics.ListCreateAPIView):
     """View для списку та створення товарів"""
 
     permission_classes = [permissions.IsAuthenticated, IsStoreOwnerOrStaff]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, ProductSearchFilter]
     filterset_fields = ['category', 'is_active', 'is_featured']
-    search_fields = ['name', 'description', 'sku']
     ordering_fields = ['name', 'price', 'created_at']
     ordering = ['-created_at']
 
@@ -167,35 +172,100 @@ class ProductVariantDetailView(StoreScopedMixin, generics.RetrieveUpdateDestroyA
         return ProductVariant.objects.filter(product=self.get_product())
 
 
+def store_catalog_namespaces(request, store_slug, *args, **kwargs):
+    """Простори імен кешу, від яких залежить публічний каталог магазину"""
+    # StoreContextMiddleware вже завантажив магазин за store_slug
+    store = getattr(request, 'store', None)
+    if store is not None and store.slug == store_slug and store.is_active:
+        store_id = store.id
+    else:
+        store_id = get_object_or_404(
+            Store.objects.values_list('id', flat=True), slug=store_slug, is_active=True
+        )
+    record_store_access(request, store_id)
+    return [f"store_{store_id}", f"products:store_{store_id}"]
+
+
+class StoreProductsPagination(CursorPagination):
+    """Курсорна пагінація публічного каталогу магазину"""
+
+    page_size = 24
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    # Дозволені сортування; кожне підкріплене індексом (store, is_active, поле, id)
+    ORDERINGS = {
+        '-created_at': ('-created_at', '-id'),
+        'created_at': ('created_at', 'id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'name': ('name', 'id'),
+        '-name': ('-name', '-id'),
+        'relevance': ('-search_rank', '-id'),
+    }
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(store_catalog_namespaces)
 def store_products(request, store_slug):
-    """Отримати товари магазину для публічного каталогу"""
+    """
+    Отримати товари магазину для публічного каталогу
+
+    Перша сторінка (без cursor) містить також лічильники фасетів
+    відфільтрованої вибірки для бокової панелі фільтрів.
+    """
     store = get_object_or_404(Store, slug=store_slug, is_active=True)
     products = Product.objects.filter(store=store, is_active=True).select_related(
         'category'
     ).prefetch_related('images')
     
-    # ???-?>???'?????o-??
+    # Фільтрація за категорією
     category_id = request.GET.get('category')
     if category_id:
+        if not category_id.isdigit():
+            raise ValidationError({'category': 'Очікується ID категорії'})
         products = products.filter(category_id=category_id)
     
-    # ??????????
-    search = request.GET.get('search')
+    # Повнотекстовий пошук з ранжуванням
+    search = request.GET.get('search', '').strip()
     if search:
-        products = products.filter(name__icontains=search)
+        products = search_products(products, search)
     
-    # ???????'????????????
-    ordering = request.GET.get('ordering', '-created_at')
-    products = products.order_by(ordering)
+    # Фасети: ціна, знижка, наявність
+    products = apply_facet_filters(annotate_facet_fields(products), request.GET)
     
-    serializer = ProductPublicSerializer(products, many=True)
-    return Response(serializer.data)
+    # Сортування лише з дозволеного списку
+    ordering = request.GET.get('ordering') or ('relevance' if search else '-created_at')
+    if ordering not in StoreProductsPagination.ORDERINGS or (ordering == 'relevance' and not search):
+        raise ValidationError({'ordering': f"Допустимі значення: {', '.join(StoreProductsPagination.ORDERINGS)}"})
+    
+    paginator = StoreProductsPagination()
+    paginator.ordering = StoreProductsPagination.ORDERINGS[ordering]
+    page = paginator.paginate_queryset(products, request)
+    serializer = ProductPublicSerializer(page, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    if paginator.cursor_query_param not in request.GET:
+        response.data['facets'] = compute_facets(products)
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+@conditional_get(store_catalog_namespaces)
+def product_autocomplete(request, store_slug):
+    """Підказки пошуку вітрини за початком слів (?q=)"""
+    store = get_object_or_404(Store, slug=store_slug, is_active=True)
+    products = autocomplete_products(
+        Product.objects.filter(store=store, is_active=True), request.GET.get('q', '')
+    )
+    return Response({'results': list(products.values('id', 'name', 'slug'))})
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(store_catalog_namespaces)
 def product_by_slug(request, store_slug, product_slug):
     """???'????????????? ?'?????????? ???? slug ???>?? ?????+?>?-????????? ???????'??????"""
     store = get_object_or_404(Store, slug=store_slug, is_active=True)
@@ -217,6 +287,7 @@ def toggle_product_status(request, store_id, product_id):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(lambda request: [CATALOG_NAMESPACE])
 def top_products(request):
     """Простая выборка популярных товаров (is_featured или активные со скидкой, сортировка по дате)."""
     queryset = (
@@ -2,7 +2,10 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
+from core.cache_utils import conditional_get
+from core.cache_warming import record_store_access
 from .models import Store, StoreBlock, StoreSocialLink
 from .serializers import (
     StoreSerializer, StoreCreateSerializer, StoreUpdateSerializer,
@@ -39,6 +42,14 @@ class StoreDetailView(generics.RetrieveUpdateDestroyAPIView):
         return StoreSerializer
 
 
+def public_store_namespaces(request, slug, *args, **kwargs):
+    """Простори імен кешу, від яких залежить публічна сторінка магазину"""
+    store_id = get_object_or_404(Store.objects.values_list('id', flat=True), slug=slug, is_active=True)
+    record_store_access(request, store_id)
+    return [f"store_{store_id}"]
+
+
+@method_decorator(conditional_get(public_store_namespaces), name='get')
 class StorePublicView(generics.RetrieveAPIView):
     """Публічний view для перегляду магазину"""
     
@@ -110,6 +121,7 @@ class StoreSocialLinkDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@conditional_get(public_store_namespaces)
 def store_by_slug(request, slug):
     """Отримання магазину за slug"""
     store = get_object_or_404(Store, slug=slug, is_active=True)
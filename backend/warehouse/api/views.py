@@ -6,6 +6,7 @@ from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from warehouse.models import Inventory, InventoryItem
+from products.codes import code_resolver, find_code
 from products.models import Product
 from warehouse.api.serializers import InventorySerializer, InventoryItemSerializer
 
@@ -150,6 +151,33 @@ class InventoryListView(generics.ListAPIView):
         return Response([])
 
 
+AMBIGUOUS_CODE_ERROR = 'Код належить товарам кількох магазинів, вкажіть магазин у заголовку X-Store-Slug'
+
+
+def _resolve_scanned_codes(request, codes):
+    """
+    Збіги кодів з індексу кодів товарів
+
+    Якщо магазин відомий (X-Store-Slug), коди визначаються в пам'яті
+    процесу; інакше — за індексом коду по всіх магазинах (до двох збігів).
+    """
+    store = getattr(request, 'store', None)
+    if store is not None:
+        found = code_resolver.resolve(store.id, codes)
+        return {code: [found[code]] if code in found else [] for code in codes}
+    return {code: find_code(code) for code in codes}
+
+
+def _scan_details(product, match):
+    """Спосіб сканування та фасування: штрихкод фасування визначає фасування, інакше основне"""
+    scan_method = 'qr_code' if match.code_type == 'qr_code' else 'barcode'
+    if match.packaging_id:
+        packaging = product.packagings.filter(id=match.packaging_id).first()
+    else:
+        packaging = product.packagings.filter(is_default=True).first()
+    return scan_method, packaging
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def scan_product_for_inventory(request, inventory_id):
@@ -192,26 +220,25 @@ def scan_product_for_inventory(request, inventory_id):
             'error': 'actual_quantity повинно бути невід\'ємним числом'
         }, status=status.HTTP_400_BAD_REQUEST)
     
-    # Шукаємо товар по коду
-    try:
-        product = Product.objects.get(
-            Q(barcode=code) | Q(qr_code=code),
-            is_active=True
-        )
-        
-        # Визначаємо тип сканування
-        scan_method = 'barcode' if product.barcode == code else 'qr_code'
-        scanned_barcode = code if scan_method == 'barcode' else ''
-        scanned_qr_code = code if scan_method == 'qr_code' else ''
-        
-    except Product.DoesNotExist:
+    # Шукаємо товар по коду через індекс кодів
+    matches = _resolve_scanned_codes(request, [code])[code]
+    if len(matches) > 1:
+        return Response({
+            'success': False,
+            'error': AMBIGUOUS_CODE_ERROR
+        }, status=status.HTTP_409_CONFLICT)
+    
+    match = matches[0] if matches else None
+    product = Product.objects.filter(id=match.product_id, is_active=True).first() if match else None
+    if product is None:
         return Response({
             'success': False,
             'error': 'Товар з таким кодом не знайдено'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    # Отримуємо основне фасування товару
-    packaging = product.packagings.filter(is_default=True).first()
+    scan_method, packaging = _scan_details(product, match)
+    scanned_barcode = code if scan_method == 'barcode' else ''
+    scanned_qr_code = code if scan_method == 'qr_code' else ''
     if not packaging:
         return Response({
             'error': 'У товару відсутнє основне фасування'
@@ -336,6 +363,14 @@ def bulk_scan_products(request, inventory_id):
     results = []
     errors = []
     
+    # Усі коди визначаються заздалегідь, товари завантажуються одним запитом
+    codes = [item_data.get('code') for item_data in scanned_items if item_data.get('code')]
+    code_matches = _resolve_scanned_codes(request, codes)
+    products = Product.objects.filter(
+        id__in={match.product_id for matches in code_matches.values() for match in matches},
+        is_active=True
+    ).in_bulk()
+    
     for item_data in scanned_items:
         code = item_data.get('code')
         actual_quantity = item_data.get('actual_quantity')
@@ -359,65 +394,67 @@ def bulk_scan_products(request, inventory_id):
             continue
         
         # Шукаємо товар
-        try:
-            product = Product.objects.get(
-                Q(barcode=code) | Q(qr_code=code),
-                is_active=True
-            )
-            
-            scan_method = 'barcode' if product.barcode == code else 'qr_code'
-            scanned_barcode = code if scan_method == 'barcode' else ''
-            scanned_qr_code = code if scan_method == 'qr_code' else ''
-            
-            # Отримуємо основне фасування
-            packaging = product.packagings.filter(is_default=True).first()
-            if not packaging:
-                errors.append({
-                    'item': item_data,
-                    'error': f'У товару {product.name} відсутнє основне фасування'
-                })
-                continue
-            
-            # Створюємо або оновлюємо позицію
-            inventory_item, created = InventoryItem.objects.get_or_create(
-                inventory=inventory,
-                product=product,
-                packaging=packaging,
-                defaults={
-                    'expected_quantity': 0,
-                    'actual_quantity': actual_quantity,
-                    'scanned_barcode': scanned_barcode,
-                    'scanned_qr_code': scanned_qr_code,
-                    'scan_method': scan_method,
-                    'counted_by': request.user,
-                    'counted_at': timezone.now()
-                }
-            )
-            
-            if not created:
-                inventory_item.actual_quantity = actual_quantity
-                inventory_item.scanned_barcode = scanned_barcode
-                inventory_item.scanned_qr_code = scanned_qr_code
-                inventory_item.scan_method = scan_method
-                inventory_item.counted_by = request.user
-                inventory_item.counted_at = timezone.now()
-                inventory_item.save()
-            
-            inventory_item.calculate_discrepancies()
-            
-            results.append({
-                'code': code,
-                'product_name': product.name,
-                'scan_method': scan_method,
-                'created': created,
-                'actual_quantity': actual_quantity
+        matches = code_matches.get(code, [])
+        if len(matches) > 1:
+            errors.append({
+                'item': item_data,
+                'error': AMBIGUOUS_CODE_ERROR
             })
-            
-        except Product.DoesNotExist:
+            continue
+        
+        match = matches[0] if matches else None
+        product = products.get(match.product_id) if match else None
+        if product is None:
             errors.append({
                 'item': item_data,
                 'error': f'Товар з кодом {code} не знайдено'
             })
+            continue
+        
+        scan_method, packaging = _scan_details(product, match)
+        scanned_barcode = code if scan_method == 'barcode' else ''
+        scanned_qr_code = code if scan_method == 'qr_code' else ''
+        if not packaging:
+            errors.append({
+                'item': item_data,
+                'error': f'У товару {product.name} відсутнє основне фасування'
+            })
+            continue
+        
+        # Створюємо або оновлюємо позицію
+        inventory_item, created = InventoryItem.objects.get_or_create(
+            inventory=inventory,
+            product=product,
+            packaging=packaging,
+            defaults={
+                'expected_quantity': 0,
+                'actual_quantity': actual_quantity,
+                'scanned_barcode': scanned_barcode,
+                'scanned_qr_code': scanned_qr_code,
+                'scan_method': scan_method,
+                'counted_by': request.user,
+                'counted_at': timezone.now()
+            }
+        )
+        
+        if not created:
+            inventory_item.actual_quantity = actual_quantity
+            inventory_item.scanned_barcode = scanned_barcode
+            inventory_item.scanned_qr_code = scanned_qr_code
+            inventory_item.scan_method = scan_method
+            inventory_item.counted_by = request.user
+            inventory_item.counted_at = timezone.now()
+            inventory_item.save()
+        
+        inventory_item.calculate_discrepancies()
+        
+        results.append({
+            'code': code,
+            'product_name': product.name,
+            'scan_method': scan_method,
+            'created': created,
+            'actual_quantity': actual_quantity
+        })
     
     # Оновлюємо статус інвентаризації
     if inventory.status == 'draft' and results: